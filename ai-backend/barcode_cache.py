@@ -0,0 +1,214 @@
+# ================================
+# File: barcode_cache.py
+# Barcode -> product cache with separate TTLs for hits and misses
+# ================================
+#
+# Entries live in one SQLite file (WAL mode), so every process on the host
+# - main_food_api, main_light and the scanner service they load - reads
+# and invalidates the same cache:
+#   BARCODE_CACHE_PATH (default ai-backend/barcode_cache.sqlite3)
+#
+# Entries are keyed by (resolver, barcode). The scanner checks the Node
+# meal catalog before Open Food Facts while main_food_api only asks Open
+# Food Facts, so an answer from one must not be served by the other.
+# Invalidation always applies to every resolver.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from barcode_index import barcode_key
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "BARCODE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "barcode_cache.sqlite3")
+)
+
+# Resolvers sharing the store
+SCANNER = "scanner"                    # barcode_service: Node catalog, then Open Food Facts
+OPEN_FOOD_FACTS = "open_food_facts"    # main_food_api: Open Food Facts only
+
+# Sources whose answers depend on the Node meal catalog
+CATALOG_SOURCES = {"smart_nutritrack_database"}
+
+# Evict down to max_entries once every this many writes
+EVICT_EVERY_PUTS = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS barcode_products (
+    resolver    TEXT    NOT NULL,
+    code        TEXT    NOT NULL,
+    expires_at  REAL    NOT NULL,
+    found       INTEGER NOT NULL,
+    catalog     INTEGER NOT NULL,
+    product     TEXT    NOT NULL,
+    accessed_at REAL    NOT NULL,
+    PRIMARY KEY (resolver, code)
+);
+CREATE INDEX IF NOT EXISTS barcode_products_accessed ON barcode_products (accessed_at);
+"""
+
+
+class BarcodeProductCache:
+    """LRU cache of resolved products keyed by barcode, shared between processes.
+
+    Found products are kept for `hit_ttl` seconds, "not found" answers for
+    the much shorter `miss_ttl`. Errors and timeouts are never cached.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, hit_ttl: float = 24 * 3600.0,
+                 miss_ttl: float = 15 * 60.0, max_entries: int = 50000):
+        self.path = path
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+        try:
+            with self._connection() as db:
+                db.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            print(f"⚠️ Barcode cache at {path} unavailable ({e}) - caching in memory for this process")
+            self.path = "file:barcode_cache?mode=memory&cache=shared"
+            self._keepalive = self._connection()
+            self._keepalive.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shareable)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, uri=self.path.startswith("file:"),
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, barcode: str, resolver: str = SCANNER) -> Optional[Dict[str, Any]]:
+        """Cached product (or cached not-found answer), None if unknown"""
+        key = barcode_key(barcode)
+        if key is None:
+            return None
+
+        now = time.time()
+        try:
+            db = self._connection()
+            row = db.execute(
+                "SELECT expires_at, found, product FROM barcode_products WHERE resolver = ? AND code = ?",
+                (resolver, str(key))
+            ).fetchone()
+            if row is None or row[0] < now:
+                if row is not None:
+                    db.execute("DELETE FROM barcode_products WHERE resolver = ? AND code = ?",
+                               (resolver, str(key)))
+                self._count("misses")
+                return None
+            db.execute("UPDATE barcode_products SET accessed_at = ? WHERE resolver = ? AND code = ?",
+                       (now, resolver, str(key)))
+        except sqlite3.Error as e:
+            print(f"⚠️ Barcode cache read failed: {e}")
+            self._count("errors")
+            return None
+
+        self._count("hits" if row[1] else "negative_hits")
+        return json.loads(row[2])
+
+    def put(self, barcode: str, product: Dict[str, Any], resolver: str = SCANNER,
+            ttl: Optional[float] = None):
+        self._store(barcode, product, found=True, resolver=resolver, ttl=ttl)
+
+    def put_missing(self, barcode: str, product: Dict[str, Any], resolver: str = SCANNER):
+        self._store(barcode, product, found=False, resolver=resolver)
+
+    def _store(self, barcode: str, product: Dict[str, Any], found: bool, resolver: str,
+               ttl: Optional[float] = None):
+        key = barcode_key(barcode)
+        if key is None:
+            return
+        now = time.time()
+        if ttl is None:
+            ttl = self.hit_ttl if found else self.miss_ttl
+        try:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO barcode_products VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (resolver, str(key), now + ttl, int(found), int(product.get("source") in CATALOG_SOURCES),
+                 json.dumps(product, ensure_ascii=False), now)
+            )
+            with self._lock:
+                self._puts += 1
+                evict = self._puts % EVICT_EVERY_PUTS == 0
+            if evict:
+                self._evict(db)
+        except sqlite3.Error as e:
+            print(f"⚠️ Barcode cache write failed: {e}")
+            self._count("errors")
+
+    def _evict(self, db: sqlite3.Connection):
+        db.execute("DELETE FROM barcode_products WHERE expires_at < ?", (time.time(),))
+        excess = db.execute("SELECT COUNT(*) FROM barcode_products").fetchone()[0] - self.max_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM barcode_products WHERE rowid IN "
+                "(SELECT rowid FROM barcode_products ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def invalidate(self, barcodes: Optional[Iterable[str]] = None, catalog_only: bool = True) -> int:
+        """Drop entries (for every resolver and process) and return how many were removed.
+
+        Explicit barcodes (those of the meals that changed) go whatever their
+        source, so a cached Open Food Facts answer cannot hide a meal that now
+        carries the code. A catalog change also drops every not-found answer
+        and every product served from the Node catalog; `catalog_only=False`
+        clears everything.
+        """
+        db = self._connection()
+        removed = 0
+        if barcodes:
+            codes = [str(key) for key in (barcode_key(code) for code in barcodes) if key is not None]
+            for start in range(0, len(codes), 500):
+                chunk = codes[start:start + 500]
+                removed += db.execute(
+                    f"DELETE FROM barcode_products WHERE code IN ({','.join('?' * len(chunk))})", chunk
+                ).rowcount
+        if catalog_only:
+            removed += db.execute("DELETE FROM barcode_products WHERE found = 0 OR catalog = 1").rowcount
+        else:
+            removed += db.execute("DELETE FROM barcode_products").rowcount
+
+        self._count("invalidations")
+        return removed
+
+    def status(self) -> Dict[str, Any]:
+        try:
+            entries, negative = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(found = 0), 0) FROM barcode_products"
+            ).fetchone()
+        except sqlite3.Error:
+            entries = negative = None
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "entries": entries,
+            "negative_entries": negative,
+            "hit_ttl_seconds": self.hit_ttl,
+            "miss_ttl_seconds": self.miss_ttl,
+            "store": self.path
+        }
+
+
+# Global instance
+barcode_product_cache = BarcodeProductCache()
@@ -0,0 +1,180 @@
+# ================================
+# File: barcode_decoder.py
+# Tiered barcode decoding: cheap passes first, expensive ones on failure
+# ================================
+#
+# Tiers, in order (each runs only if the previous ones found nothing):
+#   downscaled  grayscale image resized so its longest side is <= fast_max_side
+#   roi         crops of full-resolution regions found by gradient detection
+#   full        the full-resolution grayscale image
+#   rotated     the full-resolution image rotated by ROTATION_ANGLES
+
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from pyzbar.pyzbar import decode
+
+Rect = namedtuple("Rect", ["left", "top", "width", "height"])
+DecodedBarcode = namedtuple("DecodedBarcode", ["data", "type", "rect"])
+
+
+class MultiScaleBarcodeDecoder:
+    """Decodes barcodes through increasingly expensive tiers and keeps per-tier stats"""
+
+    TIERS = ("downscaled", "roi", "full", "rotated")
+    ROTATION_ANGLES = (45, -45, 20, -20)
+
+    def __init__(self, fast_max_side: int = 800, max_regions: int = 3, region_padding: float = 0.15):
+        self.fast_max_side = fast_max_side
+        self.max_regions = max_regions
+        self.region_padding = region_padding
+
+        self._lock = threading.Lock()
+        self._stats = {tier: {"attempts": 0, "hits": 0, "total_ms": 0.0} for tier in self.TIERS}
+        self._scans = 0
+        self._misses = 0
+
+    # ---------- public API ----------
+
+    def decode_bytes(self, image_data: bytes) -> Tuple[List[DecodedBarcode], Optional[str]]:
+        nparr = np.frombuffer(image_data, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("Could not decode image")
+        return self.decode(img)
+
+    def decode(self, img: np.ndarray) -> Tuple[List[DecodedBarcode], Optional[str]]:
+        """Barcodes found in the image and the name of the tier that found them"""
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.fast_max_side / float(max(height, width)))
+        small = gray if scale >= 1.0 else cv2.resize(
+            gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+        tiers = [
+            ("downscaled", lambda: self._decode_scaled(small, scale)),
+            ("roi", lambda: self._decode_regions(gray, small, scale)),
+            ("full", lambda: self._decode_scaled(gray, 1.0) if scale < 1.0 else None),
+            ("rotated", lambda: self._decode_rotated(gray))
+        ]
+
+        with self._lock:
+            self._scans += 1
+
+        for tier, attempt in tiers:
+            started = time.perf_counter()
+            results = attempt()
+            if results is None:
+                continue  # tier not applicable to this image
+            self._record(tier, bool(results), time.perf_counter() - started)
+            if results:
+                return results, tier
+
+        with self._lock:
+            self._misses += 1
+        return [], None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            tiers = {}
+            for tier, s in self._stats.items():
+                tiers[tier] = {
+                    "attempts": s["attempts"],
+                    "hits": s["hits"],
+                    "hit_rate": round(s["hits"] / s["attempts"], 3) if s["attempts"] else None,
+                    "avg_ms": round(s["total_ms"] / s["attempts"], 2) if s["attempts"] else None
+                }
+            return {"scans": self._scans, "misses": self._misses, "tiers": tiers}
+
+    # ---------- tiers ----------
+
+    def _decode_scaled(self, image: np.ndarray, scale: float) -> List[DecodedBarcode]:
+        """Decode an image that is `scale` times the original size"""
+        results = []
+        for barcode in decode(image):
+            r = barcode.rect
+            results.append(self._result(barcode, Rect(
+                int(r.left / scale), int(r.top / scale), int(r.width / scale), int(r.height / scale)
+            )))
+        return results
+
+    def _decode_regions(self, gray: np.ndarray, small: np.ndarray, scale: float) -> List[DecodedBarcode]:
+        """Find bar-like regions on the small image, decode them at full resolution"""
+        height, width = gray.shape[:2]
+        results = []
+        for x, y, w, h in self._find_regions(small):
+            # Map the region back to full resolution with some padding
+            pad_x, pad_y = int(w * self.region_padding), int(h * self.region_padding)
+            left = max(0, int((x - pad_x) / scale))
+            top = max(0, int((y - pad_y) / scale))
+            right = min(width, int((x + w + pad_x) / scale))
+            bottom = min(height, int((y + h + pad_y) / scale))
+
+            crop = gray[top:bottom, left:right]
+            for barcode in decode(crop):
+                r = barcode.rect
+                results.append(self._result(barcode, Rect(left + r.left, top + r.top, r.width, r.height)))
+            if results:
+                break
+        return results
+
+    def _find_regions(self, small: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """Bounding boxes of high-gradient, bar-like areas, largest first"""
+        grad_x = cv2.Scharr(small, cv2.CV_32F, 1, 0)
+        grad_y = cv2.Scharr(small, cv2.CV_32F, 0, 1)
+        # Bars have strong gradients in one direction only (either orientation)
+        gradient = cv2.convertScaleAbs(np.abs(np.abs(grad_x) - np.abs(grad_y)))
+
+        blurred = cv2.blur(gradient, (9, 9))
+        _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 21))
+        closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        closed = cv2.dilate(cv2.erode(closed, None, iterations=4), None, iterations=4)
+
+        contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = 0.002 * small.shape[0] * small.shape[1]
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+        boxes.sort(key=lambda b: b[2] * b[3], reverse=True)
+        return boxes[:self.max_regions]
+
+    def _decode_rotated(self, gray: np.ndarray) -> List[DecodedBarcode]:
+        height, width = gray.shape[:2]
+        center = (width / 2.0, height / 2.0)
+        for angle in self.ROTATION_ANGLES:
+            matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+            rotated = cv2.warpAffine(gray, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+            barcodes = decode(rotated)
+            if not barcodes:
+                continue
+
+            inverse = cv2.invertAffineTransform(matrix)
+            results = []
+            for barcode in barcodes:
+                points = np.array([[p.x, p.y] for p in barcode.polygon], dtype=np.float32).reshape(-1, 1, 2)
+                x, y, w, h = cv2.boundingRect(cv2.transform(points, inverse))
+                results.append(self._result(barcode, Rect(x, y, w, h)))
+            return results
+        return []
+
+    # ---------- helpers ----------
+
+    @staticmethod
+    def _result(barcode, rect: Rect) -> DecodedBarcode:
+        return DecodedBarcode(barcode.data.decode("utf-8", errors="replace"), barcode.type, rect)
+
+    def _record(self, tier: str, hit: bool, seconds: float):
+        with self._lock:
+            s = self._stats[tier]
+            s["attempts"] += 1
+            s["hits"] += int(hit)
+            s["total_ms"] += seconds * 1000.0
+
+
+# Global instance
+barcode_decoder = MultiScaleBarcodeDecoder()
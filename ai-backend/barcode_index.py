@@ -0,0 +1,393 @@
+# ================================
+# File: barcode_index.py
+# Local barcode product index built from an Open Food Facts export
+# ================================
+#
+# Full import:   python barcode_index.py import openfoodfacts-products.jsonl.gz
+# Delta import:  python barcode_index.py delta  openfoodfacts_delta.jsonl.gz
+# Lookup:        python barcode_index.py lookup 3017620422003
+#
+# Layout of the index directory:
+#   manifest.json             current generation (swapped atomically)
+#   products-<gen>.bin        UTF-8 JSON product records of one generation
+#   codes-<gen>.npy           sorted uint64 EAN/UPC codes (memory-mapped)
+#   spans-<gen>.npy           (offset, length) of each code's record in the blob
+#   nutrients-<gen>.npy       float32 nutrient rows aligned with codes (NUTRIENT_FIELDS)
+#
+# Files of a generation are never modified once written: running services
+# keep the old generation mapped until their next reload check. A delta
+# writes a new blob holding its records plus the surviving old ones (which
+# compacts away superseded records); replaced generations are deleted by a
+# later import once RETIRE_GRACE_SECONDS have passed.
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from nutrients import NutrientRecord, NUTRIENT_BASIS, NUTRIENT_FIELDS
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_INDEX_DIR = os.getenv(
+    "BARCODE_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "barcode_index")
+)
+
+# Product fields kept in the record store
+PRODUCT_FIELDS = ("product_name", "brands", "categories", "ingredients_text", "image_url")
+
+# Indexes written before per-generation blobs shared this one
+LEGACY_BLOB = "products.bin"
+# Retired generations outlive every reader's reload check by a wide margin
+RETIRE_GRACE_SECONDS = 300
+
+
+def _blob_name(gen: int) -> str:
+    return f"products-{gen}.bin"
+
+
+def barcode_key(barcode: str) -> Optional[int]:
+    """Numeric key for a barcode; UPC-A and its EAN-13 form share a key"""
+    digits = str(barcode).strip()
+    if not digits.isdigit() or len(digits) > 19:
+        return None
+    return int(digits)
+
+
+# ---------- reading exports ----------
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_export(path: str) -> Iterator[Tuple[int, Dict, NutrientRecord]]:
+    """Stream (key, product fields, nutrients) from an OFF JSONL or CSV export"""
+    is_csv = ".csv" in os.path.basename(path)
+    with _open_text(path) as f:
+        if is_csv:
+            # OFF CSV exports are tab separated and carry nutriments as columns
+            csv.field_size_limit(sys.maxsize)
+            rows = csv.DictReader(f, delimiter="\t")
+            for row in rows:
+                key = barcode_key(row.get("code", ""))
+                if key is not None:
+                    yield key, row, NutrientRecord.from_off(row)
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    product = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = barcode_key(product.get("code", ""))
+                if key is not None:
+                    yield key, product, NutrientRecord.from_off(product.get("nutriments") or {})
+
+
+# ---------- building ----------
+
+class BarcodeIndexBuilder:
+    """Writes full and delta generations of the index"""
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _read_manifest(self) -> Optional[Dict]:
+        path = self._path("manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_records(self, export_path: str, blob):
+        """Write product records from an export to `blob`; return aligned arrays"""
+        keys, spans, rows = [], [], []
+        started = time.time()
+        offset = blob.tell()
+        for count, (key, product, record) in enumerate(iter_export(export_path), 1):
+            payload = json.dumps(
+                {field: product.get(field) or "" for field in PRODUCT_FIELDS},
+                ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            blob.write(payload)
+            keys.append(key)
+            spans.append((offset, len(payload)))
+            rows.append(record.values)
+            offset += len(payload)
+            if count % 100000 == 0:
+                print(f"   📦 {count} products read ({time.time() - started:.0f}s)")
+
+        return (
+            np.asarray(keys, dtype=np.uint64),
+            np.asarray(spans, dtype=np.uint64).reshape(-1, 2),
+            np.asarray(rows, dtype=np.float32).reshape(-1, len(NUTRIENT_FIELDS))
+        )
+
+    @staticmethod
+    def _copy_records(source_path: str, spans: np.ndarray, blob) -> np.ndarray:
+        """Copy the records at `spans` from another blob to the end of `blob`.
+
+        Records are written in source order, back to back, so adjacent
+        records are copied as one run. Returns their new spans, aligned
+        with `spans`.
+        """
+        new_spans = np.zeros_like(spans)
+        if len(spans) == 0:
+            return new_spans
+
+        order = np.argsort(spans[:, 0], kind="stable")
+        offsets, lengths = spans[order, 0], spans[order, 1]
+        new_offsets = np.uint64(blob.tell()) + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.uint64)
+        new_spans[order, 0] = new_offsets
+        new_spans[order, 1] = lengths
+
+        # A run breaks wherever a record does not start where the previous one ended
+        breaks = np.nonzero(offsets[1:] != offsets[:-1] + lengths[:-1])[0] + 1
+        starts = np.concatenate([[0], breaks])
+        ends = np.concatenate([breaks, [len(offsets)]])
+        with open(source_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            for start, end in zip(starts, ends):
+                run_start = int(offsets[start])
+                run_end = int(offsets[end - 1] + lengths[end - 1])
+                blob.write(source[run_start:run_end])
+        return new_spans
+
+    @staticmethod
+    def _dedupe_sorted(keys, spans, rows):
+        """Sort by code, keeping the last occurrence of repeated codes"""
+        order = np.argsort(keys, kind="stable")[::-1]
+        _, first = np.unique(keys[order], return_index=True)
+        keep = order[first]
+        return keys[keep], spans[keep], rows[keep]
+
+    def import_full(self, export_path: str) -> Dict:
+        print(f"🔄 Importing Open Food Facts export {export_path}...")
+        previous = self._read_manifest()
+        gen = (previous["generation"] + 1) if previous else 1
+        with open(self._path(_blob_name(gen)), "wb") as blob:
+            keys, spans, rows = self._write_records(export_path, blob)
+        return self._write_generation(gen, *self._dedupe_sorted(keys, spans, rows), source=export_path,
+                                      previous=previous)
+
+    def import_delta(self, export_path: str) -> Dict:
+        previous = self._read_manifest()
+        if previous is None:
+            print("⚠️ No existing index - running a full import instead")
+            return self.import_full(export_path)
+
+        print(f"🔄 Applying delta {export_path} to generation {previous['generation']}...")
+        old_gen = previous["generation"]
+        gen = old_gen + 1
+        old_keys = np.load(self._path(f"codes-{old_gen}.npy"), mmap_mode="r")
+        old_spans = np.load(self._path(f"spans-{old_gen}.npy"), mmap_mode="r")
+        old_rows = np.load(self._path(f"nutrients-{old_gen}.npy"), mmap_mode="r")
+
+        with open(self._path(_blob_name(gen)), "wb") as blob:
+            new_keys, new_spans, new_rows = self._dedupe_sorted(*self._write_records(export_path, blob))
+
+            # Drop superseded codes; surviving records move into the new blob
+            kept = ~np.isin(old_keys, new_keys, assume_unique=True)
+            kept_spans = self._copy_records(self._path(previous.get("blob", LEGACY_BLOB)),
+                                            np.asarray(old_spans[kept]), blob)
+
+        # Merge the two sorted runs
+        keys = np.concatenate([old_keys[kept], new_keys])
+        spans = np.concatenate([kept_spans, new_spans])
+        rows = np.concatenate([old_rows[kept], new_rows])
+        order = np.argsort(keys, kind="stable")
+
+        return self._write_generation(gen, keys[order], spans[order], rows[order], source=export_path,
+                                      previous=previous)
+
+    def _write_generation(self, gen: int, keys, spans, rows, source: str,
+                          previous: Optional[Dict] = None) -> Dict:
+        np.save(self._path(f"codes-{gen}.npy"), keys)
+        np.save(self._path(f"spans-{gen}.npy"), spans)
+        np.save(self._path(f"nutrients-{gen}.npy"), rows)
+
+        # The replaced generation stays on disk until readers have moved off it
+        retired = list((previous or {}).get("retired", []))
+        if previous:
+            retired.append({"generation": previous["generation"],
+                            "blob": previous.get("blob", LEGACY_BLOB),
+                            "retired_at": time.time()})
+        retired = self._remove_retired(retired, keep_blob=_blob_name(gen))
+
+        manifest = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "generation": gen,
+            "blob": _blob_name(gen),
+            "count": int(len(keys)),
+            "nutrient_fields": list(NUTRIENT_FIELDS),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "source": os.path.basename(source),
+            "retired": retired
+        }
+        tmp_path = self._path("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+        print(f"✅ Barcode index generation {gen}: {manifest['count']} products")
+        return manifest
+
+    def _remove_retired(self, retired, keep_blob: str):
+        """Delete generations retired more than RETIRE_GRACE_SECONDS ago"""
+        remaining = []
+        for entry in retired:
+            if time.time() - entry["retired_at"] < RETIRE_GRACE_SECONDS:
+                remaining.append(entry)
+                continue
+            names = [f"{name}-{entry['generation']}.npy" for name in ("codes", "spans", "nutrients")]
+            if entry["blob"] != keep_blob:
+                names.append(entry["blob"])
+            for name in names:
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    remaining.append(entry)  # still open by a reader on some platforms
+                    break
+        return remaining
+
+
+# ---------- lookups ----------
+
+class BarcodeIndex:
+    """Read-only, memory-mapped view of the current index generation"""
+
+    RELOAD_CHECK_SECONDS = 30
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR):
+        self.index_dir = index_dir
+        self.generation = None
+        self._codes = None
+        self._spans = None
+        self._nutrients = None
+        self._blob = None
+        self._blob_file = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.reload()
+
+    @property
+    def available(self) -> bool:
+        return self._codes is not None
+
+    def reload(self) -> bool:
+        """Map the generation named in manifest.json, if it changed"""
+        manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self._last_check = time.monotonic()
+        if not os.path.exists(manifest_path):
+            return False
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            gen = manifest["generation"]
+            if gen == self.generation or manifest.get("format_version") != INDEX_FORMAT_VERSION:
+                return False
+
+            codes = np.load(os.path.join(self.index_dir, f"codes-{gen}.npy"), mmap_mode="r")
+            spans = np.load(os.path.join(self.index_dir, f"spans-{gen}.npy"), mmap_mode="r")
+            nutrients = np.load(os.path.join(self.index_dir, f"nutrients-{gen}.npy"), mmap_mode="r")
+            blob_file = open(os.path.join(self.index_dir, manifest.get("blob", LEGACY_BLOB)), "rb")
+            blob = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            with self._lock:
+                old_blob, old_file = self._blob, self._blob_file
+                self._codes, self._spans, self._nutrients = codes, spans, nutrients
+                self._blob, self._blob_file = blob, blob_file
+                self.generation = gen
+            if old_blob is not None:
+                old_blob.close()
+                old_file.close()
+
+            print(f"✅ Barcode index generation {gen} mapped ({manifest['count']} products)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not load barcode index: {e}")
+            return False
+
+    def lookup(self, barcode: str) -> Optional[Dict]:
+        """Product for a barcode via binary search, or None"""
+        if time.monotonic() - self._last_check > self.RELOAD_CHECK_SECONDS:
+            self.reload()
+
+        key = barcode_key(barcode)
+        if key is None or self._codes is None:
+            return None
+
+        with self._lock:
+            codes = self._codes
+            pos = int(np.searchsorted(codes, np.uint64(key)))
+            if pos >= len(codes) or int(codes[pos]) != key:
+                return None
+            offset, length = (int(v) for v in self._spans[pos])
+            fields = json.loads(self._blob[offset:offset + length].decode("utf-8"))
+            record = NutrientRecord(np.array(self._nutrients[pos], dtype=np.float32))
+
+        return {
+            "name": fields.get("product_name") or "Unknown Product",
+            "brand": fields.get("brands", ""),
+            "categories": fields.get("categories", ""),
+            "ingredients": fields.get("ingredients_text", ""),
+            "nutrition": record.to_dict(fat_key="fat"),
+            "nutrient_basis": NUTRIENT_BASIS,
+            "image_url": fields.get("image_url", ""),
+            "index_generation": self.generation
+        }
+
+    def status(self) -> Dict:
+        return {
+            "available": self.available,
+            "generation": self.generation,
+            "products": int(len(self._codes)) if self._codes is not None else 0
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Open Food Facts barcode index")
+    parser.add_argument("command", choices=["import", "delta", "lookup"])
+    parser.add_argument("target", help="export file (import/delta) or barcode (lookup)")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "lookup":
+        index = BarcodeIndex(args.index_dir)
+        started = time.perf_counter()
+        product = index.lookup(args.target)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        print(json.dumps(product, indent=2, ensure_ascii=False))
+        print(f"⏱️ {elapsed_us:.0f} µs")
+        return
+
+    builder = BarcodeIndexBuilder(args.index_dir)
+    if args.command == "import":
+        builder.import_full(args.target)
+    else:
+        builder.import_delta(args.target)
+
+
+# Global instance
+barcode_index = BarcodeIndex()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import requests
-import cv2
-import numpy as np
-from pyzbar.pyzbar import decode
 from PIL import Image
 import io
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+from barcode_cache import barcode_product_cache
+from barcode_decoder import barcode_decoder
+from barcode_index import barcode_index
+from circuit_breaker import node_backend_breaker, open_food_facts_breaker
+from nutrients import NutrientRecord, NUTRIENT_BASIS
 
 class BarcodeScannerService:
     def __init__(self):
@@ -51,34 +53,46 @@ class BarcodeScannerService:
     def decode_barcode_from_image(self, image_data: bytes) -> str:
         """Decode barcode from image using OpenCV and pyzbar"""
         try:
-            # Convert bytes to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                raise ValueError("Could not decode image")
-            
-            # Decode barcodes
-            barcodes = decode(img)
+            # Cheap downscaled/ROI passes first, full resolution only on failure
+            barcodes, _ = barcode_decoder.decode_bytes(image_data)
             
             if not barcodes:
                 return None
             
             # Return the first barcode data
-            return barcodes[0].data.decode('utf-8')
+            return barcodes[0].data
             
         except Exception as e:
             print(f"Barcode decoding error: {e}")
             return None
     
     async def get_product_from_database(self, barcode: str) -> Dict[str, Any]:
-        """Get product information from database using barcode"""
+        """Get product information for a barcode, cached across scans"""
+        cached = barcode_product_cache.get(barcode)
+        if cached is not None:
+            return cached
+        
+        product, catalog_checked = await self._resolve_product(barcode)
+        
+        source = product.get("source")
+        if source == "not_found":
+            barcode_product_cache.put_missing(barcode, product)
+        elif source != "error":
+            # Without a catalog answer the Node meals may still claim this
+            # code: keep the fallback only as long as a miss
+            ttl = None if catalog_checked else barcode_product_cache.miss_ttl
+            barcode_product_cache.put(barcode, product, ttl=ttl)
+        return product
+    
+    async def _resolve_product(self, barcode: str) -> Tuple[Dict[str, Any], bool]:
+        """Get product information from database using barcode; the flag says
+        whether the Node catalog actually answered"""
         try:
-            # First, try to find exact match in our meals database
+            # First try to find exact match in our meals database
             url = f"{self.backend_url}/api/meals/search"
             params = {'q': barcode}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = node_backend_breaker.call(requests.get, url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -93,39 +107,37 @@ class BarcodeScannerService:
                         "fat": product.get('fat', 0),
                         "source": "smart_nutritrack_database",
                         "barcode_match": "exact"
-                    }
+                    }, True
+                
+                # If not found in our database, try Open Food Facts
+                return await self._resolve_open_food_facts(barcode), True
             
-            # If not found in our database, try Open Food Facts (FREE API)
-            return await self.get_product_from_open_food_facts(barcode)
+            return await self._resolve_open_food_facts(barcode), False
             
         except Exception as e:
             print(f"Database lookup error: {e}")
-            return await self.get_product_from_open_food_facts(barcode)
+            return await self._resolve_open_food_facts(barcode), False
+    
+    async def _resolve_open_food_facts(self, barcode: str) -> Dict[str, Any]:
+        """Local Open Food Facts index first; the FREE API only for codes it lacks"""
+        product = barcode_index.lookup(barcode)
+        if product:
+            return {**product, "source": "open_food_facts", "barcode_match": "local_index"}
+        return await self.get_product_from_open_food_facts(barcode)
     
     async def get_product_from_open_food_facts(self, barcode: str) -> Dict[str, Any]:
         """Get product information from Open Food Facts API (FREE)"""
         try:
             url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-            response = requests.get(url, timeout=10)
+            response = open_food_facts_breaker.call(requests.get, url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
                 if data.get("status") == 1:
                     product = data.get("product", {})
                     
-                    # Extract nutritional information
-                    nutriments = product.get("nutriments", {})
-                    nutrition = {
-                        "calories": nutriments.get("energy-kcal_100g"),
-                        "protein": nutriments.get("proteins_100g"),
-                        "carbs": nutriments.get("carbohydrates_100g"),
-                        "fat": nutriments.get("fat_100g"),
-                        "sugar": nutriments.get("sugars_100g"),
-                        "fiber": nutriments.get("fiber_100g")
-                    }
-                    
-                    # Clean nutrition data (remove None values)
-                    nutrition = {k: v for k, v in nutrition.items() if v is not None}
+                    # Extract nutritional information (per 100 g)
+                    nutrition = NutrientRecord.from_off(product.get("nutriments", {})).to_dict(fat_key="fat")
                     
                     return {
                         "name": product.get("product_name", "Unknown Product"),
@@ -133,10 +145,19 @@ class BarcodeScannerService:
                         "categories": product.get("categories", ""),
                         "ingredients": product.get("ingredients_text", ""),
                         "nutrition": nutrition,
+                        "nutrient_basis": NUTRIENT_BASIS,
                         "image_url": product.get("image_url", ""),
                         "source": "open_food_facts",
                         "barcode_match": "external_api"
                     }
+            else:
+                # Rate limited or unavailable: not a verdict on the product
+                return {
+                    "name": "Error fetching product info",
+                    "barcode": barcode,
+                    "source": "error",
+                    "error": f"Open Food Facts returned HTTP {response.status_code}"
+                }
             
             return {
                 "name": "Product not found in database",
@@ -160,7 +181,7 @@ class BarcodeScannerService:
             url = f"{self.backend_url}/api/meals/search"
             params = {'q': product_name}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = node_backend_breaker.call(requests.get, url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
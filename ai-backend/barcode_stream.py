@@ -0,0 +1,161 @@
+# ================================
+# File: barcode_stream.py
+# WebSocket barcode scanning over a stream of camera frames
+# ================================
+#
+# Protocol (one scan per connection):
+#   client -> binary message per compressed frame (JPEG/WebP/PNG)
+#   client -> text {"type": "stop"} to end the scan early
+#   server -> {"type": "ready", ...} once, then at most one of
+#             {"type": "result", ...} / {"type": "timeout", ...}
+#             and closes the connection.
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from barcode_service import barcode_scanner_service
+
+
+def is_valid_gtin(code: str) -> bool:
+    """Check digit validation for EAN-8, UPC-A, EAN-13 and GTIN-14"""
+    if not code.isdigit() or len(code) not in (8, 12, 13, 14):
+        return False
+    digits = [int(d) for d in code]
+    body, check = digits[:-1], digits[-1]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == check
+
+
+class BarcodeStreamScanner:
+    """Decodes streamed frames until the first confident read.
+
+    - at most one decode per connection is in flight; frames arriving
+      meanwhile are dropped rather than queued
+    - frames faster than `max_fps` or larger than `max_frame_bytes` are dropped
+    - decodes run on a small shared pool, bounding total CPU use
+    - a read is confident when its GTIN check digit is valid, otherwise
+      when the same value is read `confirm_reads` times
+    """
+
+    def __init__(self, scanner_service, max_fps: float = 8.0, max_frame_bytes: int = 512 * 1024,
+                 session_seconds: float = 60.0, confirm_reads: int = 2, decode_workers: int = 2):
+        self.scanner_service = scanner_service
+        self.min_frame_interval = 1.0 / max_fps
+        self.max_frame_bytes = max_frame_bytes
+        self.session_seconds = session_seconds
+        self.confirm_reads = confirm_reads
+
+        self._executor = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="barcode-stream")
+        self.stats = {"sessions": 0, "active_sessions": 0, "reads": 0, "timeouts": 0,
+                      "frames_decoded": 0, "frames_dropped": 0}
+
+    async def run(self, websocket):
+        """Serve one scan session on an accepted WebSocket"""
+        self.stats["sessions"] += 1
+        self.stats["active_sessions"] += 1
+        session = {"received": 0, "decoded": 0, "dropped": 0, "started": time.monotonic()}
+        receive = asyncio.ensure_future(websocket.receive())
+        decode_task = None
+
+        try:
+            await websocket.send_json({
+                "type": "ready",
+                "max_fps": round(1.0 / self.min_frame_interval, 1),
+                "max_frame_bytes": self.max_frame_bytes,
+                "session_seconds": self.session_seconds
+            })
+
+            reads: Dict[str, int] = {}
+            last_accepted = 0.0
+            deadline = session["started"] + self.session_seconds
+
+            while True:
+                waiting = {receive} if decode_task is None else {receive, decode_task}
+                done, _ = await asyncio.wait(waiting, timeout=max(0.0, deadline - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.stats["timeouts"] += 1
+                    await websocket.send_json({"type": "timeout", **self._session_stats(session)})
+                    break
+
+                if decode_task is not None and decode_task in done:
+                    barcode = decode_task.result()
+                    decode_task = None
+                    session["decoded"] += 1
+                    self.stats["frames_decoded"] += 1
+                    if barcode:
+                        reads[barcode] = reads.get(barcode, 0) + 1
+                        if is_valid_gtin(barcode) or reads[barcode] >= self.confirm_reads:
+                            await self._send_result(websocket, barcode, session)
+                            break
+
+                if receive in done:
+                    message = receive.result()
+                    if message.get("type") == "websocket.disconnect":
+                        return
+                    receive = asyncio.ensure_future(websocket.receive())
+
+                    frame = message.get("bytes")
+                    if frame is None:
+                        if _is_stop(message.get("text")):
+                            break
+                        continue
+
+                    session["received"] += 1
+                    now = time.monotonic()
+                    if (decode_task is not None
+                            or now - last_accepted < self.min_frame_interval
+                            or len(frame) > self.max_frame_bytes):
+                        session["dropped"] += 1
+                        self.stats["frames_dropped"] += 1
+                        continue
+
+                    last_accepted = now
+                    decode_task = asyncio.get_running_loop().run_in_executor(
+                        self._executor, self.scanner_service.decode_barcode_from_image, frame
+                    )
+
+            await websocket.close()
+        finally:
+            receive.cancel()
+            self.stats["active_sessions"] -= 1
+
+    async def _send_result(self, websocket, barcode: str, session: Dict[str, Any]):
+        self.stats["reads"] += 1
+        product = await self.scanner_service.get_product_from_database(barcode)
+        await websocket.send_json({
+            "type": "result",
+            "success": True,
+            "data": {
+                "barcode": barcode,
+                "product": product,
+                "scan_type": "barcode_stream"
+            },
+            **self._session_stats(session)
+        })
+
+    @staticmethod
+    def _session_stats(session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "frames_received": session["received"],
+            "frames_decoded": session["decoded"],
+            "frames_dropped": session["dropped"],
+            "elapsed_seconds": round(time.monotonic() - session["started"], 2)
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+def _is_stop(text: Optional[str]) -> bool:
+    try:
+        return json.loads(text or "{}").get("type") == "stop"
+    except (ValueError, AttributeError):
+        return False
+
+
+# Global instance
+barcode_stream_scanner = BarcodeStreamScanner(barcode_scanner_service)
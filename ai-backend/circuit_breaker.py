@@ -0,0 +1,238 @@
+# ================================
+# File: circuit_breaker.py
+# Per-provider circuit breakers for external APIs
+# ================================
+
+import asyncio
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} circuit open, retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Error-rate and latency based breaker with half-open probing.
+
+    States:
+        closed    - calls pass through, outcomes are recorded in a sliding window
+        open      - calls are short-circuited with CircuitOpenError
+        half_open - a limited number of probe calls decide whether to close again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # HTTP statuses counted as provider failures (429 = rate limited)
+    FAILURE_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, slow_call_seconds: float = 3.0,
+                 slow_rate_threshold: float = 0.5, open_seconds: float = 30.0,
+                 half_open_max_calls: int = 1, max_retry_after: float = 600.0):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.max_retry_after = max_retry_after
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = self.CLOSED
+        self._opened_until = 0.0
+        self._half_open_in_flight = 0
+        self._last_error = None
+        self._short_circuited = 0
+        self._times_opened = 0
+
+    # ---------- state ----------
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() >= self._opened_until:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+        return self._state
+
+    def _open(self, seconds: float, reason: str):
+        self._state = self.OPEN
+        self._opened_until = time.monotonic() + seconds
+        self._window.clear()
+        self._times_opened += 1
+        self._last_error = reason
+        print(f"🔌 Circuit '{self.name}' OPEN for {seconds:.0f}s: {reason}")
+
+    def allow_request(self) -> bool:
+        """Reserve a call slot; False means the call must be short-circuited"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            self._short_circuited += 1
+            return False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self._opened_until - time.monotonic())
+
+    def record_success(self, duration: float):
+        with self._lock:
+            slow = duration >= self.slow_call_seconds
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                if slow:
+                    self._open(self.open_seconds, f"slow probe ({duration:.1f}s)")
+                else:
+                    self._state = self.CLOSED
+                    self._window.clear()
+                    print(f"🔌 Circuit '{self.name}' CLOSED after successful probe")
+                return
+            self._window.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self, duration: float, error: str, retry_after: Optional[float] = None):
+        with self._lock:
+            if retry_after is not None:
+                # Provider told us exactly how long to back off
+                self._open(min(retry_after, self.max_retry_after), f"{error} (Retry-After)")
+                return
+            if self._state == self.HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._open(self.open_seconds, f"probe failed: {error}")
+                return
+            self._last_error = error
+            self._window.append((True, duration >= self.slow_call_seconds))
+            self._evaluate()
+
+    def _evaluate(self):
+        calls = len(self._window)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        if failures / calls >= self.failure_rate_threshold:
+            self._open(self.open_seconds, f"error rate {failures}/{calls}")
+        elif slow / calls >= self.slow_rate_threshold:
+            self._open(self.open_seconds, f"slow call rate {slow}/{calls}")
+
+    # ---------- calls ----------
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a requests-style call through the breaker.
+
+        Responses with a failure status are recorded as failures but still
+        returned, so callers keep their existing status_code handling.
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+        start = time.monotonic()
+        try:
+            response = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(time.monotonic() - start, f"{type(e).__name__}: {e}")
+            raise
+
+        self._record_response(response, time.monotonic() - start)
+        return response
+
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """Async counterpart of call() for httpx-style clients"""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+        start = time.monotonic()
+        try:
+            response = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Abandoned by the caller (e.g. a deadline), not a provider failure;
+            # release a half-open probe slot without judging the provider
+            with self._lock:
+                if self._state == self.HALF_OPEN:
+                    self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            raise
+        except Exception as e:
+            self.record_failure(time.monotonic() - start, f"{type(e).__name__}: {e}")
+            raise
+
+        self._record_response(response, time.monotonic() - start)
+        return response
+
+    def _record_response(self, response: Any, duration: float):
+        status = getattr(response, "status_code", 200)
+        if status in self.FAILURE_STATUSES:
+            headers = getattr(response, "headers", None) or {}
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            self.record_failure(duration, f"HTTP {status}", retry_after)
+        else:
+            self.record_success(duration)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._window)
+            failures = sum(1 for failed, _ in self._window if failed)
+            slow = sum(1 for _, is_slow in self._window if is_slow)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "error_rate": round(failures / calls, 3) if calls else 0.0,
+                "slow_rate": round(slow / calls, 3) if calls else 0.0,
+                "retry_in_seconds": round(max(0.0, self._opened_until - time.monotonic()), 1)
+                if state == self.OPEN else 0.0,
+                "times_opened": self._times_opened,
+                "short_circuited": self._short_circuited,
+                "last_error": self._last_error
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Global per-provider breakers
+usda_breaker = CircuitBreaker("usda", slow_call_seconds=4.0)
+open_food_facts_breaker = CircuitBreaker("open_food_facts", slow_call_seconds=4.0)
+node_backend_breaker = CircuitBreaker("node_backend", slow_call_seconds=2.0, open_seconds=15.0)
+
+circuit_breakers = {
+    breaker.name: breaker
+    for breaker in (usda_breaker, open_food_facts_breaker, node_backend_breaker)
+}
+
+
+def circuit_breaker_status() -> Dict[str, Dict[str, Any]]:
+    """State of every provider breaker, for health endpoints"""
+    return {name: breaker.snapshot() for name, breaker in circuit_breakers.items()}
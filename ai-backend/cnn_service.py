@@ -7,6 +7,8 @@ from tensorflow.keras.preprocessing import image
 import h5py
 import json
 import os
+from circuit_breaker import usda_breaker, open_food_facts_breaker
+from nutrients import NutrientRecord, NUTRIENT_BASIS
 
 class CNNService:
     def __init__(self):
@@ -233,7 +235,7 @@ class CNNService:
                 'pageSize': 1
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = usda_breaker.call(requests.get, url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('foods') and len(data['foods']) > 0:
@@ -245,6 +247,7 @@ class CNNService:
                             "success": True,
                             "food_name": food.get('description', food_name),
                             "nutrients": nutrients,
+                            "nutrient_basis": NUTRIENT_BASIS,
                             "source": "USDA FoodData Central",
                             "serving_size": food.get('servingSize', 'N/A'),
                             "serving_unit": food.get('servingSizeUnit', 'N/A')
@@ -266,7 +269,7 @@ class CNNService:
                 'sort_by': 'unique_scans_n'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = open_food_facts_breaker.call(requests.get, url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('products') and len(data['products']) > 0:
@@ -278,6 +281,7 @@ class CNNService:
                             "success": True,
                             "food_name": product.get('product_name', food_name),
                             "nutrients": nutrients,
+                            "nutrient_basis": NUTRIENT_BASIS,
                             "source": "Open Food Facts",
                             "brand": product.get('brands', ''),
                             "ingredients": product.get('ingredients_text', '')
@@ -296,6 +300,7 @@ class CNNService:
                 "success": True,
                 "food_name": food_name,
                 "nutrients": estimated_nutrition,
+                "nutrient_basis": NUTRIENT_BASIS,
                 "source": "Estimated (Category Averages)",
                 "note": "Based on food category - retry APIs for real data"
             }
@@ -305,53 +310,18 @@ class CNNService:
     
     def extract_usda_nutrients(self, food):
         """Extract REAL nutrients from USDA API"""
-        nutrients = {}
-        for nutrient in food.get('foodNutrients', []):
-            name = nutrient.get('nutrientName', '')
-            value = nutrient.get('value', 0)
-            unit = nutrient.get('unitName', '')
-            
-            if 'Energy' in name and 'kcal' in unit.lower():
-                nutrients['calories'] = f"{value} {unit}"
-            elif 'Protein' in name:
-                nutrients['protein'] = f"{value} {unit}"
-            elif 'Total lipid' in name or 'Fat' in name:
-                nutrients['fat'] = f"{value} {unit}"
-            elif 'Carbohydrate' in name:
-                nutrients['carbs'] = f"{value} {unit}"
-            elif 'Fiber' in name:
-                nutrients['fiber'] = f"{value} {unit}"
-            elif 'Sugars' in name:
-                nutrients['sugar'] = f"{value} {unit}"
-        
-        return nutrients
+        return NutrientRecord.from_usda(food).to_dict()
     
     def extract_off_nutrients(self, product):
         """Extract REAL nutrients from Open Food Facts"""
-        nutriments = product.get('nutriments', {})
-        nutrients = {}
-        
-        if nutriments.get('energy-kcal_100g'):
-            nutrients['calories'] = f"{nutriments['energy-kcal_100g']} kcal/100g"
-        if nutriments.get('proteins_100g'):
-            nutrients['protein'] = f"{nutriments['proteins_100g']}g/100g"
-        if nutriments.get('fat_100g'):
-            nutrients['fat'] = f"{nutriments['fat_100g']}g/100g"
-        if nutriments.get('carbohydrates_100g'):
-            nutrients['carbs'] = f"{nutriments['carbohydrates_100g']}g/100g"
-        if nutriments.get('fiber_100g'):
-            nutrients['fiber'] = f"{nutriments['fiber_100g']}g/100g"
-        if nutriments.get('sugars_100g'):
-            nutrients['sugar'] = f"{nutriments['sugars_100g']}g/100g"
-        
-        return nutrients
+        return NutrientRecord.from_off(product.get('nutriments', {})).to_dict()
     
     def estimate_nutrition(self, food_name):
         """Estimate nutrition - ONLY USED WHEN APIS FAIL"""
         nutrition_estimates = {
-            'fruit': {'calories': '52 kcal', 'protein': '0.8g', 'carbs': '14g', 'fat': '0.2g'},
-            'vegetable': {'calories': '35 kcal', 'protein': '1.5g', 'carbs': '7g', 'fat': '0.2g'},
-            'default': {'calories': '80 kcal', 'protein': '2g', 'carbs': '15g', 'fat': '0.5g'}
+            'fruit': {'calories': 52.0, 'protein': 0.8, 'carbs': 14.0, 'fats': 0.2},
+            'vegetable': {'calories': 35.0, 'protein': 1.5, 'carbs': 7.0, 'fats': 0.2},
+            'default': {'calories': 80.0, 'protein': 2.0, 'carbs': 15.0, 'fats': 0.5}
         }
         
         category = self.get_category(food_name)
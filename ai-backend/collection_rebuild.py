@@ -0,0 +1,305 @@
+# ================================
+# File: collection_rebuild.py
+# Blue/green rebuilds of the meal vector collection
+# ================================
+#
+# The served collection is named by a pointer file in the database
+# directory, so restarts keep serving whatever was switched to last:
+#   <db>/active_collections.json
+#     {"meal_database": {"active": "meal_database__20261018T120000",
+#                        "previous": "meal_database", "retired_at": 1760789000.0}}
+#
+# A rebuild fills a new collection next to the live one, warms and
+# smoke-tests it, then swaps it into the running MealPlanningSystem in
+# one step. The previous collection stays available for rollback until
+# COLLECTION_ROLLBACK_TTL expires. Catalog writes made while a rebuild
+# runs go to the live collection; the rebuild reads the CSV/snapshot.
+# Collections built elsewhere (vector_maintenance.py) are switched to
+# through the same smoke test with switch_to().
+
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+from langchain_community.vectorstores import Chroma
+
+from config import Config
+from food_retriever import MEAL_TYPES, FoodRetriever, meal_filter
+from ingest import ingest_catalog, load_suppressed_ids
+from vector_backends import create_backend, index_dir_for
+from vector_snapshot import import_snapshot
+
+POINTER_FILE = "active_collections.json"
+DROP_GRACE_SECONDS = 30
+
+
+def _pointer_path(db_location: str) -> str:
+    return os.path.join(db_location, POINTER_FILE)
+
+
+def read_pointers(db_location: str) -> Dict:
+    try:
+        with open(_pointer_path(db_location), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_pointers(db_location: str, pointers: Dict):
+    tmp_path = f"{_pointer_path(db_location)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pointers, f, indent=2)
+    os.replace(tmp_path, _pointer_path(db_location))
+
+
+def resolve_collection_name(db_location: str, logical_name: str = Config.COLLECTION_NAME) -> str:
+    """Physical collection currently serving `logical_name`"""
+    return read_pointers(db_location).get(logical_name, {}).get("active", logical_name)
+
+
+def record_switch(db_location: str, logical_name: str, active: str,
+                  previous: Optional[str]) -> Optional[str]:
+    """Point `logical_name` at `active`, keeping `previous` for rollback.
+
+    Only one rollback generation is kept: returns the older previous
+    collection this supersedes, which the caller should drop.
+    """
+    pointers = read_pointers(db_location)
+    superseded = pointers.get(logical_name, {}).get("previous")
+    pointers[logical_name] = {"active": active}
+    if previous:
+        pointers[logical_name].update({"previous": previous, "retired_at": time.time()})
+    _write_pointers(db_location, pointers)
+    return superseded if superseded not in (None, previous, active) else None
+
+
+def drop_collection(client, collection_name: str):
+    """Delete a collection and its NumPy index directory"""
+    try:
+        client.delete_collection(collection_name)
+        print(f"🗑️  Dropped collection '{collection_name}'")
+    except Exception as e:
+        print(f"⚠️  Could not drop collection '{collection_name}': {e}")
+    index_dir = os.path.join(Config.VECTOR_INDEX_DIR, collection_name)
+    if os.path.isdir(index_dir):
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+class CollectionRebuilder:
+    """Builds, validates and hot-swaps the collection behind a MealPlanningSystem"""
+
+    def __init__(self, system, csv_path: str = "./meal_data.csv",
+                 rollback_ttl: float = Config.COLLECTION_ROLLBACK_TTL):
+        self.system = system
+        self.db_location = system.db_location
+        self.logical_name = Config.COLLECTION_NAME
+        self.csv_path = csv_path
+        self.rollback_ttl = rollback_ttl
+
+        self._rebuild_lock = threading.Lock()
+        self._drop_timer: Optional[threading.Timer] = None
+        self.last_result: Optional[Dict] = None
+        self.running = False
+
+        self.drop_expired()
+
+    # ---------- rebuild ----------
+
+    def start(self, snapshot_path: Optional[str] = None) -> bool:
+        """Rebuild in a background thread; False if one is already running"""
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        self.running = True
+        threading.Thread(target=self._run, args=(snapshot_path,), daemon=True,
+                         name="collection-rebuild").start()
+        return True
+
+    def _run(self, snapshot_path: Optional[str]):
+        try:
+            self.last_result = self.rebuild(snapshot_path)
+        except Exception as e:
+            print(f"❌ Collection rebuild failed: {e}")
+            self.last_result = {"success": False, "error": str(e), "finished_at": time.time()}
+        finally:
+            self.running = False
+            self._rebuild_lock.release()
+
+    def rebuild(self, snapshot_path: Optional[str] = None) -> Dict:
+        started = time.time()
+        live_name = self.system.vector_store._collection.name
+        new_name = f"{self.logical_name}__{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}"
+        print(f"🔄 Rebuilding '{self.logical_name}' into '{new_name}' (live: '{live_name}')...")
+
+        new_store = self._open(new_name)
+        if snapshot_path:
+            import_snapshot(new_store, snapshot_path, self.db_location, force=True)
+        else:
+            # One worker: this runs inside the serving process, which has
+            # request threads and a loaded model, so forking encoders is unsafe
+            ingest_catalog(new_store, self.csv_path, workers=1,
+                           index_dir=index_dir_for(new_store) if Config.VECTOR_BACKEND == "numpy" else None,
+                           suppressed_ids=load_suppressed_ids(self.db_location, self.logical_name))
+
+        result = self._validate_and_activate(new_store, live_name, started)
+        if not result["success"]:
+            self._drop(new_name)
+        return result
+
+    def switch_to(self, collection_name: str, drop_previous: bool = False) -> Dict:
+        """Serve an already-built collection (e.g. from vector_maintenance.py).
+
+        Goes through the same warm-up and smoke test as a rebuild. With
+        drop_previous the old collection is dropped after a short grace
+        period instead of being kept for rollback.
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            return {"success": False, "message": "A rebuild is already running"}
+        try:
+            live_name = self.system.vector_store._collection.name
+            if collection_name == live_name:
+                return {"success": False, "message": f"'{collection_name}' is already being served"}
+            if collection_name not in self._collection_names():
+                return {"success": False, "message": f"Collection '{collection_name}' does not exist"}
+            print(f"🔄 Switching '{self.logical_name}' to '{collection_name}' (live: '{live_name}')...")
+            return self._validate_and_activate(self._open(collection_name), live_name, time.time(),
+                                               drop_previous=drop_previous)
+        finally:
+            self._rebuild_lock.release()
+
+    def _validate_and_activate(self, new_store, live_name: str, started: float,
+                               drop_previous: bool = False) -> Dict:
+        new_name = new_store._collection.name
+        # Building the retriever warms its default pools and name index
+        # before any request can reach it
+        backend = create_backend(new_store)
+        retriever = FoodRetriever(new_store, backend)
+        smoke = self.smoke_test(retriever, live_count=self.system.vector_store._collection.count())
+        if not smoke["passed"]:
+            return {"success": False, "collection": new_name, "smoke_test": smoke,
+                    "message": "Smoke test failed - live collection kept", "finished_at": time.time()}
+
+        self._activate(new_store, backend, retriever, previous=None if drop_previous else live_name)
+        if drop_previous:
+            # Requests that read the old store just before the swap finish first
+            timer = threading.Timer(DROP_GRACE_SECONDS, self._drop, args=(live_name,))
+            timer.daemon = True
+            timer.start()
+        print(f"✅ Switched '{self.logical_name}' to '{new_name}' ({smoke['documents']} documents)")
+        return {"success": True, "collection": new_name, "previous": live_name,
+                "previous_kept": not drop_previous, "smoke_test": smoke,
+                "seconds": round(time.time() - started, 2), "finished_at": time.time()}
+
+    def smoke_test(self, retriever: FoodRetriever, live_count: int = 0) -> Dict:
+        """Every meal type answers a default query with items of its own category,
+        and the new collection is not much smaller than the live one"""
+        documents = retriever.vector_store._collection.count()
+        checks = {"documents": documents > 0}
+        if live_count:
+            checks["size_vs_live"] = documents >= live_count * Config.REBUILD_MIN_SIZE_RATIO
+
+        queries = [retriever.default_query(meal_type) for meal_type in MEAL_TYPES]
+        filters = None
+        if retriever.typed_metadata:
+            filters = [meal_filter(meal_type, 10000) for meal_type in MEAL_TYPES]
+        results = retriever.search_many(queries, k=3, filters=filters)
+        for meal_type, docs in zip(MEAL_TYPES, results):
+            checks[f"query_{meal_type}"] = bool(docs) and (
+                not retriever.typed_metadata
+                or all((doc.metadata or {}).get("category") == meal_type for doc in docs)
+            )
+
+        return {"passed": all(checks.values()), "documents": documents, "checks": checks}
+
+    # ---------- switching ----------
+
+    def _open(self, collection_name: str):
+        return Chroma(
+            collection_name=collection_name,
+            persist_directory=self.db_location,
+            embedding_function=self.system.embeddings
+        )
+
+    def _activate(self, vector_store, backend, retriever, previous: Optional[str]):
+        self.system.swap_vector_store(vector_store, backend, retriever)
+        superseded = record_switch(self.db_location, self.logical_name,
+                                   vector_store._collection.name, previous)
+        if superseded:
+            self._drop(superseded)
+        self._schedule_drop()
+
+    def rollback(self) -> Dict:
+        """Switch back to the previous collection while it is still kept"""
+        with self._rebuild_lock:
+            entry = read_pointers(self.db_location).get(self.logical_name, {})
+            previous = entry.get("previous")
+            if not previous:
+                return {"success": False, "message": "No previous collection to roll back to"}
+            if previous not in self._collection_names():
+                return {"success": False, "message": f"Previous collection '{previous}' was already dropped"}
+
+            current = self.system.vector_store._collection.name
+            store = self._open(previous)
+            backend = create_backend(store)
+            retriever = FoodRetriever(store, backend)
+            # The collection rolled back from is kept for the TTL in turn
+            self._activate(store, backend, retriever, previous=current)
+            print(f"↩️  Rolled '{self.logical_name}' back to '{previous}'")
+            return {"success": True, "collection": previous, "previous": current}
+
+    # ---------- retention ----------
+
+    def _collection_names(self):
+        client = self.system.vector_store._client
+        return {getattr(c, "name", c) for c in client.list_collections()}
+
+    def _schedule_drop(self):
+        if self._drop_timer is not None:
+            self._drop_timer.cancel()
+        self._drop_timer = threading.Timer(self.rollback_ttl + 1, self.drop_expired)
+        self._drop_timer.daemon = True
+        self._drop_timer.start()
+
+    def drop_expired(self) -> Optional[str]:
+        """Drop the rollback collection once its TTL has passed"""
+        with self._rebuild_lock:
+            return self._drop_expired()
+
+    def _drop_expired(self) -> Optional[str]:
+        pointers = read_pointers(self.db_location)
+        entry = pointers.get(self.logical_name, {})
+        previous = entry.get("previous")
+        if not previous:
+            return None
+        remaining = entry.get("retired_at", 0) + self.rollback_ttl - time.time()
+        if remaining > 0:
+            if self._drop_timer is None:
+                self._drop_timer = threading.Timer(remaining + 1, self.drop_expired)
+                self._drop_timer.daemon = True
+                self._drop_timer.start()
+            return None
+
+        if previous != self.system.vector_store._collection.name:
+            self._drop(previous)
+        entry.pop("previous", None)
+        entry.pop("retired_at", None)
+        _write_pointers(self.db_location, pointers)
+        return previous
+
+    def _drop(self, collection_name: str):
+        drop_collection(self.system.vector_store._client, collection_name)
+
+    def status(self) -> Dict:
+        entry = read_pointers(self.db_location).get(self.logical_name, {})
+        retired_at = entry.get("retired_at")
+        return {
+            "logical_collection": self.logical_name,
+            "active_collection": self.system.vector_store._collection.name,
+            "previous_collection": entry.get("previous"),
+            "rollback_expires_in": (round(retired_at + self.rollback_ttl - time.time())
+                                    if retired_at and entry.get("previous") else None),
+            "rebuild_running": self.running,
+            "last_rebuild": self.last_result
+        }
@@ -14,6 +14,50 @@ class Config:
 
     # Database settings
     COLLECTION_NAME = "meal_database"
+    VECTOR_DB_LOCATION = os.getenv("VECTOR_DB_LOCATION", "./chroma_db")
+    # Collection behind ProfessionalFoodService meal recommendations
+    # (the meal catalog unless pointed at another populated collection)
+    FOODS_DB_LOCATION = os.getenv("FOODS_DB_LOCATION", VECTOR_DB_LOCATION)
+    FOODS_COLLECTION_NAME = os.getenv("FOODS_COLLECTION_NAME", COLLECTION_NAME)
+    # Prebuilt snapshot (vector_snapshot.py) loaded at startup instead of re-embedding
+    VECTOR_SNAPSHOT_PATH = os.getenv("VECTOR_SNAPSHOT_PATH", "")
+    # Blue/green rebuilds: keep the previous collection this long for rollback
+    COLLECTION_ROLLBACK_TTL = float(os.getenv("COLLECTION_ROLLBACK_TTL", str(24 * 3600)))
+    REBUILD_MIN_SIZE_RATIO = 0.5       # new collection must hold >= 50% of the live one
+    # Sent as X-Admin-Token to /api/admin/*; the admin endpoints refuse every
+    # request while it is unset
+    ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+    # Rebuilds only load snapshots from under this directory
+    VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./snapshots")
+    # vector_maintenance.py: near-duplicates are at least this cosine-similar
+    # and within this relative calorie difference
+    DEDUPE_SIMILARITY = float(os.getenv("DEDUPE_SIMILARITY", "0.97"))
+    DEDUPE_CALORIE_TOLERANCE = 0.10
+
+    # Embedding settings (shared by the vector store and the input parser)
+    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")   # "torch" or "onnx"
+    ONNX_MODEL_DIR = os.getenv(
+        "ONNX_MODEL_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_minilm")
+    )
+    PATTERN_EMBEDDINGS_PATH = os.getenv(
+        "PATTERN_EMBEDDINGS_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_embeddings.npy")
+    )
+    # Encoder processes for catalog ingests (1 = embed in the calling process)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+
+    # Retrieval backend: "chroma" or "numpy" (in-process float16 index exported from Chroma)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+    VECTOR_INDEX_DIR = os.getenv(
+        "VECTOR_INDEX_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_index")
+    )
+    # Storage for the NumPy index: float32, float16 or int8 (scalar-quantized);
+    # compact dtypes re-rank the top k * VECTOR_RERANK_FACTOR in float32
+    VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float16")
+    VECTOR_RERANK_FACTOR = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
 
     # Default calorie distribution
     CALORIE_DISTRIBUTION = {
@@ -34,4 +78,11 @@ class Config:
     # Retrieval settings
     MAX_CANDIDATES_PER_MEAL = 6
     RETRIEVAL_K = 10
+    # Adaptive retrieval: start small, widen k until enough in-budget candidates
+    ADAPTIVE_START_K = 6
+    ADAPTIVE_GROWTH_FACTOR = 2
+    ADAPTIVE_MAX_K = 80
+    DEFAULT_POOL_K = 30                # precomputed candidates per meal for generic requests
+    QUERY_EMBEDDING_CACHE_SIZE = 1024
+    RETRIEVAL_CACHE_SIZE = 512
     CALORIE_FLEXIBILITY_FACTOR = 1.5  # Allow items up to 150% of target calories
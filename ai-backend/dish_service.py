@@ -4,6 +4,9 @@ from PIL import Image
 import io
 import requests
 from typing import List, Dict, Any
+from circuit_breaker import CircuitOpenError, usda_breaker, open_food_facts_breaker
+from nutrients import NutrientRecord, NUTRIENT_BASIS
+from label_resolution import label_resolution_table
 
 class DishRecognitionService:
     def __init__(self):
@@ -132,6 +135,22 @@ class DishRecognitionService:
             clean_name = dish_name.lower().strip()
             print(f"🔍 Getting nutrition for: {clean_name}")
             
+            # ImageNet labels resolve from the precomputed table, no search needed
+            entry = label_resolution_table.lookup(dish_name)
+            if entry:
+                print(f"📚 Precomputed nutrition for {clean_name}: {entry['description']}")
+                return {
+                    'success': True,
+                    'food_name': entry['description'],
+                    'nutrients': dict(entry['nutrients']),
+                    'nutrient_basis': entry['nutrient_basis'],
+                    'source': 'USDA FoodData Central',
+                    'fdc_id': entry['fdc_id'],
+                    'resolution': label_resolution_table.version,
+                    'serving_size': 100,
+                    'serving_unit': 'g'
+                }
+            
             # Try USDA API first
             usda_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
             params = {
@@ -141,33 +160,22 @@ class DishRecognitionService:
             }
             
             print("🌐 Trying USDA API...")
-            response = requests.get(usda_url, params=params, timeout=10)
-            if response.status_code == 200:
+            try:
+                response = usda_breaker.call(requests.get, usda_url, params=params, timeout=10)
+            except CircuitOpenError as e:
+                print(f"⏭️ Skipping USDA API: {e}")
+                response = None
+
+            if response is not None and response.status_code == 200:
                 data = response.json()
                 if data['foods']:
                     print(f"✅ USDA API found {len(data['foods'])} foods")
                     best_match = data['foods'][0]
-                    nutrients = {}
-                    
-                    for nutrient in best_match.get('foodNutrients', []):
-                        name = nutrient.get('nutrientName', '')
-                        value = nutrient.get('value', 0)
-                        unit = nutrient.get('unitName', '')
-                        
-                        if 'Energy' in name and ('kcal' in unit.lower() or 'calorie' in name.lower()):
-                            nutrients['calories'] = f"{value} {unit}"
-                        elif 'Protein' in name:
-                            nutrients['protein'] = f"{value} {unit}"
-                        elif 'Total lipid' in name or 'Fat' in name or 'Fatty acids' in name:
-                            nutrients['fats'] = float(value) if value else 0
-                        elif 'Carbohydrate' in name:
-                            nutrients['carbs'] = f"{value} {unit}"
-                        elif 'Fiber' in name:
-                            nutrients['fiber'] = f"{value} {unit}"
+                    record = NutrientRecord.from_usda(best_match)
 
                     # FIX: Ensure we have fats value
-                    print(f"🔍 Checking fats value for {clean_name}: {nutrients.get('fats', 'not set')}")
-                    if nutrients.get('fats', 0) == 0:
+                    print(f"🔍 Checking fats value for {clean_name}: {record.get('fats', 'not set')}")
+                    if not record.get('fats'):
                         print(f"🔄 Fat fallback triggered for {clean_name}")
                         # Use known fat values for common foods
                         known_fat_values = {
@@ -178,16 +186,18 @@ class DishRecognitionService:
                         
                         for food, fat_value in known_fat_values.items():
                             if food in clean_name:
-                                nutrients['fats'] = fat_value
+                                record.set('fats', fat_value)
                                 print(f"✅ Using known fat value for {clean_name}: {fat_value}g")
                                 break
                     
+                    nutrients = record.to_dict()
                     if nutrients:
                         print(f"📊 USDA returning nutrients: {nutrients}")
                         return {
                             'success': True,
                             'food_name': best_match.get('description', dish_name),
                             'nutrients': nutrients,
+                            'nutrient_basis': NUTRIENT_BASIS,
                             'source': 'USDA FoodData Central',
                             'serving_size': best_match.get('servingSize', 'N/A'),
                             'serving_unit': best_match.get('servingSizeUnit', 'N/A')
@@ -195,7 +205,7 @@ class DishRecognitionService:
                     
                     else:
                        print("❌ USDA API found no foods")
-            else:
+            elif response is not None:
                 print(f"❌ USDA API failed: {response.status_code}")   
             
             print("🌐 Trying Open Food Facts API...")
@@ -207,29 +217,20 @@ class DishRecognitionService:
                 'page_size': 2
             }
             
-            response = requests.get(off_url, params=params, timeout=10)
+            response = open_food_facts_breaker.call(requests.get, off_url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data['products']:
                     print(f"✅ Open Food Facts found {len(data['products'])} products")
                     product = data['products'][0]
-                    nutrients = product.get('nutriments', {})
-                    print(f"📊 Open Food Facts nutrients: {nutrients}")
-                    
-                    nutrition_data = {}
-                    if nutrients.get('energy-kcal_100g'):
-                        nutrition_data['calories'] = f"{nutrients['energy-kcal_100g']} kcal/100g"
-                    if nutrients.get('proteins_100g'):
-                        nutrition_data['protein'] = f"{nutrients['proteins_100g']}g/100g"
-                    if nutrients.get('fats_100g'):
-                        nutrition_data['fats'] = f"{nutrients['fats_100g']}g/100g"
-                    if nutrients.get('carbohydrates_100g'):
-                        nutrition_data['carbs'] = f"{nutrients['carbohydrates_100g']}g/100g"
+                    nutriments = product.get('nutriments', {})
+                    print(f"📊 Open Food Facts nutrients: {nutriments}")
                     
-                    print(f"📋 Nutrition data before fallback: {nutrition_data}")
+                    record = NutrientRecord.from_off(nutriments)
+                    print(f"📋 Nutrition data before fallback: {record}")
 
 
-                    if 'fats' not in nutrition_data:
+                    if not record.has('fats'):
                         print(f"🔄 Open Food Facts missing fats for {clean_name}, adding fallback")
                         known_fat_values = {
                             'pizza': 8.0, 'burger': 12.0, 'pasta': 2.0, 'sandwich': 10.0,
@@ -239,10 +240,11 @@ class DishRecognitionService:
                         
                         for food, fat_value in known_fat_values.items():
                             if food in clean_name:
-                                nutrition_data['fats'] = f"{fat_value}g/100g"
+                                record.set('fats', fat_value)
                                 print(f"✅ Added fat value for {clean_name}: {fat_value}g")
                                 break
                     
+                    nutrition_data = record.to_dict()
                     print(f"📋 Nutrition data after fallback: {nutrition_data}")
                     
                     if nutrition_data:
@@ -250,6 +252,7 @@ class DishRecognitionService:
                             'success': True,
                             'food_name': product.get('product_name', dish_name),
                             'nutrients': nutrition_data,
+                            'nutrient_basis': NUTRIENT_BASIS,
                             'source': 'Open Food Facts',
                             'serving_size': '100g',
                             'serving_unit': 'g'
@@ -0,0 +1,163 @@
+# ================================
+# File: embedding_service.py
+# Process-wide shared sentence embedding model
+# ================================
+#
+# EMBEDDING_BACKEND selects the encoder:
+#   torch  sentence-transformers (PyTorch)
+#   onnx   INT8-quantized export on ONNX Runtime (see onnx_encoder.py);
+#          torch is never imported on this path
+
+import importlib.util
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+
+# Checked without importing: importing sentence-transformers pulls in torch
+TORCH_EMBEDDINGS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+ONNX_EMBEDDINGS_AVAILABLE = (importlib.util.find_spec("onnxruntime") is not None
+                             and importlib.util.find_spec("tokenizers") is not None)
+
+if Config.EMBEDDING_BACKEND == "onnx":
+    EMBEDDINGS_AVAILABLE = ONNX_EMBEDDINGS_AVAILABLE or TORCH_EMBEDDINGS_AVAILABLE
+else:
+    EMBEDDINGS_AVAILABLE = TORCH_EMBEDDINGS_AVAILABLE
+
+if not EMBEDDINGS_AVAILABLE:
+    print("⚠️  Warning: sentence-transformers not available. Install with:")
+    print("   pip install sentence-transformers")
+
+
+class _SentenceTransformerEncoder:
+    def __init__(self, model_name: str, threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(list(texts), batch_size=batch_size,
+                              normalize_embeddings=normalize, show_progress_bar=False),
+            dtype=np.float32
+        )
+
+
+class EmbeddingService(Embeddings):
+    """One lazily loaded encoder (PyTorch or ONNX) shared by the whole process.
+
+    Doubles as a LangChain embedding function, so the same instance backs
+    the Chroma stores, the input parser and the food service.
+    """
+
+    def __init__(self, model_name: str = Config.EMBEDDING_MODEL,
+                 query_cache_size: int = Config.QUERY_EMBEDDING_CACHE_SIZE,
+                 backend: str = Config.EMBEDDING_BACKEND, threads: int = 0):
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads  # 0 = runtime default (all cores)
+        self._encoder = None
+        self._load_lock = threading.Lock()
+
+        # LRU of query text -> vector; queries repeat far more than documents
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.query_cache_stats = {"hits": 0, "misses": 0}
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    self._encoder = self._load_encoder()
+        return self._encoder
+
+    def _load_encoder(self):
+        if self.backend == "onnx":
+            try:
+                from onnx_encoder import OnnxSentenceEncoder
+                encoder = OnnxSentenceEncoder(Config.ONNX_MODEL_DIR, threads=self.threads)
+                print(f"   🧠 Loaded ONNX INT8 encoder for {self.model_name} from {Config.ONNX_MODEL_DIR}")
+                return encoder
+            except Exception as e:
+                print(f"   ⚠️  ONNX encoder unavailable ({e}), falling back to PyTorch")
+                self.backend = "torch"
+
+        if not TORCH_EMBEDDINGS_AVAILABLE:
+            raise RuntimeError("sentence-transformers is not installed")
+        print(f"   🧠 Loading embedding model {self.model_name}...")
+        return _SentenceTransformerEncoder(self.model_name, threads=self.threads)
+
+    @property
+    def dimension(self) -> int:
+        return self.encoder.dimension
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
+        """(len(texts), dimension) float32 matrix, L2-normalized by default"""
+        return self.encoder.encode(texts, batch_size=batch_size, normalize=normalize)
+
+    def encode_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Normalized query vectors; only uncached queries reach the model (in one batch)"""
+        vectors: List[Optional[np.ndarray]] = [None] * len(queries)
+        missing = []
+        with self._query_lock:
+            for i, query in enumerate(queries):
+                cached = self._query_cache.get(query)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._query_cache.move_to_end(query)
+                    vectors[i] = cached
+            self.query_cache_stats["hits"] += len(queries) - len(missing)
+            self.query_cache_stats["misses"] += len(missing)
+
+        if missing:
+            encoded = self.encode([queries[i] for i in missing])
+            with self._query_lock:
+                for i, vector in zip(missing, encoded):
+                    vectors[i] = vector
+                    self._query_cache[queries[i]] = vector
+                    self._query_cache.move_to_end(queries[i])
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def identity(self) -> dict:
+        """What produced the vectors; stored next to precomputed artifacts"""
+        return {"model": self.model_name, "dimension": self.dimension, "backend": self.backend}
+
+    # ---------- LangChain Embeddings interface ----------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode_queries([text])[0].tolist()
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
+    """Shared instance per model name"""
+    model_name = model_name or Config.EMBEDDING_MODEL
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
+
+
+# Global instance
+embedding_service = get_embedding_service()
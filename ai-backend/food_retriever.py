@@ -3,45 +3,257 @@
 # Food retrieval and search logic
 # ================================
 
+import json
 import re
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 from langchain_community.vectorstores import Chroma
+from langchain.schema import Document
 from models import ParsedInput, CaloricPlan, FoodCandidate
 from config import Config
+from vector_backends import ChromaBackend, VectorBackend
+from name_index import NameIndex
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snacks"]
+
 
 class FoodRetriever:
     """Handles food retrieval from vector store"""
 
-    def __init__(self, vector_store: Chroma):
+    def __init__(self, vector_store: Chroma, backend: Optional[VectorBackend] = None):
         self.vector_store = vector_store
         self.retriever = vector_store.as_retriever()
+        # Index that answers the batched queries (Chroma unless configured otherwise)
+        self.backend = backend or ChromaBackend(vector_store)
+        self.typed_metadata = has_typed_metadata(vector_store)
+        if not self.typed_metadata:
+            print("   ⚠️  Vector store has no calorie metadata - falling back to text parsing")
+
+        # (query, k, filter) -> documents; cleared on every vector store write
+        self._result_cache: "OrderedDict[tuple, List[Document]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0, "default_pool_hits": 0, "name_index_hits": 0}
+
+        # Explicitly requested foods resolve by name first, without embedding
+        self.name_index: Optional[NameIndex] = None
+        self.rebuild_name_index()
+
+        # Generic (no specific food requested) candidates per meal, computed once
+        self._default_pools: Dict[str, List[Document]] = {}
+        self.precompute_defaults()
+
+    @staticmethod
+    def default_query(meal_type: str) -> str:
+        terms = Config.MEAL_TYPE_TERMS[meal_type]
+        return " ".join(terms[:3])
 
-    def retrieve_candidates(self, parsed_input: ParsedInput, caloric_plan: CaloricPlan) -> Dict[str, List[FoodCandidate]]:
-        """Retrieve food candidates for each meal"""
+    def precompute_defaults(self):
+        """Retrieve the generic per-meal pools once; budgets are applied per request"""
+        try:
+            filters = [{"category": meal_type} for meal_type in MEAL_TYPES] if self.typed_metadata else None
+            results = self.search_many([self.default_query(m) for m in MEAL_TYPES],
+                                       k=Config.DEFAULT_POOL_K, filters=filters)
+            self._default_pools = dict(zip(MEAL_TYPES, results))
+            print(f"   ✅ Precomputed default candidates for {len(self._default_pools)} meals")
+        except Exception as e:
+            print(f"   ⚠️  Could not precompute default candidates: {e}")
+            self._default_pools = {}
+
+    def rebuild_name_index(self):
+        try:
+            self.name_index = NameIndex.from_vector_store(self.vector_store)
+            print(f"   ✅ Name index ready ({self.name_index.status()})")
+        except Exception as e:
+            print(f"   ⚠️  Could not build name index: {e}")
+            self.name_index = None
+
+    def invalidate_cache(self):
+        """Call after any write to the vector store"""
+        with self._cache_lock:
+            self._result_cache.clear()
+        self.rebuild_name_index()
+        self.precompute_defaults()
+
+    def retrieve_candidates(self, parsed_input: ParsedInput, caloric_plan: CaloricPlan,
+                            rounds: Optional[Dict[str, int]] = None) -> Dict[str, List[FoodCandidate]]:
+        """Retrieve food candidates for each meal.
+
+        `rounds`, when given, is filled with the number of index queries
+        each meal needed (0 for name matches and sufficient default pools).
+        """
         candidates = {}
         meal_requests = parsed_input.meal_requests
 
-        for meal_type in ["breakfast", "lunch", "dinner", "snacks"]:
+        searches = []
+        pooled = []
+        named = []
+        for meal_type in MEAL_TYPES:
             meal_calories = getattr(caloric_plan, meal_type)["calories"]
 
             if meal_calories > 0:
                 # Build search query
                 if meal_requests.get(meal_type):
                     search_query = f"{meal_requests[meal_type]} {meal_type}"
+                    docs = self._lookup_name(meal_requests[meal_type], meal_type, meal_calories)
+                    if docs:
+                        # Catalog items named like the request: no vector search
+                        print(f"   Name match for {meal_type}: '{meal_requests[meal_type]}' ({len(docs)} items)")
+                        named.append(((meal_type, meal_calories, search_query), docs))
+                        continue
+                elif meal_type in self._default_pools:
+                    # Generic request: serve from the precomputed pool, no retrieval
+                    pooled.append((meal_type, meal_calories, self.default_query(meal_type)))
+                    continue
                 else:
-                    terms = Config.MEAL_TYPE_TERMS[meal_type]
-                    search_query = " ".join(terms[:3])
+                    search_query = self.default_query(meal_type)
 
                 print(f"   Searching for {meal_type}: '{search_query}'")
+                searches.append((meal_type, meal_calories, search_query))
+
+        jobs = [self._search_job(meal, Config.ADAPTIVE_START_K) for meal in searches]
+        for meal in pooled:
+            # A pool short of in-budget items (tight budget) widens like a search
+            job = self._search_job(meal, Config.DEFAULT_POOL_K)
+            self._set_job_docs(job, self._default_pools[meal[0]])
+            jobs.append(job)
+        self.cache_stats["default_pool_hits"] += len(pooled)
+
+        self._widen_until_enough(jobs)
+
+        self.cache_stats["name_index_hits"] += len(named)
+        for (meal_type, meal_calories, search_query), docs in named:
+            jobs.append({"meal_type": meal_type, "rounds": 0,
+                         "suitable": self._process_candidates(docs, meal_type, meal_calories, search_query)})
+
+        for job in jobs:
+            candidates[job["meal_type"]] = job["suitable"][:Config.MAX_CANDIDATES_PER_MEAL]
+            if rounds is not None:
+                rounds[job["meal_type"]] = job["rounds"]
+
+        return {meal_type: candidates[meal_type] for meal_type in MEAL_TYPES if meal_type in candidates}
+
+    def _search_job(self, meal: tuple, k: int) -> dict:
+        meal_type, meal_calories, search_query = meal
+        # Typed metadata lets the index drop other categories and over-budget
+        # items before ranking, so every returned slot is usable
+        where = None
+        if self.typed_metadata:
+            where = meal_filter(meal_type, meal_calories * Config.CALORIE_FLEXIBILITY_FACTOR)
+        return {"meal_type": meal_type, "meal_calories": meal_calories, "query": search_query,
+                "where": where, "k": k, "docs": None, "suitable": [], "rounds": 0}
+
+    def _set_job_docs(self, job: dict, docs: List[Document]):
+        job["docs"] = docs
+        job["suitable"] = self._process_candidates(docs, job["meal_type"], job["meal_calories"], job["query"])
+
+    def _widen_until_enough(self, jobs: List[dict]):
+        """Query in rounds; each round widens k only for meals still short.
+
+        A meal stops when it has MAX_CANDIDATES_PER_MEAL in-budget items,
+        when the index returned fewer than k (nothing more to find), or
+        at ADAPTIVE_MAX_K. Meals sharing a k share one batched search.
+        """
+        want = Config.MAX_CANDIDATES_PER_MEAL
+        while True:
+            pending = []
+            for job in jobs:
+                if job["docs"] is None:
+                    pending.append(job)
+                elif (len(job["suitable"]) < want and len(job["docs"]) >= job["k"]
+                      and job["k"] < Config.ADAPTIVE_MAX_K):
+                    job["k"] = next_k(job["k"])
+                    pending.append(job)
+            if not pending:
+                return
+
+            by_k: Dict[int, List[dict]] = {}
+            for job in pending:
+                by_k.setdefault(job["k"], []).append(job)
+            for k, group in by_k.items():
+                # One embedding batch for all meals at this k
+                results = self.search_many([job["query"] for job in group], k=k,
+                                           filters=[job["where"] for job in group])
+                for job, docs in zip(group, results):
+                    self._set_job_docs(job, docs)
+                    job["rounds"] += 1
+
+    def _lookup_name(self, request: str, meal_type: str, meal_calories: int) -> List[Document]:
+        if self.name_index is None:
+            return []
+        # Category is only trustworthy in typed metadata
+        return self.name_index.lookup(
+            request,
+            category=meal_type if self.typed_metadata else None,
+            max_calories=meal_calories * Config.CALORIE_FLEXIBILITY_FACTOR,
+            limit=Config.RETRIEVAL_K
+        )
 
-                # Retrieve documents
-                docs = self.retriever.get_relevant_documents(search_query, k=Config.RETRIEVAL_K)
+    def search_many(self, queries: List[str], k: int,
+                    filters: Optional[List[Optional[dict]]] = None) -> List[List[Document]]:
+        """Similarity search for several queries at once, results in query order.
 
-                # Process candidates
-                suitable_items = self._process_candidates(docs, meal_type, meal_calories, search_query)
-                candidates[meal_type] = suitable_items[:Config.MAX_CANDIDATES_PER_MEAL]
+        Cached results are reused; the rest are embedded in one batch.
+        Unfiltered searches share a single index query; a metadata filter
+        applies to a whole index query, so filtered searches run one index
+        query per filter.
+        """
+        if not queries:
+            return []
 
-        return candidates
+        filters = filters or [None] * len(queries)
+        keys = [_cache_key(query, k, where) for query, where in zip(queries, filters)]
+        results: List[Optional[List[Document]]] = [self._cache_get(key) for key in keys]
+        missing = [i for i, docs in enumerate(results) if docs is None]
+        if not missing:
+            return results
+
+        miss_queries = [queries[i] for i in missing]
+        miss_filters = [filters[i] for i in missing]
+        try:
+            query_embeddings = self._embed_queries(miss_queries)
+            if not any(miss_filters):
+                fetched = self._query_index(query_embeddings, k)
+            else:
+                fetched = [self._query_index([embedding], k, where)[0]
+                           for embedding, where in zip(query_embeddings, miss_filters)]
+        except Exception as e:
+            # Stores without a batched query path: one search per query
+            print(f"   ⚠️  Batched retrieval unavailable ({e}), searching per meal")
+            fetched = [self.retriever.get_relevant_documents(query, k=k, **({"filter": where} if where else {}))
+                       for query, where in zip(miss_queries, miss_filters)]
+
+        for i, docs in zip(missing, fetched):
+            results[i] = docs
+            self._cache_put(keys[i], docs)
+        return results
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        embeddings = self.backend.embeddings
+        if hasattr(embeddings, "encode_queries"):
+            return embeddings.encode_queries(queries).tolist()
+        return embeddings.embed_documents(queries)
+
+    def _query_index(self, query_embeddings: List[List[float]], k: int,
+                     where: Optional[dict] = None) -> List[List[Document]]:
+        return self.backend.query(query_embeddings, k, where)
+
+    def _cache_get(self, key: tuple) -> Optional[List[Document]]:
+        with self._cache_lock:
+            docs = self._result_cache.get(key)
+            if docs is None:
+                self.cache_stats["misses"] += 1
+                return None
+            self._result_cache.move_to_end(key)
+            self.cache_stats["hits"] += 1
+            return docs
+
+    def _cache_put(self, key: tuple, docs: List[Document]):
+        with self._cache_lock:
+            self._result_cache[key] = docs
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > Config.RETRIEVAL_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
 
     def _process_candidates(self, docs, meal_type: str, meal_calories: int, search_query: str) -> List[FoodCandidate]:
         """Process retrieved documents into food candidates"""
@@ -50,8 +262,10 @@ class FoodRetriever:
         for doc in docs:
             content = doc.page_content
 
-            # Extract calories
-            calories = self._extract_calories(content)
+            # Typed metadata first; text parsing only for documents ingested without it
+            calories = candidate_calories(doc)
+            if calories is None:
+                calories = self._extract_calories(content)
 
             if calories != "unknown":
                 # Check if within acceptable range
@@ -95,3 +309,51 @@ class FoodRetriever:
             return calorie_candidates[0]
 
         return "unknown"
+
+
+def next_k(k: int) -> int:
+    return min(max(k + 1, k * Config.ADAPTIVE_GROWTH_FACTOR), Config.ADAPTIVE_MAX_K)
+
+
+def adaptive_k_search(search: Callable[[int], list], usable: Callable[[list], list], want: int,
+                      start_k: int = Config.ADAPTIVE_START_K) -> Tuple[list, int]:
+    """Widen `search(k)` until `usable(docs)` has `want` items.
+
+    Stops early when the index runs out (fewer than k returned) or at
+    ADAPTIVE_MAX_K. Returns (usable items, rounds).
+    """
+    k, rounds = min(start_k, Config.ADAPTIVE_MAX_K), 0
+    while True:
+        docs = search(k)
+        rounds += 1
+        found = usable(docs)
+        if len(found) >= want or len(docs) < k or k >= Config.ADAPTIVE_MAX_K:
+            return found, rounds
+        k = next_k(k)
+
+
+def _cache_key(query: str, k: int, where: Optional[dict]) -> tuple:
+    return (query, k, json.dumps(where, sort_keys=True) if where else None)
+
+
+def has_typed_metadata(vector_store) -> bool:
+    """True when stored documents carry numeric calorie metadata"""
+    try:
+        sample = vector_store._collection.get(limit=1, include=["metadatas"])
+        metadatas = sample.get("metadatas") or []
+        return bool(metadatas) and isinstance((metadatas[0] or {}).get("calories"), (int, float))
+    except Exception:
+        return False
+
+
+def meal_filter(category: str, max_calories: float) -> dict:
+    """Chroma `where` filter: one category, calories within budget"""
+    return {"$and": [
+        {"category": category},
+        {"calories": {"$lte": float(max_calories)}}
+    ]}
+
+
+def candidate_calories(doc) -> Optional[int]:
+    calories = (doc.metadata or {}).get("calories")
+    return int(calories) if isinstance(calories, (int, float)) else None
@@ -3,6 +3,8 @@ import base64
 import io
 from PIL import Image
 import json
+from circuit_breaker import usda_breaker
+from nutrients import NutrientRecord, NUTRIENT_BASIS
 
 class FreeFoodRecognitionService:
     def __init__(self):
@@ -172,38 +174,21 @@ class FreeFoodRecognitionService:
                 'dataType': ['Foundation', 'SR Legacy']
             }
             
-            response = requests.get(usda_url, params=params, timeout=10)
+            response = usda_breaker.call(requests.get, usda_url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
                 if data.get('foods') and len(data['foods']) > 0:
                     food = data['foods'][0]
                     
-                    # Extract nutrition information
-                    nutrients = {}
-                    for nutrient in food.get('foodNutrients', []):
-                        name = nutrient.get('nutrientName', '')
-                        value = nutrient.get('value', 0)
-                        unit = nutrient.get('unitName', '')
-                        
-                        # Map to common nutrients
-                        if 'Energy' in name and 'kcal' in unit.lower():
-                            nutrients['calories'] = f"{value} {unit}"
-                        elif 'Protein' in name:
-                            nutrients['protein'] = f"{value} {unit}"
-                        elif 'Total lipid' in name:
-                            nutrients['fat'] = f"{value} {unit}"
-                        elif 'Carbohydrate' in name:
-                            nutrients['carbs'] = f"{value} {unit}"
-                        elif 'Sugars' in name:
-                            nutrients['sugar'] = f"{value} {unit}"
-                        elif 'Fiber' in name:
-                            nutrients['fiber'] = f"{value} {unit}"
+                    # Map nutrients by USDA nutrient id
+                    nutrients = NutrientRecord.from_usda(food).to_dict()
                     
                     return {
                         'success': True,
                         'food_name': food.get('description', food_name),
                         'nutrients': nutrients,
+                        'nutrient_basis': NUTRIENT_BASIS,
                         'source': 'USDA FoodData Central (FREE)'
                     }
             
@@ -219,18 +204,19 @@ class FreeFoodRecognitionService:
         food_lower = food_name.lower()
         
         if any(fruit in food_lower for fruit in ['apple', 'banana', 'orange', 'berry']):
-            nutrients = {'calories': '52 kcal', 'protein': '0.3 g', 'carbs': '14 g', 'fat': '0.2 g'}
+            nutrients = {'calories': 52.0, 'protein': 0.3, 'carbs': 14.0, 'fats': 0.2}
         elif any(veg in food_lower for veg in ['broccoli', 'carrot', 'lettuce', 'spinach']):
-            nutrients = {'calories': '34 kcal', 'protein': '2.8 g', 'carbs': '7 g', 'fat': '0.4 g'}
+            nutrients = {'calories': 34.0, 'protein': 2.8, 'carbs': 7.0, 'fats': 0.4}
         elif any(meal in food_lower for meal in ['chicken', 'beef', 'fish', 'meat']):
-            nutrients = {'calories': '165 kcal', 'protein': '31 g', 'carbs': '0 g', 'fat': '3.6 g'}
+            nutrients = {'calories': 165.0, 'protein': 31.0, 'carbs': 0.0, 'fats': 3.6}
         else:
-            nutrients = {'calories': '100 kcal', 'protein': '5 g', 'carbs': '15 g', 'fat': '3 g'}
+            nutrients = {'calories': 100.0, 'protein': 5.0, 'carbs': 15.0, 'fats': 3.0}
         
         return {
             'success': True,
             'food_name': food_name,
             'nutrients': nutrients,
+            'nutrient_basis': NUTRIENT_BASIS,
             'source': 'estimated_based_on_category'
         }
 
@@ -0,0 +1,347 @@
+# ================================
+# File: ingest.py
+# Streaming, idempotent meal catalog ingestion into the vector store
+# ================================
+#
+# Usage:
+#     python ingest.py meal_data.csv [--batch-size 256] [--prune] [--workers 4]
+# Re-running with the same CSV writes nothing; edited rows are re-embedded
+# and upserted in place; --prune removes documents whose rows are gone.
+# With --workers N, batches are embedded by N encoder processes while this
+# process stays the single writer, upserting batches in CSV order.
+# With --export-index, the collection is also exported as the NumPy
+# retrieval index (see vector_backends.py) whenever it changed.
+# Rows whose ids vector_maintenance.py removed as duplicates are listed in
+#   <db>/suppressed_ids.json   {"meal_database": ["<document id>", ...]}
+# and are skipped (and pruned) here; delete an id there to bring its row back.
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from config import Config
+from vector_backends import NumpyBackend, index_dir_for
+
+# Category remapping (anything else becomes "other")
+CATEGORY_MAP = {
+    "breakfast": "breakfast",
+    "lunch": "lunch",
+    "dinner": "dinner",
+    "snacks": "snacks",
+    "snack": "snacks"
+}
+
+# Optional macro columns -> metadata keys (grams per serving)
+MACRO_COLUMNS = {
+    "Protein": "protein",
+    "Carbs": "carbs",
+    "Fat": "fats",
+    "Fats": "fats",
+    "Fiber": "fiber",
+    "Sugar": "sugar"
+}
+
+DEFAULT_BATCH_SIZE = 256
+SUPPRESSED_FILE = "suppressed_ids.json"
+
+
+def _to_number(value):
+    try:
+        return float(str(value).strip().replace('"', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_category(value) -> str:
+    return CATEGORY_MAP.get(str(value or "").strip().replace('"', '').lower(), "other")
+
+
+def meal_document(row: dict) -> Document:
+    """Document for one catalog row, with typed metadata for filtered search"""
+    item = str(row.get("Item", "")).strip()
+    category = str(row.get("Category", "other")).strip()
+    serving = str(row.get("Serving Size", "")).strip()
+    calories = _to_number(row.get("Calories"))
+
+    content = f"{item} - Category: {category}, Serving: {serving}, Calories: {row.get('Calories')} kcal"
+
+    # Chroma metadata values must be str/int/float/bool (no None)
+    metadata = {"item": item, "category": category, "serving": serving}
+    if calories is not None:
+        metadata["calories"] = calories
+    for column, key in MACRO_COLUMNS.items():
+        value = _to_number(row.get(column))
+        if value is not None:
+            metadata[key] = value
+
+    return Document(page_content=content, metadata=metadata)
+
+
+def document_id(row: dict) -> str:
+    """Stable id from the row's identity (category, item, serving)"""
+    identity = "|".join(str(row.get(column, "")).strip().lower() for column in ("Category", "Item", "Serving Size"))
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def content_hash(doc: Document) -> str:
+    """Hash of everything that is embedded or stored for a document"""
+    payload = json.dumps({"content": doc.page_content, "metadata": doc.metadata}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _suppressed_path(db_location: str) -> str:
+    return os.path.join(db_location, SUPPRESSED_FILE)
+
+
+def load_suppressed_ids(db_location: str, logical_name: str = Config.COLLECTION_NAME) -> set:
+    """Document ids ingest must not write back into the collection"""
+    try:
+        with open(_suppressed_path(db_location), "r", encoding="utf-8") as f:
+            return set(json.load(f).get(logical_name, []))
+    except FileNotFoundError:
+        return set()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read {SUPPRESSED_FILE}: {e}")
+        return set()
+
+
+def suppress_ids(db_location: str, ids, logical_name: str = Config.COLLECTION_NAME) -> int:
+    """Add ids to the suppression list (atomically); returns its new size"""
+    path = _suppressed_path(db_location)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            suppressed = json.load(f)
+    except FileNotFoundError:
+        suppressed = {}
+    merged = sorted(set(suppressed.get(logical_name, [])) | set(ids))
+    suppressed[logical_name] = merged
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(suppressed, f)
+    os.replace(tmp_path, path)
+    return len(merged)
+
+
+def iter_catalog_rows(csv_path: str) -> Iterator[Dict]:
+    """Stream rows from the catalog CSV (quoted fields handled by csv)"""
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            row = {(key or "").strip(): value for key, value in row.items()}
+            if not (row.get("Item") or "").strip():
+                continue
+            row["Category"] = normalize_category(row.get("Category"))
+            yield row
+
+
+def iter_catalog_batches(csv_path: str, batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in iter_catalog_rows(csv_path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_catalog(vector_store, csv_path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   prune: bool = False, progress_every: int = 1, workers: int = 1,
+                   index_dir: Optional[str] = None, suppressed_ids: Optional[set] = None) -> Dict:
+    """Upsert new and changed catalog rows; unchanged rows are not re-embedded.
+    Rows in suppressed_ids are skipped (and so pruned)."""
+    collection = vector_store._collection
+    stats = {"rows": 0, "added": 0, "updated": 0, "unchanged": 0, "suppressed": 0, "pruned": 0}
+    seen_ids = set() if prune else None
+    started = time.time()
+
+    if workers > 1 and getattr(vector_store.embeddings, "_encoder", None) is not None:
+        # Forking after the model (and its thread pools) is loaded can
+        # deadlock the workers; embed in this process instead
+        print("   ⚠️  Encoder already loaded in this process - ingesting with 1 worker")
+        workers = 1
+    pool = _embedding_pool(vector_store, workers) if workers > 1 else None
+    # (ids, docs, future) in submission order; bounded so reading the CSV
+    # cannot run arbitrarily far ahead of the writer
+    pending = deque()
+
+    print(f"🔄 Ingesting {csv_path} (batch size {batch_size}, {max(workers, 1)} worker(s))...")
+    try:
+        for batch_number, rows in enumerate(iter_catalog_batches(csv_path, batch_size), 1):
+            ids, write_ids, write_docs = _plan_batch(collection, rows, stats, suppressed_ids)
+
+            if write_docs:
+                if pool is None:
+                    vector_store.add_documents(documents=write_docs, ids=write_ids)
+                else:
+                    texts = [doc.page_content for doc in write_docs]
+                    pending.append((write_ids, write_docs, pool.submit(_embed_in_worker, texts)))
+                    while len(pending) > 2 * workers:
+                        _write_embedded(collection, *pending.popleft())
+
+            stats["rows"] += len(rows)
+            if seen_ids is not None:
+                seen_ids.update(ids)
+
+            if batch_number % progress_every == 0:
+                elapsed = max(time.time() - started, 1e-6)
+                print(f"   📦 {stats['rows']} rows | +{stats['added']} ~{stats['updated']} "
+                      f"={stats['unchanged']} | {stats['rows'] / elapsed:.0f} rows/s")
+
+        while pending:
+            _write_embedded(collection, *pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    if seen_ids is not None:
+        stats["pruned"] = _prune(collection, seen_ids, batch_size)
+
+    # The NumPy index is an export of the collection: refresh it on change
+    changed = stats["added"] + stats["updated"] + stats["pruned"]
+    if index_dir and (changed or not os.path.exists(os.path.join(index_dir, "manifest.json"))):
+        NumpyBackend.export(vector_store, index_dir)
+
+    stats["seconds"] = round(time.time() - started, 2)
+    print(f"✅ Ingest done: {stats}")
+    return stats
+
+
+def _plan_batch(collection, rows: List[Dict], stats: Dict,
+                suppressed_ids: Optional[set] = None) -> Tuple[List[str], List[str], List[Document]]:
+    """Ids in the batch, plus the new or changed documents that need writing"""
+    # Duplicate identities within a batch: the last row wins
+    by_id = {}
+    for row in rows:
+        if suppressed_ids and document_id(row) in suppressed_ids:
+            stats["suppressed"] += 1
+            continue
+        doc = meal_document(row)
+        doc.metadata["content_hash"] = content_hash(doc)
+        by_id[document_id(row)] = doc
+
+    ids = list(by_id)
+    if not ids:
+        return ids, [], []
+    existing = collection.get(ids=ids, include=["metadatas"])
+    stored_hashes = {
+        doc_id: (metadata or {}).get("content_hash")
+        for doc_id, metadata in zip(existing.get("ids", []), existing.get("metadatas") or [])
+    }
+
+    write_ids, write_docs = [], []
+    for doc_id, doc in by_id.items():
+        stored = stored_hashes.get(doc_id)
+        if stored == doc.metadata["content_hash"]:
+            stats["unchanged"] += 1
+            continue
+        stats["updated" if doc_id in stored_hashes else "added"] += 1
+        write_ids.append(doc_id)
+        write_docs.append(doc)
+
+    return ids, write_ids, write_docs
+
+
+def _write_embedded(collection, ids: List[str], docs: List[Document], future):
+    """Single writer: upsert one batch with the vectors a worker computed"""
+    collection.upsert(
+        ids=ids,
+        embeddings=future.result().tolist(),
+        documents=[doc.page_content for doc in docs],
+        metadatas=[doc.metadata for doc in docs]
+    )
+
+
+# ---------- encoder worker processes ----------
+
+_worker_encoder = None
+
+
+def _embedding_pool(vector_store, workers: int) -> ProcessPoolExecutor:
+    model_name = getattr(vector_store.embeddings, "model_name", Config.EMBEDDING_MODEL)
+    # Split the cores between workers; letting every worker's runtime use all
+    # cores oversubscribes the CPU and throughput stops scaling
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # fork keeps the caller's __main__ from being re-imported in each worker
+    # (rag_meal_planner_api ingests at import time). It is only safe before
+    # the parent has loaded the model or started serving: ingest_catalog
+    # drops to 1 worker once the encoder is loaded, and in-process rebuilds
+    # (collection_rebuild.py) always run with 1 worker
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(method),
+        initializer=_init_worker,
+        initargs=(model_name, threads)
+    )
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_encoder
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    from embedding_service import EmbeddingService
+    _worker_encoder = EmbeddingService(model_name, threads=threads)
+
+
+def _embed_in_worker(texts: List[str]):
+    return _worker_encoder.encode(texts)
+
+
+def _prune(collection, keep_ids: set, batch_size: int) -> int:
+    """Delete documents whose ids were not seen in the catalog"""
+    stale, offset = [], 0
+    while True:
+        page = collection.get(include=[], limit=batch_size, offset=offset)
+        page_ids = page.get("ids", [])
+        if not page_ids:
+            break
+        stale.extend(doc_id for doc_id in page_ids if doc_id not in keep_ids)
+        offset += len(page_ids)
+
+    for start in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[start:start + batch_size])
+    return len(stale)
+
+
+def open_vector_store(db_location: str, collection_name: Optional[str] = None):
+    from langchain_community.vectorstores import Chroma
+    from embedding_service import embedding_service
+
+    return Chroma(
+        collection_name=collection_name or Config.COLLECTION_NAME,
+        persist_directory=db_location,
+        embedding_function=embedding_service
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a meal catalog CSV into the vector store")
+    parser.add_argument("csv_path")
+    parser.add_argument("--db", default=Config.VECTOR_DB_LOCATION)
+    parser.add_argument("--collection", default=Config.COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--prune", action="store_true", help="delete documents no longer in the CSV")
+    parser.add_argument("--workers", type=int, default=Config.INGEST_WORKERS,
+                        help="encoder processes (1 = embed in this process)")
+    parser.add_argument("--export-index", action="store_true",
+                        help="also refresh the NumPy retrieval index for this collection")
+    args = parser.parse_args()
+
+    vector_store = open_vector_store(args.db, args.collection)
+    ingest_catalog(vector_store, args.csv_path, batch_size=args.batch_size,
+                   prune=args.prune, workers=args.workers,
+                   index_dir=index_dir_for(vector_store) if args.export_index else None,
+                   suppressed_ids=load_suppressed_ids(args.db, args.collection))
+
+
+if __name__ == "__main__":
+    main()
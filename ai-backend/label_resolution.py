@@ -0,0 +1,295 @@
+# ================================
+# File: label_resolution.py
+# Precomputed classifier label -> nutrition entry table
+# ================================
+#
+# Build once (offline):
+#     USDA_API_KEY=... python label_resolution.py build
+# The services load the resulting artifact at startup and answer nutrition
+# lookups for known classifier labels without any search or ranking.
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from nutrients import NutrientRecord, NUTRIENT_BASIS
+
+ARTIFACT_FORMAT_VERSION = 1
+DEFAULT_ARTIFACT_PATH = os.getenv(
+    "LABEL_RESOLUTION_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), f"label_resolution_v{ARTIFACT_FORMAT_VERSION}.json")
+)
+
+# Classes of the fine-tuned VGG16 fruit & vegetable model
+FRUIT_VEG_LABELS = [
+    "Apple", "Avocado", "Banana", "Blackberry", "Blueberry", "Broccoli",
+    "Cabbage", "Capsicum", "Carrot", "Corn", "Cucumber", "Dates",
+    "Eggplant", "Fig", "Garlic", "Grapes", "Kiwi", "Lemon", "Lettuce",
+    "Mango", "Mushroom", "Olive", "Onion", "Orange", "Pear", "Peas",
+    "Pineapple", "Pomegranate", "Potato", "Pumpkin", "Raddish", "Strawberry",
+    "Tomato", "Watermelon"
+]
+
+# Food-related ImageNet labels returned by MobileNetV2 decode_predictions
+IMAGENET_FOOD_LABELS = [
+    "cheeseburger", "hotdog", "pizza", "burrito", "carbonara", "guacamole",
+    "consomme", "hot_pot", "trifle", "ice_cream", "ice_lolly", "French_loaf",
+    "bagel", "pretzel", "mashed_potato", "meat_loaf", "potpie", "dough",
+    "chocolate_sauce", "espresso", "eggnog", "red_wine", "head_cabbage",
+    "broccoli", "cauliflower", "zucchini", "spaghetti_squash", "acorn_squash",
+    "butternut_squash", "cucumber", "artichoke", "bell_pepper", "cardoon",
+    "mushroom", "Granny_Smith", "strawberry", "orange", "lemon", "fig",
+    "pineapple", "banana", "jackfruit", "custard_apple", "pomegranate", "corn", "ear"
+]
+
+# Search queries for labels whose class name is a poor USDA query
+QUERY_OVERRIDES = {
+    "raddish": "radishes",
+    "capsicum": "peppers sweet red",
+    "granny smith": "apples",
+    "hotdog": "frankfurter",
+    "french loaf": "bread french",
+    "consomme": "soup consomme",
+    "hot pot": "beef stew",
+    "ice lolly": "ice pops",
+    "meat loaf": "meatloaf",
+    "potpie": "chicken pot pie",
+    "carbonara": "pasta carbonara",
+    "red wine": "wine table red",
+    "espresso": "coffee brewed espresso",
+    "head cabbage": "cabbage",
+    "ear": "corn sweet yellow",
+    "corn": "corn sweet yellow",
+    "custard apple": "custard-apple"
+}
+
+PRODUCE_LABELS = {label.lower() for label in FRUIT_VEG_LABELS}
+
+
+def normalize_label(label: str) -> str:
+    """Canonical form shared by the builder and runtime lookups"""
+    return label.replace("_", " ").lower().split(",")[0].strip()
+
+
+class TrigramIndex:
+    """Character-trigram inverted index for fuzzy name matching"""
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._trigrams: List[set] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        padded = f"  {text.lower().strip()} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name: str) -> int:
+        doc_id = len(self._names)
+        grams = self.trigrams(name)
+        self._names.append(name)
+        self._trigrams.append(grams)
+        for gram in grams:
+            self._postings[gram].append(doc_id)
+        return doc_id
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """(doc_id, dice similarity) for the best matches"""
+        query_grams = self.trigrams(query)
+        overlap = defaultdict(int)
+        for gram in query_grams:
+            for doc_id in self._postings.get(gram, ()):
+                overlap[doc_id] += 1
+
+        scored = [
+            (doc_id, 2.0 * shared / (len(query_grams) + len(self._trigrams[doc_id])))
+            for doc_id, shared in overlap.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def name(self, doc_id: int) -> str:
+        return self._names[doc_id]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class LabelResolutionTable:
+    """Runtime view of the precomputed label -> nutrition entry artifact"""
+
+    def __init__(self, entries: Optional[Dict[str, Dict]] = None, version: Optional[str] = None):
+        self.entries = entries or {}
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_ARTIFACT_PATH) -> "LabelResolutionTable":
+        if not os.path.exists(path):
+            print(f"⚠️ No label resolution table at {path} - nutrition lookups will search")
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                artifact = json.load(f)
+            if artifact.get("format_version") != ARTIFACT_FORMAT_VERSION:
+                print(f"⚠️ Label resolution table {path} has format "
+                      f"{artifact.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION} - ignoring")
+                return cls()
+            table = cls(artifact.get("labels", {}), artifact.get("version"))
+            print(f"✅ Label resolution table {table.version} loaded ({len(table)} labels)")
+            return table
+        except Exception as e:
+            print(f"⚠️ Could not load label resolution table: {e}")
+            return cls()
+
+    def lookup(self, label: str) -> Optional[Dict]:
+        return self.entries.get(normalize_label(label))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# ---------- offline builder ----------
+
+def _search_usda(session: requests.Session, query: str, api_key: str, page_size: int = 25) -> List[Dict]:
+    # A plain session: the serving usda_breaker must not trip (or be
+    # tripped) by an offline build
+    response = session.get(
+        "https://api.nal.usda.gov/fdc/v1/foods/search",
+        params={
+            'query': query,
+            'api_key': api_key,
+            'pageSize': page_size,
+            'dataType': ['Foundation', 'SR Legacy', 'Survey (FNDDS)']
+        },
+        timeout=15
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"USDA search failed for '{query}': HTTP {response.status_code}")
+    return response.json().get('foods', [])
+
+
+def _score(label: str, query: str, description: str, similarity: float) -> float:
+    description = description.lower()
+    score = similarity
+    if label in PRODUCE_LABELS or description.startswith(query.split()[0]):
+        # Whole produce and plain foods: prefer unprocessed entries
+        if "raw" in description or "fresh" in description:
+            score += 0.15
+    # Penalize long, heavily qualified descriptions
+    score -= 0.01 * description.count(",")
+    return score
+
+
+def build_table(labels: Iterable[str], api_key: str) -> Dict:
+    """Resolve every label once against a trigram index of USDA candidates.
+
+    Raises RuntimeError if any search failed: a table missing those labels
+    would silently send them back to live search.
+    """
+    labels = list(dict.fromkeys(normalize_label(label) for label in labels))
+
+    # 1) Collect a candidate pool with one search per label
+    pool: Dict[int, Dict] = {}
+    failed = {}
+    with requests.Session() as session:
+        for label in labels:
+            query = QUERY_OVERRIDES.get(label, label)
+            try:
+                for food in _search_usda(session, query, api_key):
+                    pool.setdefault(food['fdcId'], food)
+                print(f"   🔎 {label}: pool size {len(pool)}")
+            except Exception as e:
+                print(f"   ⚠️ {label}: {e}")
+                failed[label] = str(e)
+            time.sleep(0.2)
+    if failed:
+        raise RuntimeError(f"USDA search failed for {len(failed)} label(s): {', '.join(sorted(failed))}")
+
+    # 2) Index candidate names (head of the description carries the food name)
+    index = TrigramIndex()
+    foods_by_doc: List[Dict] = []
+    for food in pool.values():
+        index.add(food.get('description', '').split(',')[0])
+        foods_by_doc.append(food)
+
+    # 3) Resolve each label to its best canonical entry
+    entries = {}
+    for label in labels:
+        query = QUERY_OVERRIDES.get(label, label)
+        best = None
+        for doc_id, similarity in index.search(query, limit=25):
+            food = foods_by_doc[doc_id]
+            record = NutrientRecord.from_usda(food)
+            if not record.has('calories'):
+                continue
+            score = _score(label, query, food.get('description', ''), similarity)
+            if best is None or score > best[0]:
+                best = (score, food, record)
+
+        if best is None:
+            print(f"   ❌ {label}: unresolved")
+            continue
+
+        score, food, record = best
+        entries[label] = {
+            "label": label,
+            "query": query,
+            "fdc_id": food.get('fdcId'),
+            "description": food.get('description'),
+            "data_type": food.get('dataType'),
+            "score": round(score, 3),
+            "nutrients": record.to_dict(),
+            "nutrient_basis": NUTRIENT_BASIS
+        }
+        print(f"   ✅ {label} -> {food.get('description')} ({score:.2f})")
+
+    content_hash = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": f"v{ARTIFACT_FORMAT_VERSION}-{content_hash}",
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": "USDA FoodData Central",
+        "labels": entries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the label -> nutrition resolution table")
+    parser.add_argument("command", choices=["build", "show"])
+    parser.add_argument("--output", default=DEFAULT_ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        table = LabelResolutionTable.load(args.output)
+        for label, entry in sorted(table.entries.items()):
+            print(f"{label:20s} -> {entry['description']} [{entry['fdc_id']}]")
+        return
+
+    api_key = os.getenv("USDA_API_KEY")
+    if not api_key:
+        parser.error("USDA_API_KEY must be set to build the table (DEMO_KEY is rate limited)")
+    print(f"🔄 Resolving {len(FRUIT_VEG_LABELS) + len(IMAGENET_FOOD_LABELS)} classifier labels...")
+    try:
+        artifact = build_table(FRUIT_VEG_LABELS + IMAGENET_FOOD_LABELS, api_key)
+    except RuntimeError as e:
+        print(f"❌ {e} - {args.output} left unchanged")
+        raise SystemExit(1)
+
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, args.output)
+    print(f"✅ Wrote {len(artifact['labels'])} labels to {args.output} ({artifact['version']})")
+
+
+# Global instance
+label_resolution_table = LabelResolutionTable.load()
+
+if __name__ == "__main__":
+    main()
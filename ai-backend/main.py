@@ -2,6 +2,7 @@ from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from cnn_service import cnn_service
+from circuit_breaker import circuit_breaker_status
 import requests
 
 app = FastAPI(title="SmartNutritrack AI API - Real CNN & RAG")
@@ -28,7 +29,8 @@ async def health_check():
     return {
         "status": "healthy", 
         "cnn_model_loaded": cnn_service.model is not None,
-        "number_of_classes": len(cnn_service.class_names)
+        "number_of_classes": len(cnn_service.class_names),
+        "circuit_breakers": circuit_breaker_status()
     }
 
 @app.post("/api/scan/fruits-vegetables")
@@ -1,15 +1,23 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
+import asyncio
+import json
+import httpx
 from professional_food_service import ProfessionalFoodService
-import requests
-from pyzbar.pyzbar import decode
 import cv2
 import numpy as np
 from PIL import Image
 import io
 from dish_service import DishRecognitionService
+from barcode_cache import OPEN_FOOD_FACTS, barcode_product_cache
+from barcode_decoder import barcode_decoder
+from barcode_index import barcode_index
+from circuit_breaker import open_food_facts_breaker, circuit_breaker_status
+from nutrition_jobs import nutrition_jobs
+from nutrients import NutrientRecord, NUTRIENT_BASIS
+from nutrition_batch import NutritionBatchResolver
 
 app = FastAPI(title="SmartNutritrack AI Food API")
 
@@ -25,6 +33,29 @@ app.add_middleware(
 # Global service instance
 food_service = ProfessionalFoodService()
 dish_service = DishRecognitionService()
+nutrition_batcher = NutritionBatchResolver(food_service)
+
+# Pooled client for product lookups; scan_barcode resolves every code in a
+# frame concurrently and returns whatever finished within the deadline
+product_http = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0, connect=3.0),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+)
+BARCODE_LOOKUP_DEADLINE = 8
+
+# Upper bound on names accepted by POST /api/nutrition/batch
+MAX_BATCH_FOODS = 100
+
+# Nutrition delivery modes for scan endpoints:
+#   inline   - wait for nutrition before responding (original behaviour)
+#   deferred - respond with the prediction and a nutrition handle
+#   stream   - server-sent events: prediction first, nutrition when ready
+NUTRITION_MODES = ("inline", "deferred", "stream")
+NUTRITION_STREAM_TIMEOUT = 30
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await product_http.aclose()
 
 @app.get("/")
 async def root():
@@ -41,6 +72,9 @@ async def root():
             "POST /api/scan/dish",           # General Dishes (MobileNetV2) 
             "POST /api/scan/barcode",
             "GET /api/nutrition/{food_name}",
+            "POST /api/nutrition/batch",
+            "GET /api/nutrition/jobs/{handle}",
+            "GET /api/nutrition/jobs/{handle}/events",
             "POST /api/planner/suggest",
             "POST /api/recommend-meal"
         ]
@@ -63,15 +97,23 @@ async def health_check():
             "dish_recognition", 
             "barcode_scanning", 
             "nutrition_api"
-        ]
+        ],
+        "circuit_breakers": circuit_breaker_status(),
+        "nutrition_batching": nutrition_batcher.status(),
+        "barcode_index": barcode_index.status(),
+        "barcode_decoding": barcode_decoder.stats(),
+        "barcode_cache": barcode_product_cache.status()
     }
 
 @app.post("/api/scan/food")
-async def scan_food(image: UploadFile = File(...)):
+async def scan_food(image: UploadFile = File(...), nutrition: str = Query("inline")):
     """Scan food using AI and get nutrition data"""
     try:
         print(f"🔍 Processing food image: {image.filename}")
         
+        if nutrition not in NUTRITION_MODES:
+            raise HTTPException(400, f"nutrition must be one of {', '.join(NUTRITION_MODES)}")
+        
         # Validate image
         if not image.content_type.startswith('image/'):
             raise HTTPException(400, "File must be an image")
@@ -84,20 +126,29 @@ async def scan_food(image: UploadFile = File(...)):
         # Use AI to recognize food
         prediction_result = food_service.predict_food(image_data)
         
-        # Get nutrition data for the top prediction
-        nutrition_data = None
-        if prediction_result.get('top_prediction'):
-            food_name = prediction_result['top_prediction']['food_name']
-            nutrition_data = food_service.get_nutrition_from_api(food_name)
-        
-        return {
+        response = {
             "success": True,
             "message": "Food recognition completed",
             "prediction": prediction_result,
-            "nutrition": nutrition_data,
+            "nutrition": None,
             "image_processed": True
         }
         
+        if not prediction_result.get('top_prediction'):
+            return response
+        
+        food_name = prediction_result['top_prediction']['food_name']
+        
+        if nutrition == "inline":
+            # Get nutrition data for the top prediction
+            response["nutrition"] = food_service.get_nutrition_from_api(food_name)
+            return response
+        
+        handle = nutrition_jobs.submit(food_name, food_service.get_nutrition_from_api, food_name)
+        return _two_phase_response(response, handle, nutrition)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Food recognition error: {str(e)}")
 
@@ -121,8 +172,8 @@ async def scan_barcode(image: UploadFile = File(...)):
         if img is None:
             raise HTTPException(400, "Could not decode image")
         
-        # Decode barcodes
-        barcodes = decode(img)
+        # Decode barcodes (downscaled and ROI passes before full resolution)
+        barcodes, decode_tier = barcode_decoder.decode(img)
         
         if not barcodes:
             return {
@@ -135,11 +186,15 @@ async def scan_barcode(image: UploadFile = File(...)):
                 ]
             }
         
+        # The same code can be read more than once in a frame; keep the first
         barcode_results = []
+        seen_codes = set()
         for barcode in barcodes:
-            barcode_data = barcode.data.decode('utf-8')
-            barcode_info = {
-                "data": barcode_data,
+            if barcode.data in seen_codes:
+                continue
+            seen_codes.add(barcode.data)
+            barcode_results.append({
+                "data": barcode.data,
                 "type": barcode.type,
                 "location": {
                     "x": barcode.rect.left,
@@ -147,29 +202,103 @@ async def scan_barcode(image: UploadFile = File(...)):
                     "width": barcode.rect.width,
                     "height": barcode.rect.height
                 }
-            }
-            
-            # Get product info from Open Food Facts
-            product_info = await get_product_from_barcode(barcode_data)
-            barcode_info["product"] = product_info
-            
-            barcode_results.append(barcode_info)
+            })
+        
+        # Look up all codes concurrently (local index, then Open Food Facts)
+        products, timed_out = await get_products_for_barcodes(
+            [info["data"] for info in barcode_results]
+        )
+        for barcode_info in barcode_results:
+            barcode_info["product"] = products[barcode_info["data"]]
         
         return {
             "success": True,
             "barcodes_found": len(barcode_results),
             "barcodes": barcode_results,
+            "decode_tier": decode_tier,
+            "lookups_timed_out": timed_out,
             "message": f"Found {len(barcode_results)} barcode(s)"
         }
         
     except Exception as e:
         raise HTTPException(500, f"Barcode scanning error: {str(e)}")
 
+@app.get("/api/nutrition/jobs/{handle}")
+async def get_nutrition_job(handle: str, wait: float = Query(0, ge=0, le=NUTRITION_STREAM_TIMEOUT)):
+    """Follow-up for deferred scans: nutrition result for a handle"""
+    job = await nutrition_jobs.wait(handle, wait)
+    if job is None:
+        raise HTTPException(404, "Unknown or expired nutrition handle")
+    
+    return {
+        "success": job["status"] != "failed",
+        **job
+    }
+
+@app.get("/api/nutrition/jobs/{handle}/events")
+async def stream_nutrition_job(handle: str):
+    """Server-sent event delivering the nutrition result for a handle"""
+    if nutrition_jobs.status(handle) is None:
+        raise HTTPException(404, "Unknown or expired nutrition handle")
+    
+    async def events():
+        yield await _nutrition_event(handle)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def _two_phase_response(response: dict, handle: str, mode: str):
+    """Attach the nutrition handle, or stream prediction and nutrition as SSE"""
+    response["nutrition_handle"] = handle
+    response["nutrition_status"] = "pending"
+    response["nutrition_url"] = f"/api/nutrition/jobs/{handle}"
+    
+    if mode == "deferred":
+        return response
+    
+    async def events():
+        yield _sse_event("prediction", response)
+        yield await _nutrition_event(handle)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+async def _nutrition_event(handle: str) -> str:
+    job = await nutrition_jobs.wait(handle, NUTRITION_STREAM_TIMEOUT)
+    if job is None:
+        return _sse_event("error", {"handle": handle, "error": "Unknown or expired nutrition handle"})
+    return _sse_event("nutrition", job)
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/nutrition/batch")
+async def get_nutrition_batch(batch_request: dict):
+    """Get nutrition data for many foods in one request"""
+    try:
+        food_names = batch_request.get('foods', [])
+        if not isinstance(food_names, list) or not all(isinstance(name, str) for name in food_names):
+            raise HTTPException(400, "foods must be a list of food names")
+        if len(food_names) > MAX_BATCH_FOODS:
+            raise HTTPException(400, f"At most {MAX_BATCH_FOODS} foods per batch")
+        
+        batch = await nutrition_batcher.resolve_many(food_names)
+        
+        return {
+            "success": True,
+            **batch,
+            "found": sum(1 for result in batch["results"].values() if result.get('success'))
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Nutrition batch error: {str(e)}")
+
 @app.get("/api/nutrition/{food_name}")
 async def get_nutrition(food_name: str):
     """Get nutrition data for any food"""
     try:
-        nutrition_data = food_service.get_nutrition_from_api(food_name)
+        # Goes through the batcher so concurrent lookups share upstream calls
+        nutrition_data = await nutrition_batcher.resolve(food_name)
         
         return {
             "success": nutrition_data['success'],
@@ -182,39 +311,50 @@ async def get_nutrition(food_name: str):
 
 async def get_product_from_barcode(barcode: str):
     """Get product information from Open Food Facts"""
+    cached = barcode_product_cache.get(barcode, OPEN_FOOD_FACTS)
+    if cached is not None:
+        return cached
+    
+    # Local Open Food Facts index first; the API only covers misses
+    product = barcode_index.lookup(barcode)
+    if product:
+        result = {**product, "source": "openfoodfacts", "barcode_match": "local_index"}
+        barcode_product_cache.put(barcode, result, OPEN_FOOD_FACTS)
+        return result
+    
     try:
         url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-        response = requests.get(url, timeout=10)
+        response = await open_food_facts_breaker.call_async(product_http.get, url)
         
         if response.status_code == 200:
             data = response.json()
             if data.get("status") == 1:
                 product = data.get("product", {})
                 
-                # Extract nutrition information
-                nutriments = product.get("nutriments", {})
-                nutrition = {
-                    "calories": nutriments.get("energy-kcal_100g"),
-                    "protein": nutriments.get("proteins_100g"),
-                    "carbs": nutriments.get("carbohydrates_100g"),
-                    "fats": nutriments.get("fats_100g"),
-                    "sugar": nutriments.get("sugars_100g"),
-                    "fiber": nutriments.get("fiber_100g"),
-                    "sodium": nutriments.get("sodium_100g")
-                }
-                
-                # Clean nutrition data
-                nutrition = {k: v for k, v in nutrition.items() if v is not None}
+                # Extract nutrition information (per 100 g)
+                nutrition = NutrientRecord.from_off(product.get("nutriments", {})).to_dict(fat_key="fat")
                 
-                return {
+                result = {
                     "name": product.get("product_name", "Unknown Product"),
                     "brand": product.get("brands", ""),
                     "categories": product.get("categories", ""),
                     "ingredients": product.get("ingredients_text", ""),
                     "nutrition": nutrition,
+                    "nutrient_basis": NUTRIENT_BASIS,
                     "image_url": product.get("image_url", ""),
                     "source": "openfoodfacts"
                 }
+                barcode_product_cache.put(barcode, result, OPEN_FOOD_FACTS)
+                return result
+            
+            # Only a definite "unknown product" answer is cached
+            not_found = {
+                "name": "Product not found",
+                "barcode": barcode,
+                "source": "openfoodfacts"
+            }
+            barcode_product_cache.put_missing(barcode, not_found, OPEN_FOOD_FACTS)
+            return not_found
         
         return {
             "name": "Product not found",
@@ -229,6 +369,38 @@ async def get_product_from_barcode(barcode: str):
             "source": "openfoodfacts"
         }
 
+@app.post("/api/cache/barcodes/invalidate")
+async def invalidate_barcode_cache(invalidate_request: dict = None):
+    """Called by the Node backend when the meal catalog changes"""
+    invalidate_request = invalidate_request or {}
+    removed = barcode_product_cache.invalidate(
+        invalidate_request.get("barcodes"),
+        catalog_only=not invalidate_request.get("all", False)
+    )
+    return {"success": True, "removed": removed}
+
+async def get_products_for_barcodes(barcodes: list, deadline: float = BARCODE_LOOKUP_DEADLINE):
+    """Resolve distinct barcodes concurrently; lookups still running at the
+    deadline are cancelled and reported as timed out"""
+    unique = list(dict.fromkeys(barcodes))
+    tasks = {code: asyncio.ensure_future(get_product_from_barcode(code)) for code in unique}
+    
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    
+    products = {}
+    for code, task in tasks.items():
+        if task in pending:
+            products[code] = {
+                "name": "Product lookup timed out",
+                "barcode": code,
+                "source": "timeout"
+            }
+        else:
+            products[code] = task.result()
+    return products, len(pending)
+
 @app.post("/api/planner/suggest")
 async def suggest_meals(user_preferences: dict):
     """AI meal suggestions based on preferences"""
@@ -350,12 +522,14 @@ async def recommend_meal(meal_request: dict):
         
         # Use your existing food service to get recommendations
         # This integrates with your ChromaDB vector store
+        retrieval_stats = {}
         recommendations = food_service.get_meal_recommendations(
             query=search_query,
             meal_type=meal_type,
             target_calories=target_calories,
             max_calories=max_calories,
-            max_results=max_results
+            max_results=max_results,
+            retrieval_stats=retrieval_stats
         )
 
         return {
@@ -365,18 +539,22 @@ async def recommend_meal(meal_request: dict):
             "target_calories": target_calories,
             "max_calories": max_calories,
             "recommendations": recommendations,
-            "total_recommendations": len(recommendations) if recommendations else 0
+            "total_recommendations": len(recommendations) if recommendations else 0,
+            "retrieval_rounds": retrieval_stats.get("rounds", 0)
         }
         
     except Exception as e:
         raise HTTPException(500, f"Meal recommendation error: {str(e)}")
     
 @app.post("/api/scan/dish")
-async def scan_dish(image: UploadFile = File(...)):
+async def scan_dish(image: UploadFile = File(...), nutrition: str = Query("inline")):
     """Scan general dishes (pizza, burger, pasta, etc.) using MobileNetV2"""
     try:
         print(f"🍽️ Processing dish image: {image.filename}")
         
+        if nutrition not in NUTRITION_MODES:
+            raise HTTPException(400, f"nutrition must be one of {', '.join(NUTRITION_MODES)}")
+        
         # Validate image
         if not image.content_type.startswith('image/'):
             raise HTTPException(400, "File must be an image")
@@ -390,42 +568,56 @@ async def scan_dish(image: UploadFile = File(...)):
         prediction_result = dish_service.recognize_dish(image_data)
         print(f"🎯 Prediction result keys: {prediction_result.keys()}")
         
-        # Get nutrition data for the top prediction
-        nutrition_data = None
-        if prediction_result.get('predictions') and len(prediction_result['predictions']) > 0:
-            top_dish = prediction_result['predictions'][0]['food_name']
-            print(f"🔍 Getting nutrition for top dish: {top_dish}")
-            nutrition_data = dish_service.get_nutrition_for_dish(top_dish)
-            print(f"📊 Nutrition data source: {nutrition_data.get('source', 'unknown')}")
-            print(f"📊 Nutrition data content: {nutrition_data}")
-
-            if nutrition_data and nutrition_data.get('success') and 'nutrients' in nutrition_data:
-                    if 'fats' not in nutrition_data['nutrients']:
-                        print(f"🔄 Adding fat fallback for: {top_dish}")
-                        known_fat_values = {
-                            'pizza': 8.0, 'burger': 12.0, 'pasta': 2.0, 'sandwich': 10.0,
-                            'chicken': 3.6, 'beef': 15.0, 'fish': 5.0, 'rice': 0.3,
-                            'salad': 1.0, 'soup': 3.0, 'bread': 1.0, 'cheese': 9.0
-                        }
-                        
-                        for food, fat_value in known_fat_values.items():
-                            if food in top_dish.lower():
-                                nutrition_data['nutrients']['fats'] = f"{fat_value}g/100g"
-                                print(f"✅ Added fat value for {top_dish}: {fat_value}g")
-                                break
-        else:
-            print("⚠️ No predictions found for nutrition data")
-        
-        return {
+        response = {
             "success": True,
             "message": "Dish recognition completed",
             "prediction": prediction_result,
-            "nutrition": nutrition_data,
+            "nutrition": None,
             "service_used": "dish_recognition_mobilenetv2"
         }
         
+        if not prediction_result.get('predictions'):
+            print("⚠️ No predictions found for nutrition data")
+            return response
+        
+        top_dish = prediction_result['predictions'][0]['food_name']
+        
+        if nutrition == "inline":
+            # Get nutrition data for the top prediction
+            response["nutrition"] = _get_dish_nutrition(top_dish)
+            return response
+        
+        handle = nutrition_jobs.submit(top_dish, _get_dish_nutrition, top_dish)
+        return _two_phase_response(response, handle, nutrition)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Dish recognition error: {str(e)}")
+
+def _get_dish_nutrition(top_dish: str):
+    """Nutrition for the top dish, with the known-fat fallback applied"""
+    print(f"🔍 Getting nutrition for top dish: {top_dish}")
+    nutrition_data = dish_service.get_nutrition_for_dish(top_dish)
+    print(f"📊 Nutrition data source: {nutrition_data.get('source', 'unknown')}")
+    print(f"📊 Nutrition data content: {nutrition_data}")
+
+    if nutrition_data and nutrition_data.get('success') and 'nutrients' in nutrition_data:
+        if 'fats' not in nutrition_data['nutrients']:
+            print(f"🔄 Adding fat fallback for: {top_dish}")
+            known_fat_values = {
+                'pizza': 8.0, 'burger': 12.0, 'pasta': 2.0, 'sandwich': 10.0,
+                'chicken': 3.6, 'beef': 15.0, 'fish': 5.0, 'rice': 0.3,
+                'salad': 1.0, 'soup': 3.0, 'bread': 1.0, 'cheese': 9.0
+            }
+            
+            for food, fat_value in known_fat_values.items():
+                if food in top_dish.lower():
+                    nutrition_data['nutrients']['fats'] = fat_value
+                    print(f"✅ Added fat value for {top_dish}: {fat_value}g")
+                    break
+    
+    return nutrition_data
         
 
 if __name__ == "__main__":
@@ -433,9 +625,12 @@ if __name__ == "__main__":
     print("📡 Available endpoints:")
     print("   GET  /")
     print("   GET  /health")
-    print("   POST /api/scan/food")
+    print("   POST /api/scan/food?nutrition=inline|deferred|stream")
+    print("   POST /api/scan/dish?nutrition=inline|deferred|stream")
     print("   POST /api/scan/barcode")
     print("   GET  /api/nutrition/{food_name}")
+    print("   POST /api/nutrition/batch")
+    print("   GET  /api/nutrition/jobs/{handle}")
     print("   POST /api/planner/suggest")
     print("   POST /api/recommend-meal") 
     print("🌐 Server: http://localhost:8000")
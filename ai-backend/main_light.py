@@ -1,11 +1,14 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from cnn_service import cnn_service
 from rag_planner_service import rag_planner_service
 from barcode_service import barcode_scanner_service
+from barcode_cache import barcode_product_cache
+from barcode_stream import barcode_stream_scanner
 from dish_service import vit_dish_classifier
 from unified_food_recognition import unified_food_system
+from circuit_breaker import circuit_breaker_status
 import requests
 from PIL import Image
 import io
@@ -44,7 +47,8 @@ async def health_check():
                 "fruits_vegetables": len(cnn_service.class_names),
                 "dishes": len(vit_dish_classifier.class_names)
             },
-            "message": "Real nutrition data from FREE APIs - ViT + CNN + Barcode Integration"
+            "message": "Real nutrition data from FREE APIs - ViT + CNN + Barcode Integration",
+            "circuit_breakers": circuit_breaker_status()
         }
     except Exception as e:
         return {"error": str(e)}
@@ -234,6 +238,15 @@ async def scan_barcode(image: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(500, f"Barcode scanning error: {str(e)}")
 
+@app.websocket("/ws/scan/barcode")
+async def scan_barcode_stream(websocket: WebSocket):
+    """Scan a barcode from a stream of camera frames until the first confident read"""
+    await websocket.accept()
+    try:
+        await barcode_stream_scanner.run(websocket)
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/api/scan/search-product")
 async def search_product(product_name: str = Form(...)):
     """Manual product search as fallback"""
@@ -243,6 +256,16 @@ async def search_product(product_name: str = Form(...)):
     except Exception as e:
         raise HTTPException(500, f"Product search error: {str(e)}")
 
+@app.post("/api/cache/barcodes/invalidate")
+async def invalidate_barcode_cache(invalidate_request: dict = None):
+    """Called by the Node backend when the meal catalog changes"""
+    invalidate_request = invalidate_request or {}
+    removed = barcode_product_cache.invalidate(
+        invalidate_request.get("barcodes"),
+        catalog_only=not invalidate_request.get("all", False)
+    )
+    return {"success": True, "removed": removed}
+
 @app.get("/api/scan/barcode-status")
 async def barcode_status():
     """Check barcode scanner status"""
@@ -252,8 +275,11 @@ async def barcode_status():
         "database_search": True,
         "endpoints_available": [
             "POST /api/scan/barcode",
-            "POST /api/scan/search-product"
-        ]
+            "POST /api/scan/search-product",
+            "WS /ws/scan/barcode"
+        ],
+        "product_cache": barcode_product_cache.status(),
+        "stream_scanning": barcode_stream_scanner.status()
     }
 
 @app.post("/api/scan/unified")
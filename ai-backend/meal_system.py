@@ -3,16 +3,20 @@ from models import UserProfile
 from parsers import InputParser
 from calorie_calculator import CalorieCalculator
 from food_retriever import FoodRetriever
+from vector_backends import create_backend
+from collection_rebuild import resolve_collection_name
 from meal_planner import MealPlanner
-from config import Config
 
 class MealPlanningSystem:
     """Main meal planning system orchestrator"""
 
     def __init__(self, db_location: str, embeddings, documents=None, ids=None, add_documents=False):
-        # Initialize vector store
+        self.db_location = db_location
+        self.embeddings = embeddings
+
+        # Initialize vector store (the collection last switched to by a rebuild)
         self.vector_store = Chroma(
-            collection_name=Config.COLLECTION_NAME,
+            collection_name=resolve_collection_name(db_location),
             persist_directory=db_location,
             embedding_function=embeddings
         )
@@ -22,15 +26,35 @@ class MealPlanningSystem:
 
         # Initialize components
 
+        self.parser = InputParser()
         self.calorie_calculator = CalorieCalculator()
-        self.food_retriever = FoodRetriever(self.vector_store)
+        self.vector_backend = create_backend(self.vector_store)
+        self.food_retriever = FoodRetriever(self.vector_store, self.vector_backend)
         self.meal_planner = MealPlanner()
 
+    def add_documents(self, documents, ids=None):
+        """Write to the vector store and drop cached retrieval results.
+
+        An exported (NumPy) index catches up in the background; cached
+        results are dropped again once it has.
+        """
+        vector_store, vector_backend, food_retriever = self.vector_store, self.vector_backend, self.food_retriever
+        vector_store.add_documents(documents=documents, ids=ids)
+        vector_backend.sync(vector_store, on_synced=food_retriever.invalidate_cache)
+        food_retriever.invalidate_cache()
+
+    def swap_vector_store(self, vector_store, vector_backend, food_retriever):
+        """Serve from another (already warmed) collection.
+
+        Requests read each attribute once, so in-flight plans finish on the
+        collection they started with.
+        """
+        self.vector_store, self.vector_backend, self.food_retriever = vector_store, vector_backend, food_retriever
+
     def create_meal_plan(self, user_profile: UserProfile, user_input: str) -> dict:
         """Create a complete meal plan"""
         print("🧠 PARSING: Understanding your request...")
-        self.parser = InputParser(user_profile)
-        parsed_input = self.parser.parse(user_input)
+        parsed_input = self.parser.parse(user_input, user_profile)
 
         print(f"   Intent: {parsed_input.user_intent}")
         eaten_meals = [k for k, v in parsed_input.already_eaten.items()
@@ -46,10 +70,12 @@ class MealPlanningSystem:
         print(f"   Remaining meals: {', '.join(caloric_plan.remaining_meals)}")
 
         print("\n🔍 STAGE 2: Finding suitable meals...")
-        candidates = self.food_retriever.retrieve_candidates(parsed_input, caloric_plan)
+        retrieval_rounds = {}
+        food_retriever = self.food_retriever
+        candidates = food_retriever.retrieve_candidates(parsed_input, caloric_plan, rounds=retrieval_rounds)
 
         total_candidates = sum(len(items) for items in candidates.values())
-        print(f"   Found {total_candidates} suitable meal items")
+        print(f"   Found {total_candidates} suitable meal items (retrieval rounds: {retrieval_rounds})")
 
         for meal_type, items in candidates.items():
             if items:
@@ -62,5 +88,6 @@ class MealPlanningSystem:
             "parsed_input": parsed_input,
             "caloric_plan": caloric_plan,
             "candidates": candidates,
+            "retrieval_rounds": retrieval_rounds,
             "final_plan": final_plan
         }
@@ -0,0 +1,147 @@
+# ================================
+# File: name_index.py
+# In-memory token trie over catalog item names
+# ================================
+#
+# Resolves explicit requests ("chicken", "greek yogurt") to catalog items
+# without embedding anything: every query token must match an item token,
+# exactly or as a prefix ("chick" -> "chicken"). Built from the vector
+# store's documents at startup (right after ingest) and rebuilt whenever
+# the catalog changes.
+
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+
+PAGE_SIZE = 1000
+
+# Request words that never name a food
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "with", "some", "for", "i", "want", "like",
+    "to", "eat", "have", "my", "me", "please", "maybe",
+    "breakfast", "lunch", "dinner", "snack", "snacks", "meal"
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def name_tokens(text: str) -> List[str]:
+    """Lowercase word tokens with a light plural strip (eggs -> egg)"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _item_name(document: Document) -> str:
+    item = (document.metadata or {}).get("item")
+    if item:
+        return str(item)
+    # Documents ingested without metadata: "<item> - Category: ..."
+    return document.page_content.split(" - ", 1)[0]
+
+
+class _TrieNode:
+    __slots__ = ("children", "exact", "below")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.exact: Set[int] = set()   # rows with a token ending here
+        self.below: Set[int] = set()   # rows with a token passing through here (prefix matches)
+
+
+class NameIndex:
+    """Token trie: token -> catalog rows, with exact and prefix lookup"""
+
+    def __init__(self, documents: List[Document]):
+        started = time.perf_counter()
+        self.documents = documents
+        self.names = [_item_name(doc) for doc in documents]
+        self.token_counts = []
+        self._root = _TrieNode()
+
+        for row, name in enumerate(self.names):
+            tokens = name_tokens(name)
+            self.token_counts.append(len(tokens))
+            for token in tokens:
+                node = self._root
+                for char in token:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.below.add(row)
+                node.exact.add(row)
+
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "NameIndex":
+        """Read every stored document (paged) and index its item name"""
+        collection = vector_store._collection
+        documents, offset = [], 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=PAGE_SIZE, offset=offset)
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            documents.extend(
+                Document(page_content=content, metadata=metadata or {})
+                for content, metadata in zip(page["documents"], page["metadatas"])
+            )
+            offset += len(page_ids)
+        return cls(documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _node(self, token: str) -> Optional[_TrieNode]:
+        node = self._root
+        for char in token:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def lookup(self, request: str, category: Optional[str] = None,
+               max_calories: Optional[float] = None, limit: int = 10) -> List[Document]:
+        """Items whose names contain every request token (exact or prefix).
+
+        Ranked by exact token matches, then by shorter names (closer to
+        what was asked for). Empty when any token matches nothing.
+        """
+        tokens = [t for t in name_tokens(request) if t not in STOPWORDS]
+        if not tokens:
+            return []
+
+        rows: Optional[Set[int]] = None
+        exact_hits: Dict[int, int] = {}
+        for token in tokens:
+            node = self._node(token)
+            if node is None:
+                return []
+            rows = set(node.below) if rows is None else rows & node.below
+            if not rows:
+                return []
+            for row in node.exact:
+                exact_hits[row] = exact_hits.get(row, 0) + 1
+
+        matches: List[Tuple[int, int, str, int]] = []
+        for row in rows:
+            metadata = self.documents[row].metadata
+            if category and metadata.get("category", category) != category:
+                continue
+            calories = metadata.get("calories")
+            if max_calories is not None and isinstance(calories, (int, float)) and calories > max_calories:
+                continue
+            matches.append((-exact_hits.get(row, 0), self.token_counts[row], self.names[row], row))
+
+        matches.sort()
+        return [self.documents[row] for _, _, _, row in matches[:limit]]
+
+    def status(self) -> Dict:
+        return {
+            "items": len(self.documents),
+            "build_ms": round(self.build_seconds * 1000, 2)
+        }
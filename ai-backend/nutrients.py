@@ -0,0 +1,168 @@
+# ================================
+# File: nutrients.py
+# Typed nutrient records with a fixed unit basis
+# ================================
+
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+# Every record is expressed per 100 g of food
+NUTRIENT_BASIS = "per_100g"
+
+# Field order of the backing array
+NUTRIENT_FIELDS = ("calories", "protein", "fats", "carbs", "fiber", "sugar", "sodium")
+NUTRIENT_UNITS = {
+    "calories": "kcal",
+    "protein": "g",
+    "fats": "g",
+    "carbs": "g",
+    "fiber": "g",
+    "sugar": "g",
+    "sodium": "mg"
+}
+_FIELD_INDEX = {field: i for i, field in enumerate(NUTRIENT_FIELDS)}
+
+# Alternative key spellings found in older payloads
+_FIELD_ALIASES = {"fat": "fats", "carbohydrates": "carbs", "sugars": "sugar", "energy": "calories"}
+
+# USDA FoodData Central nutrient ids (and legacy nutrient numbers) -> field.
+# Ids listed earlier take precedence, e.g. 1008 energy over Atwater estimates.
+USDA_NUTRIENT_IDS = {
+    1008: "calories",   # Energy (kcal)
+    2047: "calories",   # Energy (Atwater General Factors)
+    2048: "calories",   # Energy (Atwater Specific Factors)
+    1003: "protein",
+    1004: "fats",       # Total lipid (fat)
+    1005: "carbs",      # Carbohydrate, by difference
+    1079: "fiber",      # Fiber, total dietary
+    2000: "sugar",      # Sugars, total including NLEA
+    1063: "sugar",      # Sugars, Total NLEA
+    1093: "sodium"      # Sodium, Na (mg)
+}
+USDA_NUTRIENT_NUMBERS = {
+    "208": 1008, "957": 2047, "958": 2048, "203": 1003, "204": 1004,
+    "205": 1005, "291": 1079, "269": 2000, "539": 1063, "307": 1093
+}
+_USDA_PRIORITY = {nutrient_id: rank for rank, nutrient_id in enumerate(USDA_NUTRIENT_IDS)}
+
+# Open Food Facts nutriment keys -> (field, scale to our unit)
+OFF_NUTRIMENT_FIELDS = {
+    "energy-kcal_100g": ("calories", 1.0),
+    "proteins_100g": ("protein", 1.0),
+    "fat_100g": ("fats", 1.0),
+    "carbohydrates_100g": ("carbs", 1.0),
+    "fiber_100g": ("fiber", 1.0),
+    "sugars_100g": ("sugar", 1.0),
+    "sodium_100g": ("sodium", 1000.0)  # OFF reports grams
+}
+
+
+class NutrientRecord:
+    """Compact, array-backed nutrient values per 100 g (NaN = unknown)"""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Optional[np.ndarray] = None):
+        if values is None:
+            values = np.full(len(NUTRIENT_FIELDS), np.nan, dtype=np.float32)
+        self.values = values
+
+    # ---------- ingest ----------
+
+    @classmethod
+    def from_usda(cls, food: Dict) -> "NutrientRecord":
+        """Map a USDA food (search or /foods result) by nutrient id"""
+        record = cls()
+        best_rank = {}
+        for nutrient in food.get("foodNutrients", []):
+            nutrient_id = _usda_nutrient_id(nutrient)
+            field = USDA_NUTRIENT_IDS.get(nutrient_id)
+            if field is None:
+                continue
+            value = nutrient.get("value", nutrient.get("amount"))
+            rank = _USDA_PRIORITY[nutrient_id]
+            if value is None or rank >= best_rank.get(field, len(_USDA_PRIORITY)):
+                continue
+            best_rank[field] = rank
+            record.set(field, value)
+        return record
+
+    @classmethod
+    def from_off(cls, nutriments: Dict) -> "NutrientRecord":
+        """Map an Open Food Facts `nutriments` object"""
+        record = cls()
+        for key, (field, scale) in OFF_NUTRIMENT_FIELDS.items():
+            value = nutriments.get(key)
+            if value not in (None, ""):
+                record.set(field, _to_float(value) * scale)
+        return record
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NutrientRecord":
+        """Rebuild a record from numeric values serialized by to_dict()"""
+        record = cls()
+        for key, value in (data or {}).items():
+            field = _FIELD_ALIASES.get(key, key)
+            if field in _FIELD_INDEX and isinstance(value, (int, float)):
+                record.set(field, value)
+        return record
+
+    @classmethod
+    def from_values(cls, **values) -> "NutrientRecord":
+        return cls.from_dict(values)
+
+    # ---------- access ----------
+
+    def get(self, field: str, default=None) -> Optional[float]:
+        value = self.values[_FIELD_INDEX[field]]
+        return default if math.isnan(value) else float(value)
+
+    def set(self, field: str, value):
+        self.values[_FIELD_INDEX[field]] = _to_float(value)
+
+    def has(self, field: str) -> bool:
+        return not math.isnan(self.values[_FIELD_INDEX[field]])
+
+    def __bool__(self) -> bool:
+        return not bool(np.isnan(self.values).all())
+
+    def __repr__(self) -> str:
+        return f"NutrientRecord({self.to_dict()})"
+
+    # ---------- output ----------
+
+    def to_dict(self, fat_key: str = "fats") -> Dict[str, float]:
+        """Numeric values for known fields only, keyed by canonical names"""
+        result = {}
+        for field, value in zip(NUTRIENT_FIELDS, self.values):
+            if not math.isnan(value):
+                result[fat_key if field == "fats" else field] = round(float(value), 2)
+        return result
+
+
+def stack_records(records: Iterable[NutrientRecord]) -> np.ndarray:
+    """(n, len(NUTRIENT_FIELDS)) matrix for vectorized comparisons"""
+    rows = [record.values for record in records]
+    if not rows:
+        return np.empty((0, len(NUTRIENT_FIELDS)), dtype=np.float32)
+    return np.vstack(rows)
+
+
+def _usda_nutrient_id(nutrient: Dict) -> Optional[int]:
+    # Search results are flat, /foods results nest the nutrient definition
+    nested = nutrient.get("nutrient") or {}
+    nutrient_id = nutrient.get("nutrientId", nested.get("id"))
+    if nutrient_id is not None:
+        return int(nutrient_id)
+    # Abridged /foods results only carry the legacy nutrient number
+    number = nutrient.get("nutrientNumber", nutrient.get("number", nested.get("number")))
+    return USDA_NUTRIENT_NUMBERS.get(str(number)) if number is not None else None
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
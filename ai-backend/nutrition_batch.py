@@ -0,0 +1,274 @@
+# ================================
+# File: nutrition_batch.py
+# Batched nutrition lookups with upstream request aggregation
+# ================================
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from circuit_breaker import CircuitOpenError, usda_breaker
+from label_resolution import label_resolution_table
+from nutrients import USDA_NUTRIENT_NUMBERS
+
+# name -> fdcId learned from searches, kept across restarts so a name is
+# searched once per deployment rather than once per process
+DEFAULT_FDC_ID_PATH = os.getenv(
+    "FDC_ID_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fdc_id_cache.json")
+)
+
+
+class NutritionBatchResolver:
+    """Resolves nutrition for many food names with as few upstream calls as possible.
+
+    - names are normalized and deduplicated
+    - classifier labels come from the precomputed label table, offline
+    - successful results are cached for `cache_ttl` seconds
+    - names whose USDA fdcId is already known are refreshed together through
+      one POST /foods call (up to USDA_MAX_IDS per call); learned fdcIds are
+      persisted to `fdc_id_path`, so this covers every name seen before
+    - only names never seen before go through the per-name search (USDA's
+      search takes a single query per call)
+    - concurrent single-name requests arriving within `window_seconds`
+      are merged into the same upstream batch
+    - results and fdcIds are LRU-bounded, names being arbitrary user input
+    """
+
+    USDA_FOODS_URL = "https://api.nal.usda.gov/fdc/v1/foods"
+    USDA_MAX_IDS = 20
+
+    def __init__(self, food_service, cache_ttl: float = 3600.0,
+                 window_seconds: float = 0.02, max_workers: int = 4, max_cached: int = 10000,
+                 max_fdc_ids: int = 50000, fdc_id_path: Optional[str] = DEFAULT_FDC_ID_PATH):
+        self.food_service = food_service
+        self.cache_ttl = cache_ttl
+        self.window_seconds = window_seconds
+        self.max_cached = max_cached
+        self.max_fdc_ids = max_fdc_ids
+        self.fdc_id_path = fdc_id_path
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nutrition-batch")
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (expires_at, result)
+        self._fdc_ids: "OrderedDict[str, int]" = OrderedDict()   # key -> fdcId learned from searches
+        self._load_fdc_ids()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._window_keys: List[str] = []
+        self._flush_handle = None
+        self.stats = {"requests": 0, "cache_hits": 0, "batches": 0, "foods_calls": 0, "searches": 0}
+
+    @staticmethod
+    def normalize(food_name: str) -> str:
+        return food_name.lower().split(',')[0].strip()
+
+    # ---------- public API ----------
+
+    async def resolve(self, food_name: str) -> Dict[str, Any]:
+        """Nutrition for one name, merged with other requests in the same window"""
+        key = self.normalize(food_name)
+        self.stats["requests"] += 1
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._in_flight[key] = future
+            self._window_keys.append(key)
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await asyncio.shield(future)
+
+    async def resolve_many(self, food_names: List[str]) -> Dict[str, Any]:
+        """Nutrition for a list of names; duplicates are looked up once"""
+        unique = list(dict.fromkeys(name for name in food_names if name and name.strip()))
+        cache_hits = sum(1 for name in unique if self._cache_get(self.normalize(name)) is not None)
+
+        results = await asyncio.gather(*(self.resolve(name) for name in unique))
+
+        return {
+            "requested": len(food_names),
+            "unique": len(unique),
+            "cache_hits": cache_hits,
+            "results": dict(zip(unique, results))
+        }
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            cached, known = len(self._cache), len(self._fdc_ids)
+        return {**self.stats, "cached_names": cached, "known_fdc_ids": known}
+
+    # ---------- batching ----------
+
+    def _flush(self):
+        keys, self._window_keys = self._window_keys, []
+        self._flush_handle = None
+        if keys:
+            asyncio.ensure_future(self._dispatch(keys))
+
+    async def _dispatch(self, keys: List[str]):
+        self.stats["batches"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self._fetch_batch, keys)
+        except Exception as e:
+            results = {key: _error_result(f"Nutrition API error: {str(e)}") for key in keys}
+
+        for key in keys:
+            result = results.get(key) or _error_result("No nutrition data found")
+            if result.get("success"):
+                self._cache_put(key, result)
+            future = self._in_flight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def _fetch_batch(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Blocking upstream work for one batch (runs on the executor)"""
+        results = {}
+
+        # 1) Classifier labels: the precomputed table, no network at all
+        for key in keys:
+            if label_resolution_table.lookup(key):
+                results[key] = self.food_service.get_nutrition_from_api(key)
+
+        # 2) Known fdcIds: one /foods call per USDA_MAX_IDS ids
+        known = self._known_fdc_ids([key for key in keys if key not in results])
+        if known:
+            results.update(self._fetch_by_fdc_ids(known))
+
+        # 3) Everything else: per-name search, in parallel
+        unknown = [key for key in keys if key not in results]
+        if unknown:
+            self.stats["searches"] += len(unknown)
+            learned = False
+            with ThreadPoolExecutor(max_workers=min(8, len(unknown))) as pool:
+                for key, result in zip(unknown, pool.map(self.food_service.get_nutrition_from_api, unknown)):
+                    results[key] = result
+                    data = (result.get("data") or {}) if result.get("success") else {}
+                    # Only learn from searches; table answers stay local
+                    fdc_id = data.get("fdc_id") if "resolution" not in data else None
+                    if fdc_id:
+                        learned = True
+                        with self._lock:
+                            _lru_put(self._fdc_ids, key, fdc_id, self.max_fdc_ids)
+            if learned:
+                self._save_fdc_ids()
+
+        return results
+
+    # ---------- fdcIds ----------
+
+    def _known_fdc_ids(self, keys: List[str]) -> Dict[str, int]:
+        with self._lock:
+            known = {}
+            for key in keys:
+                if key in self._fdc_ids:
+                    self._fdc_ids.move_to_end(key)
+                    known[key] = self._fdc_ids[key]
+            return known
+
+    def _load_fdc_ids(self):
+        if not self.fdc_id_path or not os.path.exists(self.fdc_id_path):
+            return
+        try:
+            with open(self.fdc_id_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read fdcId cache {self.fdc_id_path}: {e}")
+            return
+        # Stored oldest first, so the LRU order survives the round trip
+        for key, fdc_id in list(stored.items())[-self.max_fdc_ids:]:
+            self._fdc_ids[key] = int(fdc_id)
+        print(f"📚 Loaded {len(self._fdc_ids)} known USDA fdcIds from {self.fdc_id_path}")
+
+    def _save_fdc_ids(self):
+        if not self.fdc_id_path:
+            return
+        with self._lock:
+            snapshot = dict(self._fdc_ids)
+        tmp_path = f"{self.fdc_id_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.fdc_id_path)
+        except OSError as e:
+            print(f"⚠️ Could not write fdcId cache {self.fdc_id_path}: {e}")
+
+    def _fetch_by_fdc_ids(self, known: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        keys_by_id: Dict[int, List[str]] = {}
+        for key, fdc_id in known.items():
+            keys_by_id.setdefault(fdc_id, []).append(key)
+
+        fdc_ids = list(keys_by_id)
+        for start in range(0, len(fdc_ids), self.USDA_MAX_IDS):
+            chunk = fdc_ids[start:start + self.USDA_MAX_IDS]
+            try:
+                self.stats["foods_calls"] += 1
+                response = usda_breaker.call(
+                    requests.post,
+                    self.USDA_FOODS_URL,
+                    params={'api_key': 'DEMO_KEY'},
+                    json={
+                        'fdcIds': chunk,
+                        'format': 'abridged',
+                        'nutrients': [int(number) for number in USDA_NUTRIENT_NUMBERS]
+                    },
+                    timeout=10
+                )
+            except (CircuitOpenError, requests.RequestException) as e:
+                print(f"⚠️ USDA /foods batch failed: {e}")
+                continue
+
+            if response.status_code != 200:
+                print(f"⚠️ USDA /foods batch failed: {response.status_code}")
+                continue
+
+            for food in response.json() or []:
+                for key in keys_by_id.get(food.get('fdcId'), []):
+                    result = self.food_service.usda_food_to_nutrition(food, key)
+                    if result:
+                        results[key] = result
+
+        return results
+
+    # ---------- cache ----------
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            _lru_put(self._cache, key, (time.monotonic() + self.cache_ttl, result), self.max_cached)
+
+
+def _lru_put(entries: OrderedDict, key, value, max_entries: int):
+    entries[key] = value
+    entries.move_to_end(key)
+    while len(entries) > max_entries:
+        entries.popitem(last=False)
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    return {'success': False, 'error': message}
@@ -0,0 +1,90 @@
+# ================================
+# File: nutrition_jobs.py
+# Background nutrition lookups for two-phase scan responses
+# ================================
+
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class NutritionJobStore:
+    """Runs nutrition lookups off the request path and hands out handles.
+
+    Scan endpoints return the classification right away together with a
+    handle; the nutrition result is then fetched (or streamed) separately.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_workers: int = 8):
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nutrition")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, food_name: str, func: Callable, *args) -> str:
+        """Start a lookup in the background and return its handle"""
+        self._evict_expired()
+        handle = uuid.uuid4().hex
+        future = self._executor.submit(func, *args)
+        with self._lock:
+            self._jobs[handle] = {
+                "future": future,
+                "food_name": food_name,
+                "created": time.monotonic()
+            }
+        return handle
+
+    def status(self, handle: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job, or None for unknown/expired handles"""
+        with self._lock:
+            job = self._jobs.get(handle)
+        if job is None:
+            return None
+
+        future = job["future"]
+        result = {
+            "handle": handle,
+            "food_name": job["food_name"],
+            "status": "pending",
+            "nutrition": None
+        }
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                result["status"] = "failed"
+                result["error"] = f"Nutrition lookup error: {str(error)}"
+            else:
+                result["status"] = "done"
+                result["nutrition"] = future.result()
+        return result
+
+    async def wait(self, handle: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait up to `timeout` seconds for a job, then report its state"""
+        with self._lock:
+            job = self._jobs.get(handle)
+        if job is None:
+            return None
+
+        if timeout > 0 and not job["future"].done():
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job["future"])), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                pass  # reported through status()
+        return self.status(handle)
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [h for h, job in self._jobs.items()
+                       if job["created"] < cutoff and job["future"].done()]
+            for handle in expired:
+                del self._jobs[handle]
+
+
+# Global instance
+nutrition_jobs = NutritionJobStore()
@@ -0,0 +1,230 @@
+# ================================
+# File: onnx_encoder.py
+# INT8-quantized MiniLM sentence encoder on ONNX Runtime (no torch at runtime)
+# ================================
+#
+# Export + quantize (needs torch/transformers once, on a build box):
+#     python onnx_encoder.py export [--model all-MiniLM-L6-v2] [--out onnx_minilm]
+# Parity check against the PyTorch sentence-transformers model:
+#     python onnx_encoder.py parity
+# Serve with EMBEDDING_BACKEND=onnx (ONNX_MODEL_DIR points at the export).
+#
+# Export directory:
+#   model.onnx         fp32 graph (kept for re-quantizing)
+#   model_int8.onnx    dynamically quantized graph used at runtime
+#   tokenizer.json     fast tokenizer for the `tokenizers` package
+#   manifest.json      source model, max length, pooling
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from config import Config
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+DEFAULT_MAX_LENGTH = 256
+
+# Sentences for the parity check: planner-style requests and catalog rows
+PARITY_SENTENCES = [
+    "I want chicken for lunch",
+    "already had breakfast, plan the rest of my day",
+    "something light with greek yogurt for a snack",
+    "high protein dinner under 500 calories",
+    "Scrambled Eggs - Category: breakfast, Serving: 2 eggs, Calories: 140 kcal",
+    "Grilled Salmon - Category: dinner, Serving: 6 oz salmon, Calories: 350 kcal",
+    "Trail Mix - Category: snacks, Serving: 1/4 cup, Calories: 150 kcal",
+    "vegetarian pasta with vegetables",
+    "i skipped lunch",
+    "oatmeal with banana and coffee",
+]
+
+
+def hub_model_id(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+class OnnxSentenceEncoder:
+    """Mean-pooled MiniLM embeddings from an exported ONNX graph.
+
+    Drop-in for SentenceTransformer.encode as used by EmbeddingService:
+    batch of strings in, (n, dimension) float32 out.
+    """
+
+    def __init__(self, model_dir: str = Config.ONNX_MODEL_DIR, threads: int = 0):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime and tokenizers are not installed")
+
+        manifest_path = os.path.join(model_dir, "manifest.json")
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        self.model_dir = model_dir
+        self.max_length = manifest.get("max_length", DEFAULT_MAX_LENGTH)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding(pad_id=manifest.get("pad_id", 0), pad_token=manifest.get("pad_token", "[PAD]"))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, manifest.get("runtime_file", QUANTIZED_MODEL_FILE)),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        hidden = self.session.get_outputs()[0].shape[-1]
+        self.dimension = hidden if isinstance(hidden, int) else 0
+        if not self.dimension:
+            self.dimension = self.encode(["dimension probe"]).shape[1]
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, as sentence-transformers does
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            chunks.append(pooled.astype(np.float32))
+
+        vectors = np.vstack(chunks)
+        if normalize:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+def export_model(model_name: str = Config.EMBEDDING_MODEL, out_dir: str = Config.ONNX_MODEL_DIR,
+                 max_length: int = DEFAULT_MAX_LENGTH) -> Dict:
+    """Export the transformer to ONNX and write a dynamically INT8-quantized copy"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(out_dir, exist_ok=True)
+    model_id = hub_model_id(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    print(f"🔄 Exporting {model_id} to {fp32_path}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    print("🔄 Quantizing weights to INT8...")
+    quantize_dynamic(fp32_path, os.path.join(out_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+    manifest = {
+        "model": model_name,
+        "hub_id": model_id,
+        "runtime_file": QUANTIZED_MODEL_FILE,
+        "max_length": max_length,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+        "pooling": "mean",
+        "exported_at": time.time()
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ ONNX encoder written to {out_dir}")
+    return manifest
+
+
+def parity_check(model_name: str = Config.EMBEDDING_MODEL, model_dir: str = Config.ONNX_MODEL_DIR,
+                 sentences: List[str] = PARITY_SENTENCES, min_cosine: float = 0.98) -> Dict:
+    """Compare ONNX INT8 embeddings with the PyTorch model on the same sentences.
+
+    Reports the per-sentence cosine between the two embeddings, the
+    largest change in any pairwise similarity (what retrieval ranks on),
+    and single-query encode latency for both.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    reference_model = SentenceTransformer(model_name)
+    onnx_encoder = OnnxSentenceEncoder(model_dir)
+
+    def reference(texts):
+        return np.asarray(reference_model.encode(list(texts), normalize_embeddings=True,
+                                                 show_progress_bar=False), dtype=np.float32)
+
+    expected = reference(sentences)
+    actual = onnx_encoder.encode(sentences)
+    self_cosine = np.sum(expected * actual, axis=1)
+    similarity_drift = np.abs(expected @ expected.T - actual @ actual.T)
+
+    def per_query_ms(encode):
+        encode(sentences[:1])  # warm-up
+        started = time.perf_counter()
+        for sentence in sentences:
+            encode([sentence])
+        return (time.perf_counter() - started) * 1000 / len(sentences)
+
+    report = {
+        "sentences": len(sentences),
+        "min_cosine": round(float(self_cosine.min()), 4),
+        "mean_cosine": round(float(self_cosine.mean()), 4),
+        "max_similarity_drift": round(float(similarity_drift.max()), 4),
+        "torch_ms_per_query": round(per_query_ms(reference), 2),
+        "onnx_ms_per_query": round(per_query_ms(onnx_encoder.encode), 2),
+    }
+    report["passed"] = report["min_cosine"] >= min_cosine
+    print(f"{'✅' if report['passed'] else '❌'} Parity: {report}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / verify the ONNX INT8 sentence encoder")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL)
+    parser.add_argument("--out", default=Config.ONNX_MODEL_DIR)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.model, args.out)
+        parity_check(args.model, args.out, min_cosine=args.min_cosine)
+    else:
+        report = parity_check(args.model, args.out, min_cosine=args.min_cosine)
+        raise SystemExit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
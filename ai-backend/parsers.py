@@ -9,30 +9,95 @@ from config import Config
 
 import json
 import re
-import numpy as np
 from typing import Dict, List, Optional
 from langchain.prompts import ChatPromptTemplate
 from langchain_ollama.llms import OllamaLLM
 
-try:
-    from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
-    SEMANTIC_AVAILABLE = True
-except ImportError:
-    SEMANTIC_AVAILABLE = False
-    print("⚠️  Warning: sentence-transformers or scikit-learn not available. Install with:")
-    print("   pip install sentence-transformers scikit-learn")
-
-
+from embedding_service import embedding_service, EMBEDDINGS_AVAILABLE
+from pattern_embeddings import PatternEmbeddings
+
+SEMANTIC_AVAILABLE = EMBEDDINGS_AVAILABLE
+
+
+# Consumption patterns for each meal
+CONSUMPTION_PATTERNS = {
+    "breakfast": [
+        "already had breakfast", "finished breakfast", "ate breakfast",
+        "done with breakfast", "breakfast is complete", "had morning meal",
+        "consumed breakfast", "breakfast already eaten", "morning food done",
+        "breakfast finished", "completed breakfast", "had my breakfast"
+    ],
+    "lunch": [
+        "already had lunch", "finished lunch", "ate lunch",
+        "done with lunch", "lunch is complete", "had midday meal",
+        "consumed lunch", "lunch already eaten", "afternoon food done",
+        "lunch finished", "completed lunch", "had my lunch"
+    ],
+    "dinner": [
+        "already had dinner", "finished dinner", "ate dinner",
+        "done with dinner", "dinner is complete", "had evening meal",
+        "consumed dinner", "dinner already eaten", "night food done",
+        "dinner finished", "completed dinner", "had my dinner"
+    ],
+    "snacks": [
+        "already had snacks", "finished snacking", "ate snacks",
+        "done snacking", "had some snacks", "consumed snacks",
+        "snacked already", "had a snack", "snack time done"
+    ]
+}
+
+# General meal items with semantic descriptions
+MEAL_ITEM_PATTERNS = {
+    "chicken": [
+        "chicken", "grilled chicken", "fried chicken", "chicken breast", "chicken thigh",
+        "roasted chicken", "baked chicken", "chicken salad", "chicken sandwich"
+    ],
+    "beef": [
+        "beef", "steak", "hamburger", "ground beef", "roast beef", "beef stew",
+        "beef burger", "beef sandwich", "beef tacos"
+    ],
+    "fish": [
+        "fish", "salmon", "tuna", "cod", "tilapia", "seafood", "grilled fish",
+        "baked fish", "fish tacos", "fish sandwich"
+    ],
+    "pasta": [
+        "pasta", "spaghetti", "macaroni", "noodles", "lasagna", "ravioli",
+        "pasta salad", "pasta primavera", "carbonara"
+    ],
+    "rice": [
+        "rice", "brown rice", "white rice", "fried rice", "rice pilaf",
+        "rice bowl", "rice salad", "jasmine rice"
+    ],
+    "salad": [
+        "salad", "green salad", "caesar salad", "garden salad", "fruit salad",
+        "potato salad", "pasta salad", "chicken salad"
+    ],
+    "eggs": [
+        "eggs", "scrambled eggs", "boiled eggs", "fried eggs", "omelette",
+        "egg salad", "deviled eggs", "egg sandwich"
+    ],
+    "sandwich": [
+        "sandwich", "ham sandwich", "turkey sandwich", "club sandwich",
+        "grilled cheese", "BLT", "sub sandwich", "panini"
+    ]
+}
+
+# Groups embedded into the precomputed pattern matrix (pattern_embeddings.py)
+SEMANTIC_PATTERN_GROUPS = {
+    "consumption": CONSUMPTION_PATTERNS,
+    "items": MEAL_ITEM_PATTERNS
+}
 
 
 class InputParser:
     """Parses user meal requests with optional semantic validation"""
 
-    def __init__(self, user_profile: UserProfile):
+    def __init__(self, user_profile: Optional[UserProfile] = None):
+        # Built once and reused across requests; per-request values are
+        # passed to parse() instead of being stored on the parser
         self.model = OllamaLLM(model=Config.LLM_MODEL)
         self._setup_templates()
-        self.target_calories = user_profile.target_calories
+        self.default_target_calories = user_profile.target_calories if user_profile else 2000
 
         # Initialize embedding model and patterns if available
         if SEMANTIC_AVAILABLE:
@@ -90,99 +155,34 @@ class InputParser:
 
     def _setup_semantic_validation(self):
         """Initialize embedding model and semantic patterns"""
-        print("   🧠 Loading semantic validation model...")
-
-        # Use a more lightweight model for faster loading
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            print(f"   Failed to load SentenceTransformer: {e}")
-            raise
-
-        # Consumption patterns for each meal
-        self.consumption_patterns = {
-            "breakfast": [
-                "already had breakfast", "finished breakfast", "ate breakfast",
-                "done with breakfast", "breakfast is complete", "had morning meal",
-                "consumed breakfast", "breakfast already eaten", "morning food done",
-                "breakfast finished", "completed breakfast", "had my breakfast"
-            ],
-            "lunch": [
-                "already had lunch", "finished lunch", "ate lunch",
-                "done with lunch", "lunch is complete", "had midday meal",
-                "consumed lunch", "lunch already eaten", "afternoon food done",
-                "lunch finished", "completed lunch", "had my lunch"
-            ],
-            "dinner": [
-                "already had dinner", "finished dinner", "ate dinner",
-                "done with dinner", "dinner is complete", "had evening meal",
-                "consumed dinner", "dinner already eaten", "night food done",
-                "dinner finished", "completed dinner", "had my dinner"
-            ],
-            "snacks": [
-                "already had snacks", "finished snacking", "ate snacks",
-                "done snacking", "had some snacks", "consumed snacks",
-                "snacked already", "had a snack", "snack time done"
-            ]
-        }
+        print("   🧠 Loading semantic validation patterns...")
 
-        # General meal items with semantic descriptions
-        self.meal_items = {
-            "chicken": [
-                "chicken", "grilled chicken", "fried chicken", "chicken breast", "chicken thigh",
-                "roasted chicken", "baked chicken", "chicken salad", "chicken sandwich"
-            ],
-            "beef": [
-                "beef", "steak", "hamburger", "ground beef", "roast beef", "beef stew",
-                "beef burger", "beef sandwich", "beef tacos"
-            ],
-            "fish": [
-                "fish", "salmon", "tuna", "cod", "tilapia", "seafood", "grilled fish",
-                "baked fish", "fish tacos", "fish sandwich"
-            ],
-            "pasta": [
-                "pasta", "spaghetti", "macaroni", "noodles", "lasagna", "ravioli",
-                "pasta salad", "pasta primavera", "carbonara"
-            ],
-            "rice": [
-                "rice", "brown rice", "white rice", "fried rice", "rice pilaf",
-                "rice bowl", "rice salad", "jasmine rice"
-            ],
-            "salad": [
-                "salad", "green salad", "caesar salad", "garden salad", "fruit salad",
-                "potato salad", "pasta salad", "chicken salad"
-            ],
-            "eggs": [
-                "eggs", "scrambled eggs", "boiled eggs", "fried eggs", "omelette",
-                "egg salad", "deviled eggs", "egg sandwich"
-            ],
-            "sandwich": [
-                "sandwich", "ham sandwich", "turkey sandwich", "club sandwich",
-                "grilled cheese", "BLT", "sub sandwich", "panini"
-            ]
-        }
+        # Shared process-wide model; loaded on first use
+        self.embedding_model = embedding_service
+        self.consumption_patterns = CONSUMPTION_PATTERNS
+        self.meal_items = MEAL_ITEM_PATTERNS
 
         # Pre-compute embeddings for all patterns
         self._precompute_embeddings()
         print("   ✅ Semantic validation ready!")
 
     def _precompute_embeddings(self):
-        """Pre-compute embeddings for better performance"""
-        self.consumption_embeddings = {}
-        self.item_embeddings = {}
+        """Map the precomputed, stacked pattern matrix (built once if missing or stale)"""
+        self.pattern_embeddings = PatternEmbeddings.load_or_build(SEMANTIC_PATTERN_GROUPS, embedding_service)
 
-        # Compute consumption pattern embeddings
-        for meal_type, patterns in self.consumption_patterns.items():
-            embeddings = self.embedding_model.encode(patterns)
-            self.consumption_embeddings[meal_type] = embeddings
+    def _semantic_scores(self, user_input: str):
+        """Encode the input once and score it against every pattern.
 
-        # Compute item embeddings
-        for item_name, descriptions in self.meal_items.items():
-            embeddings = self.embedding_model.encode(descriptions)
-            self.item_embeddings[item_name] = embeddings
+        Returns the raw per-pattern scores and the per-(group, name) maxima.
+        """
+        query = self.embedding_model.encode_queries([user_input])[0]
+        scores = self.pattern_embeddings.similarities(query)
+        return scores, self.pattern_embeddings.segment_maxima(scores)
 
-    def parse(self, user_input: str) -> ParsedInput:
+    def parse(self, user_input: str, user_profile: Optional[UserProfile] = None) -> ParsedInput:
         """Parse user input into structured format"""
+        target_calories = user_profile.target_calories if user_profile else self.default_target_calories
+
         parsing_prompt = ChatPromptTemplate.from_template(self.parsing_template)
         parsing_chain = parsing_prompt | self.model
 
@@ -201,9 +201,9 @@ class InputParser:
 
             # Apply validation based on available methods
             if self.semantic_enabled:
-                self._validate_parsed_data_semantic(parsed_data, user_input)
+                self._validate_parsed_data_semantic(parsed_data, user_input, target_calories)
             else:
-                self._validate_parsed_data_rules(parsed_data, user_input)
+                self._validate_parsed_data_rules(parsed_data, user_input, target_calories)
 
             return ParsedInput(
                 already_eaten=parsed_data["already_eaten"],
@@ -214,9 +214,9 @@ class InputParser:
 
         except json.JSONDecodeError as e:
             print(f"JSON parsing error: {e}")
-            return self._fallback_parsing(user_input)
+            return self._fallback_parsing(user_input, target_calories)
 
-    def _validate_parsed_data_rules(self, parsed_data: dict, user_input: str):
+    def _validate_parsed_data_rules(self, parsed_data: dict, user_input: str, target_calories: int):
         """Rule-based validation fallback"""
         user_input_lower = user_input.lower()
 
@@ -232,7 +232,7 @@ class InputParser:
             for pattern in patterns:
                 if re.search(pattern, user_input_lower):
                     if not parsed_data["already_eaten"][meal_type]:
-                        meal_calories = int(self.target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
+                        meal_calories = int(target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
                         parsed_data["already_eaten"][meal_type] = [f"{meal_type} items"]
 
                         current_consumed = parsed_data["already_eaten"].get("total_calories_consumed", 0)
@@ -244,16 +244,17 @@ class InputParser:
                         print(f"   ✓ Rule-based detection - consumed {meal_type}: +{meal_calories} kcal")
                         break
 
-    def _validate_parsed_data_semantic(self, parsed_data: dict, user_input: str):
+    def _validate_parsed_data_semantic(self, parsed_data: dict, user_input: str, target_calories: int):
         """Validate and correct parsed data using semantic similarity"""
         user_input_lower = user_input.lower()
+        semantic = self._semantic_scores(user_input_lower)
 
         # Check each meal type for consumption using embeddings
         for meal_type in ["breakfast", "lunch", "dinner", "snacks"]:
-            if self._check_meal_consumed_semantic(user_input_lower, meal_type):
+            if self._check_meal_consumed_semantic(user_input_lower, meal_type, semantic=semantic):
                 if not parsed_data["already_eaten"][meal_type]:
                     # Calculate calories for this meal
-                    meal_calories = int(self.target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
+                    meal_calories = int(target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
                     parsed_data["already_eaten"][meal_type] = [f"{meal_type} items"]
 
                     # Update total calories consumed
@@ -267,7 +268,7 @@ class InputParser:
                     print(f"   ✓ Semantic detection - consumed {meal_type}: +{meal_calories} kcal")
 
         # Validate meal requests using semantic similarity
-        self._validate_meal_requests_semantic(parsed_data, user_input_lower)
+        self._validate_meal_requests_semantic(parsed_data, user_input_lower, semantic=semantic)
 
         # Ensure at least one meal needs planning
         if not parsed_data["meals_to_plan"]:
@@ -278,9 +279,10 @@ class InputParser:
                 print(f"   ✓ Auto-added meals to plan: {parsed_data['meals_to_plan']}")
 
         # Validate calorie totals
-        self._validate_calorie_totals(parsed_data)
+        self._validate_calorie_totals(parsed_data, target_calories)
 
-    def _check_meal_consumed_semantic(self, user_input: str, meal_type: str, threshold: float = 0.85) -> bool:
+    def _check_meal_consumed_semantic(self, user_input: str, meal_type: str, threshold: float = 0.85,
+                                      semantic=None) -> bool:
         """Check if meal consumption is mentioned using semantic similarity"""
         if not self.semantic_enabled:
             return False
@@ -297,19 +299,11 @@ class InputParser:
                     print(f"   🚫 Negation detected for {meal_type}: '{pattern}' - not consumed")
                     return False
 
-            # Get user input embedding
-            user_embedding = self.embedding_model.encode([user_input])
-
-            # Get consumption patterns for this meal type
-            pattern_embeddings = self.consumption_embeddings[meal_type]
-
-            # Calculate similarities
-            similarities = cosine_similarity(user_embedding, pattern_embeddings)[0]
-            max_similarity = np.max(similarities)
+            scores, maxima = semantic or self._semantic_scores(user_input)
+            max_similarity = maxima[("consumption", meal_type)]
 
             if max_similarity > threshold:
-                best_match_idx = np.argmax(similarities)
-                best_match = self.consumption_patterns[meal_type][best_match_idx]
+                best_match = self.pattern_embeddings.best_pattern(scores, "consumption", meal_type)
                 print(f"   🎯 Semantic match for {meal_type}: '{best_match}' (similarity: {max_similarity:.3f})")
                 return True
 
@@ -318,29 +312,25 @@ class InputParser:
 
         return False
 
-    def _validate_meal_requests_semantic(self, parsed_data: dict, user_input: str, threshold: float = 0.6):
+    def _validate_meal_requests_semantic(self, parsed_data: dict, user_input: str, threshold: float = 0.6,
+                                         semantic=None):
         """Validate and enhance meal requests using semantic similarity"""
         if not self.semantic_enabled:
             return
 
         try:
-            # Get user input embedding
-            user_embedding = self.embedding_model.encode([user_input])
+            scores, maxima = semantic or self._semantic_scores(user_input)
 
             # Check for meal items
             detected_items = {}
 
-            for item_name, descriptions in self.meal_items.items():
-                item_embeddings = self.item_embeddings[item_name]
-                similarities = cosine_similarity(user_embedding, item_embeddings)[0]
-                max_similarity = np.max(similarities)
+            for item_name in self.meal_items:
+                max_similarity = maxima[("items", item_name)]
 
                 if max_similarity > threshold:
-                    best_match_idx = np.argmax(similarities)
-                    best_match = descriptions[best_match_idx]
                     detected_items[item_name] = {
                         'similarity': max_similarity,
-                        'matched_phrase': best_match
+                        'matched_phrase': self.pattern_embeddings.best_pattern(scores, "items", item_name)
                     }
 
             # Sort by similarity and assign to appropriate meals
@@ -379,19 +369,19 @@ class InputParser:
 
         return meal_mapping.get(item_name, "lunch")  # Default to lunch
 
-    def _validate_calorie_totals(self, parsed_data: dict):
+    def _validate_calorie_totals(self, parsed_data: dict, target_calories: int):
         """Validate and adjust calorie totals"""
         consumed_calories = parsed_data["already_eaten"].get("total_calories_consumed", 0)
 
         # Check if consumed calories seem reasonable
-        if consumed_calories > self.target_calories:
-            print(f"   ⚠️  Warning: Consumed calories ({consumed_calories}) exceed daily target ({self.target_calories})")
+        if consumed_calories > target_calories:
+            print(f"   ⚠️  Warning: Consumed calories ({consumed_calories}) exceed daily target ({target_calories})")
         elif consumed_calories < 0:
             parsed_data["already_eaten"]["total_calories_consumed"] = 0
             print("   ✓ Fixed negative calorie count")
 
         # Ensure remaining meals can fit within calorie budget
-        remaining_budget = max(0, self.target_calories - consumed_calories)
+        remaining_budget = max(0, target_calories - consumed_calories)
         remaining_meals = len(parsed_data["meals_to_plan"])
 
         if remaining_meals > 0:
@@ -401,7 +391,7 @@ class InputParser:
             elif avg_calories_per_meal > 1000:
                 print(f"   ⚠️  Warning: Very high calories remaining per meal ({avg_calories_per_meal:.0f} kcal)")
 
-    def _fallback_parsing(self, user_input: str) -> ParsedInput:
+    def _fallback_parsing(self, user_input: str, target_calories: int) -> ParsedInput:
         """Enhanced fallback parsing with semantic support"""
         already_eaten = {
             "breakfast": None, "lunch": None, "dinner": None,
@@ -416,12 +406,14 @@ class InputParser:
         if self.semantic_enabled:
             try:
                 user_input_lower = user_input.lower()
+                semantic = self._semantic_scores(user_input_lower)
 
                 # Check for meal consumption semantically with stricter validation
                 for meal_type in ["breakfast", "lunch", "dinner", "snacks"]:
-                    if self._check_meal_consumed_semantic(user_input_lower, meal_type, threshold=0.85):
+                    if self._check_meal_consumed_semantic(user_input_lower, meal_type, threshold=0.85,
+                                                          semantic=semantic):
                         already_eaten[meal_type] = [f"{meal_type} items"]
-                        meal_calories = int(self.target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
+                        meal_calories = int(target_calories * Config.CALORIE_DISTRIBUTION[meal_type])
                         already_eaten["total_calories_consumed"] += meal_calories
 
                         if meal_type in meals_to_plan:
@@ -433,7 +425,7 @@ class InputParser:
         if not any(already_eaten[meal] for meal in ["breakfast", "lunch", "dinner", "snacks"]):
             if re.search(r'already.*breakfast|had.*breakfast', user_input.lower()):
                 already_eaten["breakfast"] = ["breakfast items"]
-                breakfast_calories = int(self.target_calories * Config.CALORIE_DISTRIBUTION["breakfast"])
+                breakfast_calories = int(target_calories * Config.CALORIE_DISTRIBUTION["breakfast"])
                 already_eaten["total_calories_consumed"] = breakfast_calories
                 meals_to_plan = ["lunch", "dinner", "snacks"]
 
@@ -0,0 +1,149 @@
+# ================================
+# File: pattern_embeddings.py
+# Precomputed embeddings for the parser's semantic patterns
+# ================================
+#
+# Build (or rebuild after editing the patterns in parsers.py):
+#     python pattern_embeddings.py
+# At startup the matrix is memory-mapped; it is rebuilt automatically when
+# the patterns or the embedding model no longer match the manifest.
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+ARTIFACT_FORMAT_VERSION = 1
+
+# group -> name -> patterns, e.g. {"consumption": {"breakfast": [...]}}
+PatternGroups = Dict[str, Dict[str, List[str]]]
+
+
+def patterns_fingerprint(groups: PatternGroups, model_name: str) -> str:
+    payload = json.dumps({"model": model_name, "groups": groups}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class PatternEmbeddings:
+    """All pattern embeddings stacked in one row-normalized matrix.
+
+    Rows are grouped into contiguous segments, one per (group, name), in
+    the order the groups were given.
+    """
+
+    def __init__(self, matrix: np.ndarray, segments: List[Dict]):
+        self.matrix = matrix
+        self.segments = segments
+        self._by_key = {(s["group"], s["name"]): s for s in segments}
+        self._starts = np.array([s["start"] for s in segments], dtype=np.intp)
+
+    @classmethod
+    def load_or_build(cls, groups: PatternGroups, embedding_service,
+                      path: str = Config.PATTERN_EMBEDDINGS_PATH) -> "PatternEmbeddings":
+        fingerprint = patterns_fingerprint(groups, embedding_service.model_name)
+        loaded = cls.load(path, fingerprint)
+        if loaded is not None:
+            return loaded
+
+        print("   🔄 Pattern embeddings missing or stale - rebuilding...")
+        built = cls.build(groups, embedding_service)
+        try:
+            built.save(path, fingerprint, embedding_service.identity())
+            return cls.load(path, fingerprint) or built
+        except OSError as e:
+            print(f"   ⚠️  Could not save pattern embeddings: {e}")
+            return built
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> Optional["PatternEmbeddings"]:
+        manifest_path = _manifest_path(path)
+        if not (os.path.exists(path) and os.path.exists(manifest_path)):
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if (manifest.get("format_version") != ARTIFACT_FORMAT_VERSION
+                    or manifest.get("fingerprint") != fingerprint):
+                return None
+            matrix = np.load(path, mmap_mode="r")
+            print(f"   ✅ Pattern embeddings mapped ({matrix.shape[0]} patterns)")
+            return cls(matrix, manifest["segments"])
+        except Exception as e:
+            print(f"   ⚠️  Could not load pattern embeddings: {e}")
+            return None
+
+    @classmethod
+    def build(cls, groups: PatternGroups, embedding_service) -> "PatternEmbeddings":
+        """Encode every pattern in one batch"""
+        texts, segments = [], []
+        for group, named in groups.items():
+            for name, patterns in named.items():
+                segments.append({
+                    "group": group,
+                    "name": name,
+                    "start": len(texts),
+                    "end": len(texts) + len(patterns),
+                    "patterns": list(patterns)
+                })
+                texts.extend(patterns)
+        return cls(embedding_service.encode(texts, normalize=True), segments)
+
+    def save(self, path: str, fingerprint: str, model_identity: Dict):
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "model": model_identity,
+            "segments": self.segments
+        }
+        tmp_manifest = f"{_manifest_path(path)}.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, _manifest_path(path))
+
+    # ---------- access ----------
+
+    def segment(self, group: str, name: str) -> np.ndarray:
+        s = self._by_key[(group, name)]
+        return self.matrix[s["start"]:s["end"]]
+
+    def patterns(self, group: str, name: str) -> List[str]:
+        return self._by_key[(group, name)]["patterns"]
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of a normalized query against every pattern (one matmul)"""
+        return self.matrix @ np.asarray(query, dtype=np.float32)
+
+    def segment_maxima(self, scores: np.ndarray) -> Dict[Tuple[str, str], float]:
+        """Best score per (group, name) via one segment reduction"""
+        maxima = np.maximum.reduceat(scores, self._starts)
+        return {(s["group"], s["name"]): float(m) for s, m in zip(self.segments, maxima)}
+
+    def best_pattern(self, scores: np.ndarray, group: str, name: str) -> str:
+        s = self._by_key[(group, name)]
+        return s["patterns"][int(np.argmax(scores[s["start"]:s["end"]]))]
+
+
+def _manifest_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def main():
+    from embedding_service import embedding_service
+    from parsers import SEMANTIC_PATTERN_GROUPS
+
+    fingerprint = patterns_fingerprint(SEMANTIC_PATTERN_GROUPS, embedding_service.model_name)
+    built = PatternEmbeddings.build(SEMANTIC_PATTERN_GROUPS, embedding_service)
+    built.save(Config.PATTERN_EMBEDDINGS_PATH, fingerprint, embedding_service.identity())
+    print(f"✅ Wrote {built.matrix.shape[0]} pattern embeddings to {Config.PATTERN_EMBEDDINGS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,15 @@ import requests
 import json
 import re
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from embedding_service import embedding_service
+from food_retriever import adaptive_k_search, candidate_calories, has_typed_metadata, meal_filter
+from vector_backends import create_backend
+from collection_rebuild import resolve_collection_name
+from config import Config
 from dish_service import DishRecognitionService
+from circuit_breaker import CircuitOpenError, usda_breaker, open_food_facts_breaker
+from nutrients import NutrientRecord, NUTRIENT_BASIS
+from label_resolution import label_resolution_table
 
 class ProfessionalFoodService:
     def __init__(self):
@@ -171,21 +178,27 @@ class ProfessionalFoodService:
             print("🔄 Initializing meal recommendation system...")
             
             # Initialize embeddings and vector store
-            db_location = "/content/drive/MyDrive/chroma_db"
-            embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+            db_location = Config.FOODS_DB_LOCATION
+            embeddings = embedding_service
             
             vector_store = Chroma(
-                collection_name="foods",
+                collection_name=resolve_collection_name(db_location, Config.FOODS_COLLECTION_NAME),
                 persist_directory=db_location,
                 embedding_function=embeddings
             )
             
             self.retriever = vector_store.as_retriever(search_kwargs={"k": 20})
+            self.meal_vector_store = vector_store
+            self.meal_backend = create_backend(vector_store)
+            self.meal_metadata_typed = has_typed_metadata(vector_store)
             print("✅ Meal recommendation system ready!")
             
         except Exception as e:
             print(f"⚠️ Meal recommendation system not available: {e}")
             self.retriever = None
+            self.meal_vector_store = None
+            self.meal_backend = None
+            self.meal_metadata_typed = False
     
     def get_food_classes(self):
         """Your 34 specific fruit and vegetable classes"""
@@ -317,9 +330,69 @@ class ProfessionalFoodService:
         
         return 'other'
     
+    def usda_food_to_nutrition(self, food, food_name):
+        """Build the nutrition response for one USDA food (search or /foods result)"""
+        clean_name = food_name.lower().split(',')[0].strip()
+        
+        # Map nutrients by USDA nutrient id into a typed record
+        record = NutrientRecord.from_usda(food)
+        
+        # FIX: Add fallback values if fats is 0
+        if not record.get('fats'):
+            # Use known fat values for common foods
+            known_fat_values = {
+                'avocado': 14.7, 'pizza': 8.0, 'cheese': 9.0, 'chicken': 3.6,
+                'beef': 15.0, 'pork': 20.0, 'salmon': 13.0, 'egg': 5.0,
+                'milk': 3.6, 'yogurt': 3.3, 'butter': 81.0, 'oil': 100.0,
+                'nuts': 50.0, 'seeds': 45.0, 'chocolate': 30.0, 'bread': 1.0
+            }
+            
+            for known_food, fat_value in known_fat_values.items():
+                if known_food in clean_name:
+                    record.set('fats', fat_value)
+                    print(f"🔄 Using known fat value for {clean_name}: {fat_value}g")
+                    break
+        
+        nutrients = record.to_dict()
+        if not nutrients:
+            return None
+        
+        return {
+            'success': True,
+            'food_name': food.get('description', food_name),
+            'data': {
+                'nutrients': nutrients,
+                'nutrient_basis': NUTRIENT_BASIS,
+                'source': 'USDA FoodData Central',
+                'fdc_id': food.get('fdcId'),
+                'serving_size': food.get('servingSize', 'N/A'),
+                'serving_unit': food.get('servingSizeUnit', 'N/A'),
+                'success': True
+            }
+        }
+    
     def get_nutrition_from_api(self, food_name):
         """Get REAL nutrition data from FREE APIs"""
         try:
+            # Known classifier labels resolve from the precomputed table
+            entry = label_resolution_table.lookup(food_name)
+            if entry:
+                print(f"📚 Precomputed nutrition for {food_name}: {entry['description']}")
+                return {
+                    'success': True,
+                    'food_name': entry['description'],
+                    'data': {
+                        'nutrients': dict(entry['nutrients']),
+                        'nutrient_basis': entry['nutrient_basis'],
+                        'source': 'USDA FoodData Central',
+                        'fdc_id': entry['fdc_id'],
+                        'resolution': label_resolution_table.version,
+                        'serving_size': 100,
+                        'serving_unit': 'g',
+                        'success': True
+                    }
+                }
+            
             # Clean food name for API search
             clean_name = food_name.lower().split(',')[0].strip()
             
@@ -338,8 +411,13 @@ class ProfessionalFoodService:
                 'dataType': ['Survey (FNDDS)', 'SR Legacy']
             }
             
-            response = requests.get(usda_url, params=params, timeout=10)
-            if response.status_code == 200:
+            try:
+                response = usda_breaker.call(requests.get, usda_url, params=params, timeout=10)
+            except CircuitOpenError as e:
+                print(f"⏭️ Skipping USDA API: {e}")
+                response = None
+
+            if response is not None and response.status_code == 200:
                 data = response.json()
                 if data['foods']:
                     # Filter for raw/fresh foods
@@ -356,56 +434,9 @@ class ProfessionalFoodService:
                     
                     print(f"✅ Found: {best_match.get('description', '')}")
                     
-                    # FIX: Extract nutrition values properly
-                    nutrients = {}
-                    
-                    for nutrient in best_match.get('foodNutrients', []):
-                        name = nutrient.get('nutrientName', '')
-                        value = nutrient.get('value', 0)
-                        unit = nutrient.get('unitName', '')
-                        
-                        # FIX: Properly extract and convert values
-                        if 'Energy' in name and ('kcal' in unit.lower() or 'calorie' in name.lower()):
-                            nutrients['calories'] = float(value) if value else 0
-                        elif 'Protein' in name:
-                            nutrients['protein'] = float(value) if value else 0
-                        elif 'Total lipid' in name or 'Fat' in name or 'Fatty acids' in name:
-                            nutrients['fats'] = float(value) if value else 0
-                        elif 'Carbohydrate' in name:
-                            nutrients['carbs'] = float(value) if value else 0
-                        elif 'Fiber' in name:
-                            nutrients['fiber'] = float(value) if value else 0
-                        elif 'Sugar' in name:
-                            nutrients['sugar'] = float(value) if value else 0
-                    
-                    # FIX: Add fallback values if fats is 0
-                    if nutrients.get('fats', 0) == 0:
-                        # Use known fat values for common foods
-                        known_fat_values = {
-                            'avocado': 14.7, 'pizza': 8.0, 'cheese': 9.0, 'chicken': 3.6,
-                            'beef': 15.0, 'pork': 20.0, 'salmon': 13.0, 'egg': 5.0,
-                            'milk': 3.6, 'yogurt': 3.3, 'butter': 81.0, 'oil': 100.0,
-                            'nuts': 50.0, 'seeds': 45.0, 'chocolate': 30.0, 'bread': 1.0
-                        }
-                        
-                        for food, fat_value in known_fat_values.items():
-                            if food in clean_name:
-                                nutrients['fats'] = fat_value
-                                print(f"🔄 Using known fat value for {clean_name}: {fat_value}g")
-                                break
-                    
-                    if nutrients:
-                        return {
-                            'success': True,
-                            'food_name': best_match.get('description', food_name),
-                            'data': {
-                                'nutrients': nutrients,
-                                'source': 'USDA FoodData Central',
-                                'serving_size': best_match.get('servingSize', 'N/A'),
-                                'serving_unit': best_match.get('servingSizeUnit', 'N/A'),
-                                'success': True
-                            }
-                        }
+                    result = self.usda_food_to_nutrition(best_match, food_name)
+                    if result:
+                        return result
             
             # Fallback to Open Food Facts
             off_url = f"https://world.openfoodfacts.org/cgi/search.pl"
@@ -415,28 +446,14 @@ class ProfessionalFoodService:
                 'page_size': 2
             }
             
-            response = requests.get(off_url, params=params, timeout=10)
+            response = open_food_facts_breaker.call(requests.get, off_url, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if data['products']:
                     product = data['products'][0]
-                    nutrients = product.get('nutriments', {})
-                    
-                    nutrition_data = {}
-                    if nutrients.get('energy-kcal_100g'):
-                        nutrition_data['calories'] = f"{nutrients['energy-kcal_100g']} kcal/100g"
-                    if nutrients.get('proteins_100g'):
-                        nutrition_data['protein'] = f"{nutrients['proteins_100g']}g/100g"
-                    if nutrients.get('fat_100g'):  
-                         nutrition_data['fats'] = f"{nutrients['fat_100g']}g/100g"
-                    if nutrients.get('carbohydrates_100g'):
-                        nutrition_data['carbs'] = f"{nutrients['carbohydrates_100g']}g/100g"
-                    if nutrients.get('fiber_100g'):
-                        nutrition_data['fiber'] = f"{nutrients['fiber_100g']}g/100g"
-                    if nutrients.get('sugars_100g'):
-                        nutrition_data['sugar'] = f"{nutrients['sugars_100g']}g/100g"
+                    record = NutrientRecord.from_off(product.get('nutriments', {}))
                     
-                    if 'fats' not in nutrition_data:
+                    if not record.has('fats'):
                         print(f"🔄 Open Food Facts missing fats for {clean_name}, adding fallback")
                         known_fat_values = {
                             'apple': 0.2, 'avocado': 14.7, 'banana': 0.3, 'blackberry': 0.4,
@@ -452,15 +469,17 @@ class ProfessionalFoodService:
                         
                         for food, fat_value in known_fat_values.items():
                             if food in clean_name:
-                                nutrition_data['fats'] = f"{fat_value}g/100g"
+                                record.set('fats', fat_value)
                                 print(f"✅ Added fat value for {clean_name}: {fat_value}g")
                                 break
                     
+                    nutrition_data = record.to_dict()
                     if nutrition_data:
                         return {
                             'success': True,
                             'food_name': product.get('product_name', food_name),
                             'nutrients': nutrition_data,
+                            'nutrient_basis': NUTRIENT_BASIS,
                             'source': 'Open Food Facts',
                             'serving_size': '100g',
                             'serving_unit': 'g'
@@ -482,27 +501,51 @@ class ProfessionalFoodService:
     # MEAL RECOMMENDATION METHODS
     # ================================
 
-    def get_meal_recommendations(self, query, meal_type, target_calories, max_calories, max_results=10):
-        """Get meal recommendations from ChromaDB vector store"""
+    def get_meal_recommendations(self, query, meal_type, target_calories, max_calories, max_results=10,
+                                 retrieval_stats=None):
+        """Get meal recommendations from ChromaDB vector store.
+
+        k starts at `max_results` and widens until that many in-budget
+        items are found; `retrieval_stats`, when given, receives the rounds.
+        """
         try:
             # Use your existing ChromaDB retriever
             if hasattr(self, 'retriever') and self.retriever:
-                docs = self.retriever.get_relevant_documents(query, k=20)
-                
-                recommendations = []
-                for doc in docs:
-                    content = doc.page_content
-                    calories = self._extract_calories_from_content(content)
-                    
-                    if calories != "unknown" and calories <= max_calories:
-                        distance = abs(calories - target_calories)
-                        recommendations.append({
-                            "content": content,
-                            "calories": calories,
-                            "distance_from_target": distance,
-                            "meal_type": meal_type
-                        })
-                
+                # Meal type and budget are filtered inside the index
+                category = "snacks" if meal_type == "snack" else meal_type
+                if category in ("breakfast", "lunch", "dinner", "snacks"):
+                    where = meal_filter(category, max_calories)
+                else:
+                    where = {"calories": {"$lte": float(max_calories)}}
+
+                def search(k):
+                    if self.meal_metadata_typed:
+                        return self.meal_backend.similarity_search(query, k=k, filter=where)
+                    return self.retriever.get_relevant_documents(query, k=k)
+
+                def in_budget(docs):
+                    recommendations = []
+                    for doc in docs:
+                        content = doc.page_content
+                        calories = candidate_calories(doc)
+                        if calories is None:
+                            calories = self._extract_calories_from_content(content)
+
+                        if calories != "unknown" and calories <= max_calories:
+                            distance = abs(calories - target_calories)
+                            recommendations.append({
+                                "content": content,
+                                "calories": calories,
+                                "distance_from_target": distance,
+                                "meal_type": meal_type
+                            })
+                    return recommendations
+
+                recommendations, rounds = adaptive_k_search(search, in_budget, want=max_results,
+                                                            start_k=max_results)
+                if retrieval_stats is not None:
+                    retrieval_stats["rounds"] = rounds
+
                 # Sort by closest to target calories
                 recommendations.sort(key=lambda x: x["distance_from_target"])
                 return recommendations[:max_results]
@@ -539,12 +582,14 @@ class ProfessionalFoodService:
             # Build search query
             search_query = f"{preference} {meal_type}" if preference else meal_type
             
+            retrieval_stats = {}
             recommendations = self.get_meal_recommendations(
                 query=search_query,
                 meal_type=meal_type,
                 target_calories=target_calories,
                 max_calories=max_calories,
-                max_results=max_results
+                max_results=max_results,
+                retrieval_stats=retrieval_stats
             )
 
             return {
@@ -554,7 +599,8 @@ class ProfessionalFoodService:
                 "target_calories": target_calories,
                 "max_calories": max_calories,
                 "recommendations": recommendations,
-                "total_recommendations": len(recommendations)
+                "total_recommendations": len(recommendations),
+                "retrieval_rounds": retrieval_stats.get("rounds", 0)
             }
             
         except Exception as e:
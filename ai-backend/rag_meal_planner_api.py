@@ -1,9 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from functools import wraps
+import hmac
 import json
+from config import Config
 from meal_system import MealPlanningSystem
 from models import UserProfile
 from setup_database import setup_vector_store
+from collection_rebuild import CollectionRebuilder
+from vector_snapshot import SnapshotError, resolve_snapshot_path
 
 app = Flask(__name__)
 CORS(app)
@@ -12,6 +17,7 @@ CORS(app)
 print("🔄 Initializing RAG Meal Planning System...")
 db_location, embeddings = setup_vector_store()
 meal_planner = MealPlanningSystem(db_location, embeddings)
+collection_rebuilder = CollectionRebuilder(meal_planner)
 print("✅ RAG Meal Planning System ready!")
 
 @app.route('/health', methods=['GET'])
@@ -20,7 +26,8 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "service": "RAG Meal Planner",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "vector_backend": meal_planner.vector_backend.stats()
     })
 
 @app.route('/api/meal-plan', methods=['POST'])
@@ -79,7 +86,8 @@ def create_meal_plan():
                     "dinner": result["caloric_plan"].dinner,
                     "snacks": result["caloric_plan"].snacks
                 },
-                "meal_plan": result["final_plan"]
+                "meal_plan": result["final_plan"],
+                "retrieval_rounds": result["retrieval_rounds"]
             }
         }
 
@@ -94,6 +102,68 @@ def create_meal_plan():
             "error": str(e)
         }), 500
 
+def admin_only(view):
+    """Require Config.ADMIN_API_TOKEN in the X-Admin-Token header"""
+    @wraps(view)
+    def guarded(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not Config.ADMIN_API_TOKEN or not hmac.compare_digest(token, Config.ADMIN_API_TOKEN):
+            return jsonify({"success": False, "message": "Admin token required"}), 403
+        return view(*args, **kwargs)
+    return guarded
+
+@app.route('/api/admin/vector-store/rebuild', methods=['POST'])
+@admin_only
+def rebuild_vector_store():
+    """Rebuild the meal collection next to the live one and switch when it passes the smoke test"""
+    data = request.get_json(silent=True) or {}
+    snapshot_path = None
+    if data.get('snapshot_path'):
+        try:
+            snapshot_path = resolve_snapshot_path(data['snapshot_path'])
+        except SnapshotError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+    if not collection_rebuilder.start(snapshot_path=snapshot_path):
+        return jsonify({
+            "success": False,
+            "message": "A rebuild is already running",
+            "data": collection_rebuilder.status()
+        }), 409
+
+    return jsonify({
+        "success": True,
+        "message": "Rebuild started",
+        "data": collection_rebuilder.status()
+    }), 202
+
+@app.route('/api/admin/vector-store/switch', methods=['POST'])
+@admin_only
+def switch_vector_store():
+    """Serve an already-built collection after the rebuild smoke test"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('collection'):
+        return jsonify({"success": False, "message": "collection is required"}), 400
+
+    result = collection_rebuilder.switch_to(data['collection'], drop_previous=bool(data.get('drop_previous')))
+    return jsonify(result), (200 if result["success"] else 409)
+
+@app.route('/api/admin/vector-store/rollback', methods=['POST'])
+@admin_only
+def rollback_vector_store():
+    """Switch back to the previous collection (until its TTL expires)"""
+    result = collection_rebuilder.rollback()
+    return jsonify(result), (200 if result["success"] else 409)
+
+@app.route('/api/admin/vector-store/status', methods=['GET'])
+@admin_only
+def vector_store_status():
+    """Active/previous collection and the last rebuild result"""
+    return jsonify({
+        "success": True,
+        "data": collection_rebuilder.status()
+    })
+
 @app.route('/api/user-profile', methods=['POST'])
 def create_user_profile():
     """Create or validate user profile"""
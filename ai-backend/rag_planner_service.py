@@ -3,6 +3,7 @@ import json
 import os
 from typing import List, Dict, Any
 import numpy as np
+from circuit_breaker import node_backend_breaker
 
 class RAGMealPlannerService:
     def __init__(self):
@@ -44,7 +45,7 @@ class RAGMealPlannerService:
             
             params['limit'] = limit
             
-            response = requests.get(url, params=params, timeout=10)
+            response = node_backend_breaker.call(requests.get, url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -71,7 +72,7 @@ class RAGMealPlannerService:
             if token:
                 headers['Authorization'] = f'Bearer {token}'
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = node_backend_breaker.call(requests.get, url, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
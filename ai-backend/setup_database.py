@@ -1,106 +1,98 @@
 import os
 import pandas as pd
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain.schema import Document
+from ingest import ingest_catalog, load_suppressed_ids
+from vector_backends import index_dir_for
+from vector_snapshot import SnapshotError, import_snapshot
+from collection_rebuild import resolve_collection_name
+from config import Config
+from embedding_service import embedding_service
+
+def write_sample_csv(csv_path: str):
+    """Small demo catalog for a node that has neither a CSV nor a snapshot"""
+    print("🔄 Creating sample meal data CSV...")
+    sample_data = [
+        ["Breakfast", "Scrambled Eggs", "2 eggs", 140],
+        ["Breakfast", "Oatmeal", "1 cup cooked", 150],
+        ["Breakfast", "Greek Yogurt", "1 cup", 100],
+        ["Breakfast", "Whole Grain Toast", "2 slices", 160],
+        ["Breakfast", "Banana", "1 medium", 105],
+        ["Breakfast", "Orange Juice", "8 oz", 110],
+        ["Breakfast", "Coffee with Milk", "12 oz", 80],
+        ["Lunch", "Grilled Chicken Salad", "6 oz chicken, mixed greens", 350],
+        ["Lunch", "Turkey Sandwich", "whole grain bread, 4 oz turkey", 320],
+        ["Lunch", "Quinoa Bowl", "1 cup quinoa, vegetables", 400],
+        ["Lunch", "Vegetable Stir Fry", "mixed vegetables, tofu", 280],
+        ["Lunch", "Pasta Primavera", "whole wheat pasta, vegetables", 380],
+        ["Lunch", "Chicken Wrap", "whole wheat tortilla, chicken", 360],
+        ["Lunch", "Lentil Soup", "1.5 cups", 220],
+        ["Dinner", "Grilled Salmon", "6 oz salmon", 350],
+        ["Dinner", "Beef Stir Fry", "6 oz beef, vegetables", 420],
+        ["Dinner", "Chicken Parmesan", "6 oz chicken, pasta", 480],
+        ["Dinner", "Vegetable Curry", "rice, mixed vegetables", 380],
+        ["Dinner", "Pork Tenderloin", "6 oz pork", 340],
+        ["Dinner", "Shrimp Scampi", "6 oz shrimp, pasta", 360],
+        ["Dinner", "Lamb Chops", "6 oz lamb", 400],
+        ["Dinner", "Tuna Steak", "6 oz tuna", 320],
+        ["Snacks", "Apple", "1 medium", 95],
+        ["Snacks", "Almonds", "1 oz (23 almonds)", 160],
+        ["Snacks", "Greek Yogurt", "6 oz", 100],
+        ["Snacks", "Carrot Sticks", "1 cup", 50],
+        ["Snacks", "Protein Bar", "1 bar", 200],
+        ["Snacks", "Trail Mix", "1/4 cup", 150],
+        ["Snacks", "Cheese Stick", "1 oz", 110],
+        ["Snacks", "Rice Cakes", "2 cakes", 70]
+    ]
+
+    df = pd.DataFrame(sample_data, columns=['Category', 'Item', 'Serving Size', 'Calories'])
+    df.to_csv(csv_path, index=False)
+    print(f"✅ Created {csv_path} with {len(sample_data)} meal items")
 
 def setup_vector_store():
-    """Run this ONCE to create the vector store"""
+    """Create the vector store, or bring it up to date with the catalog CSV"""
 
-    # 1️⃣ Prepare CSV and DataFrame
+    # 1️⃣ Catalog CSV (the sample is only written when no snapshot is loaded)
     csv_path = "./meal_data.csv"
-    # Create sample meal data if CSV doesn't exist
-    if not os.path.exists(csv_path):
-        print("🔄 Creating sample meal data CSV...")
-        sample_data = [
-            ["Breakfast", "Scrambled Eggs", "2 eggs", 140],
-            ["Breakfast", "Oatmeal", "1 cup cooked", 150],
-            ["Breakfast", "Greek Yogurt", "1 cup", 100],
-            ["Breakfast", "Whole Grain Toast", "2 slices", 160],
-            ["Breakfast", "Banana", "1 medium", 105],
-            ["Breakfast", "Orange Juice", "8 oz", 110],
-            ["Breakfast", "Coffee with Milk", "12 oz", 80],
-            ["Lunch", "Grilled Chicken Salad", "6 oz chicken, mixed greens", 350],
-            ["Lunch", "Turkey Sandwich", "whole grain bread, 4 oz turkey", 320],
-            ["Lunch", "Quinoa Bowl", "1 cup quinoa, vegetables", 400],
-            ["Lunch", "Vegetable Stir Fry", "mixed vegetables, tofu", 280],
-            ["Lunch", "Pasta Primavera", "whole wheat pasta, vegetables", 380],
-            ["Lunch", "Chicken Wrap", "whole wheat tortilla, chicken", 360],
-            ["Lunch", "Lentil Soup", "1.5 cups", 220],
-            ["Dinner", "Grilled Salmon", "6 oz salmon", 350],
-            ["Dinner", "Beef Stir Fry", "6 oz beef, vegetables", 420],
-            ["Dinner", "Chicken Parmesan", "6 oz chicken, pasta", 480],
-            ["Dinner", "Vegetable Curry", "rice, mixed vegetables", 380],
-            ["Dinner", "Pork Tenderloin", "6 oz pork", 340],
-            ["Dinner", "Shrimp Scampi", "6 oz shrimp, pasta", 360],
-            ["Dinner", "Lamb Chops", "6 oz lamb", 400],
-            ["Dinner", "Tuna Steak", "6 oz tuna", 320],
-            ["Snacks", "Apple", "1 medium", 95],
-            ["Snacks", "Almonds", "1 oz (23 almonds)", 160],
-            ["Snacks", "Greek Yogurt", "6 oz", 100],
-            ["Snacks", "Carrot Sticks", "1 cup", 50],
-            ["Snacks", "Protein Bar", "1 bar", 200],
-            ["Snacks", "Trail Mix", "1/4 cup", 150],
-            ["Snacks", "Cheese Stick", "1 oz", 110],
-            ["Snacks", "Rice Cakes", "2 cakes", 70]
-        ]
-
-        df = pd.DataFrame(sample_data, columns=['Category', 'Item', 'Serving Size', 'Calories'])
-        df.to_csv(csv_path, index=False)
-        print(f"✅ Created {csv_path} with {len(sample_data)} meal items")
-
-    new_header = ['Category', 'Item', 'Serving Size', 'Calories']
-    matrix = []
-
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    for line in lines[1:]:
-        parts = line.strip().split(',')
-        row = parts[:4]
-        matrix.append(row)
-
-    df = pd.DataFrame(matrix, columns=new_header)
-    df["Category"] = df["Category"].str.strip().str.replace('"', '')
-
-    # Category remapping
-    category_map = {
-        "Breakfast": "breakfast",
-        "Lunch": "lunch",
-        "Dinner": "dinner",
-        "Snacks": "snacks"
-    }
-
-    df["Category"] = df["Category"].map(category_map).fillna("other")
 
     # 2️⃣ Setup vector store
-    db_location = "./chroma_db"
+    db_location = Config.VECTOR_DB_LOCATION
     os.makedirs(db_location, exist_ok=True)
 
-    embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-
-    # 3️⃣ Create vector store (only if it doesn't exist)
-    if not os.path.exists(os.path.join(db_location, "chroma.sqlite3")):
-        print("🔄 Creating new vector store...")
-
-        vector_store = Chroma(
-            collection_name="meal_database",
-            persist_directory=db_location,
-            embedding_function=embeddings
-        )
+    # Shared process-wide model (also used by the input parser)
+    embeddings = embedding_service
+
+    # 3️⃣ Create or update the vector store; unchanged rows are skipped,
+    # so this is cheap when the catalog has not changed
+    vector_store = Chroma(
+        collection_name=resolve_collection_name(db_location),
+        persist_directory=db_location,
+        embedding_function=embeddings
+    )
+    # A prebuilt snapshot brings a new node up without embedding anything;
+    # the ingest below then only has to write rows that changed since it was built.
+    # A configured snapshot that is missing or refused stops startup: falling
+    # back to the sample CSV would serve (and prune down to) the wrong catalog
+    snapshot_loaded = False
+    if Config.VECTOR_SNAPSHOT_PATH:
+        try:
+            import_snapshot(vector_store, Config.VECTOR_SNAPSHOT_PATH, db_location)
+        except (SnapshotError, OSError) as e:
+            print(f"❌ Refusing vector snapshot {Config.VECTOR_SNAPSHOT_PATH}: {e}")
+            raise
+        snapshot_loaded = True
 
-        # Convert to documents
-        documents = []
-        for _, row in df.iterrows():
-            content = f"{row['Item']} - Category: {row['Category']}, Serving: {row['Serving Size']}, Calories: {row['Calories']} kcal"
-            documents.append(Document(page_content=content))
-
-        # Add documents
-        vector_store.add_documents(documents)
-        print(f"✅ Added {len(documents)} documents to vector store")
-
-    else:
-        print("✅ Vector store already exists, skipping creation")
+    if not os.path.exists(csv_path):
+        if snapshot_loaded:
+            print("   ✅ No catalog CSV - serving the snapshot as loaded")
+            return db_location, embeddings
+        write_sample_csv(csv_path)
+
+    # Without a snapshot the CSV is the source of truth: prune rows that were
+    # removed (and documents written by the old id-less ingest). With one,
+    # the snapshot is: the CSV only adds or updates rows, never deletes
+    index_dir = index_dir_for(vector_store) if Config.VECTOR_BACKEND == "numpy" else None
+    ingest_catalog(vector_store, csv_path, prune=not snapshot_loaded, workers=Config.INGEST_WORKERS,
+                   index_dir=index_dir, suppressed_ids=load_suppressed_ids(db_location))
 
     return db_location, embeddings
 
@@ -0,0 +1,66 @@
+# ================================
+# File: tests/conftest.py
+# Makes the flat ai-backend modules importable from the tests
+# ================================
+#
+# Run from ai-backend/:
+#     python -m pytest tests
+
+import hashlib
+import os
+import re
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Global instances created at import must not write into the source tree
+_scratch = tempfile.mkdtemp(prefix="ai-backend-tests-")
+os.environ.setdefault("BARCODE_CACHE_PATH", os.path.join(_scratch, "barcode_cache.sqlite3"))
+os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(_scratch, "vector_index"))
+
+
+class HashingEmbeddings:
+    """Deterministic bag-of-words embeddings: texts sharing words are close,
+    and nothing is downloaded"""
+
+    model_name = "test-hashing-embeddings"
+    dimension = 64
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"[a-z]+", text.lower()):
+            vector[int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16) % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings():
+    return HashingEmbeddings()
+
+
+@pytest.fixture
+def vector_store(tmp_path, embeddings):
+    """Empty Chroma collection in a scratch database"""
+    chroma = pytest.importorskip("langchain_community.vectorstores")
+    return chroma.Chroma(collection_name="meal_database", persist_directory=str(tmp_path / "chroma_db"),
+                         embedding_function=embeddings)
+
+
+def write_catalog(path, rows):
+    """Catalog CSV as setup_database writes it"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Category,Item,Serving Size,Calories\n")
+        for category, item, serving, calories in rows:
+            f.write(f"{category},{item},{serving},{calories}\n")
+    return str(path)
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+
+from barcode_cache import OPEN_FOOD_FACTS, SCANNER, BarcodeProductCache
+
+CODE = "3017620422003"
+OFF_PRODUCT = {"name": "Spread", "source": "open_food_facts"}
+CATALOG_PRODUCT = {"name": "House spread", "source": "smart_nutritrack_database"}
+NOT_FOUND = {"name": "Product not found", "source": "not_found"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BarcodeProductCache(str(tmp_path / "barcodes.sqlite3"), hit_ttl=3600, miss_ttl=60)
+
+
+def expires_in(cache, code=CODE, resolver=SCANNER):
+    row = cache._connection().execute(
+        "SELECT expires_at FROM barcode_products WHERE resolver = ? AND code = ?", (resolver, code)
+    ).fetchone()
+    return row[0] - time.time()
+
+
+def test_hits_and_misses_use_their_own_ttl(cache):
+    cache.put(CODE, OFF_PRODUCT)
+    cache.put_missing("5000112637922", NOT_FOUND)
+    assert cache.get(CODE) == OFF_PRODUCT
+    assert cache.get("5000112637922") == NOT_FOUND
+    assert 3500 < expires_in(cache) <= 3600
+    assert 0 < expires_in(cache, "5000112637922") <= 60
+    assert cache.status()["negative_entries"] == 1
+
+
+def test_resolvers_do_not_share_answers(cache):
+    cache.put(CODE, CATALOG_PRODUCT, SCANNER)
+    assert cache.get(CODE, OPEN_FOOD_FACTS) is None
+
+
+def test_processes_share_the_store(cache):
+    other = BarcodeProductCache(cache.path)
+    cache.put(CODE, OFF_PRODUCT)
+    assert other.get(CODE) == OFF_PRODUCT
+    other.invalidate([CODE])
+    assert cache.get(CODE) is None
+
+
+def test_catalog_change_keeps_open_food_facts_hits(cache):
+    cache.put(CODE, OFF_PRODUCT)
+    cache.put("5000112637922", CATALOG_PRODUCT)
+    cache.put_missing("4000000000000", NOT_FOUND)
+
+    assert cache.invalidate() == 2
+    assert cache.get(CODE) == OFF_PRODUCT
+
+
+def test_changed_meal_barcodes_are_dropped_whatever_answered_them(cache):
+    # A meal now carries CODE: the cached Open Food Facts answer must not hide it
+    cache.put(CODE, OFF_PRODUCT, SCANNER)
+    cache.put(CODE, OFF_PRODUCT, OPEN_FOOD_FACTS)
+    cache.put("5000112637922", OFF_PRODUCT)
+
+    assert cache.invalidate(barcodes=[CODE, "", None]) == 2
+    assert cache.get(CODE, SCANNER) is None
+    assert cache.get(CODE, OPEN_FOOD_FACTS) is None
+    assert cache.get("5000112637922") == OFF_PRODUCT
+
+
+def test_invalidate_everything(cache):
+    cache.put(CODE, OFF_PRODUCT)
+    cache.put_missing("5000112637922", NOT_FOUND)
+    assert cache.invalidate(catalog_only=False) == 2
+    assert cache.status()["entries"] == 0
+
+
+def test_open_food_facts_fallback_after_a_node_failure_is_kept_as_a_miss(cache, monkeypatch):
+    barcode_service = pytest.importorskip("barcode_service", exc_type=ImportError)
+    monkeypatch.setattr(barcode_service, "barcode_product_cache", cache)
+
+    def node_down(*args, **kwargs):
+        raise ConnectionError("node backend unreachable")
+
+    monkeypatch.setattr(barcode_service.node_backend_breaker, "call", node_down)
+    monkeypatch.setattr(barcode_service.barcode_index, "lookup", lambda code: {"name": "Spread"})
+
+    service = barcode_service.BarcodeScannerService()
+    product = asyncio.run(service.get_product_from_database(CODE))
+    assert product["source"] == "open_food_facts"
+    assert expires_in(cache) <= cache.miss_ttl
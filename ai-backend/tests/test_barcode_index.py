@@ -0,0 +1,80 @@
+import json
+import os
+
+import barcode_index
+from barcode_index import BarcodeIndex, BarcodeIndexBuilder, barcode_key
+
+
+def write_export(path, products):
+    with open(path, "w", encoding="utf-8") as f:
+        for product in products:
+            f.write(json.dumps(product) + "\n")
+    return path
+
+
+def product(code, name, kcal):
+    return {"code": code, "product_name": name, "brands": "Acme",
+            "nutriments": {"energy-kcal_100g": kcal, "sodium_100g": 0.1}}
+
+
+def test_upc_and_ean_forms_share_a_key():
+    assert barcode_key("012345678905") == barcode_key("0012345678905")
+    assert barcode_key("not-a-code") is None
+
+
+def test_full_import_and_lookup(tmp_path):
+    export = write_export(tmp_path / "full.jsonl", [
+        product("3017620422003", "Spread", 539),
+        product("5000112637922", "Cola", 42),
+        product("3017620422003", "Spread (newer row)", 540),
+        {"code": "", "product_name": "no code"}
+    ])
+    BarcodeIndexBuilder(str(tmp_path / "index")).import_full(str(export))
+    index = BarcodeIndex(str(tmp_path / "index"))
+
+    found = index.lookup("3017620422003")
+    assert found["name"] == "Spread (newer row)"
+    assert found["nutrition"]["calories"] == 540
+    assert found["nutrition"]["sodium"] == 100
+    assert index.lookup("5000112637922")["name"] == "Cola"
+    assert index.lookup("4000000000000") is None
+    assert index.status()["products"] == 2
+
+
+def test_delta_replaces_and_adds_while_old_readers_keep_their_generation(tmp_path):
+    index_dir = str(tmp_path / "index")
+    builder = BarcodeIndexBuilder(index_dir)
+    builder.import_full(str(write_export(tmp_path / "full.jsonl", [
+        product("1111111111116", "Old A", 100), product("2222222222222", "B", 200)
+    ])))
+    old_reader = BarcodeIndex(index_dir)
+
+    manifest = builder.import_delta(str(write_export(tmp_path / "delta.jsonl", [
+        product("1111111111116", "New A", 110), product("3333333333338", "C", 300)
+    ])))
+    assert manifest["generation"] == 2
+    assert manifest["count"] == 3
+
+    new_reader = BarcodeIndex(index_dir)
+    assert new_reader.lookup("1111111111116")["name"] == "New A"
+    assert new_reader.lookup("2222222222222")["name"] == "B"
+    assert new_reader.lookup("3333333333338")["nutrition"]["calories"] == 300
+
+    # The delta wrote its own blob: the old generation still reads correctly
+    old_reader.RELOAD_CHECK_SECONDS = float("inf")
+    assert old_reader.lookup("1111111111116")["name"] == "Old A"
+    assert old_reader.lookup("3333333333338") is None
+
+
+def test_retired_generations_are_removed_after_the_grace_period(tmp_path, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    builder = BarcodeIndexBuilder(index_dir)
+    builder.import_full(str(write_export(tmp_path / "a.jsonl", [product("1111111111116", "A", 1)])))
+    builder.import_delta(str(write_export(tmp_path / "b.jsonl", [product("2222222222222", "B", 2)])))
+    assert os.path.exists(os.path.join(index_dir, "products-1.bin"))
+
+    monkeypatch.setattr(barcode_index, "RETIRE_GRACE_SECONDS", 0)
+    manifest = builder.import_delta(str(write_export(tmp_path / "c.jsonl", [product("3333333333338", "C", 3)])))
+    assert manifest["retired"] == []
+    assert sorted(name for name in os.listdir(index_dir) if name.endswith(".bin")) == ["products-3.bin"]
+    assert BarcodeIndex(index_dir).lookup("1111111111116")["name"] == "A"
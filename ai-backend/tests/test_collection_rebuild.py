@@ -0,0 +1,107 @@
+import pytest
+
+from conftest import write_catalog
+
+collection_rebuild = pytest.importorskip("collection_rebuild")
+ingest = pytest.importorskip("ingest")
+vector_snapshot = pytest.importorskip("vector_snapshot")
+
+from food_retriever import FoodRetriever
+
+CATALOG = [
+    ("Breakfast", "Oatmeal with berries", "1 bowl", 320),
+    ("Breakfast", "Scrambled eggs", "2 eggs", 180),
+    ("Lunch", "Grilled chicken salad", "1 plate", 450),
+    ("Lunch", "Lentil soup", "1.5 cups", 220),
+    ("Dinner", "Grilled salmon", "6 oz", 350),
+    ("Dinner", "Vegetable curry", "1 plate", 380),
+    ("Snacks", "Apple", "1 medium", 95),
+    ("Snacks", "Almonds", "1 oz", 160)
+]
+
+
+class FakeSystem:
+    """The MealPlanningSystem attributes a rebuild reads and swaps"""
+
+    def __init__(self, vector_store, db_location):
+        self.db_location = db_location
+        self.embeddings = vector_store.embeddings
+        self.swap_vector_store(vector_store, None, FoodRetriever(vector_store))
+
+    def swap_vector_store(self, vector_store, vector_backend, food_retriever):
+        self.vector_store, self.vector_backend, self.food_retriever = vector_store, vector_backend, food_retriever
+
+
+@pytest.fixture
+def rebuilder(tmp_path, vector_store, monkeypatch):
+    monkeypatch.setattr(collection_rebuild.Config, "VECTOR_BACKEND", "chroma")
+    ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "live.csv", CATALOG))
+    system = FakeSystem(vector_store, str(tmp_path / "chroma_db"))
+    return collection_rebuild.CollectionRebuilder(system, csv_path=str(tmp_path / "meal_data.csv"))
+
+
+def collections(rebuilder):
+    return rebuilder._collection_names()
+
+
+def test_rebuild_swaps_in_a_smoke_tested_collection(tmp_path, rebuilder):
+    write_catalog(tmp_path / "meal_data.csv", CATALOG + [("Dinner", "Mushroom risotto", "1 bowl", 640)])
+
+    result = rebuilder.rebuild()
+    assert result["success"], result
+    assert result["previous"] == "meal_database"
+    assert all(result["smoke_test"]["checks"].values())
+
+    active = rebuilder.system.vector_store._collection.name
+    assert active == result["collection"] != "meal_database"
+    assert rebuilder.system.vector_store._collection.count() == len(CATALOG) + 1
+    # Restarts keep serving the new collection; the old one is kept for rollback
+    assert collection_rebuild.resolve_collection_name(rebuilder.db_location) == active
+    assert {"meal_database", active} <= collections(rebuilder)
+    assert rebuilder.status()["previous_collection"] == "meal_database"
+
+
+def test_rollback_returns_to_the_previous_collection(tmp_path, rebuilder):
+    write_catalog(tmp_path / "meal_data.csv", CATALOG)
+    rebuilt = rebuilder.rebuild()["collection"]
+
+    result = rebuilder.rollback()
+    assert result == {"success": True, "collection": "meal_database", "previous": rebuilt}
+    assert rebuilder.system.vector_store._collection.name == "meal_database"
+    assert collection_rebuild.resolve_collection_name(rebuilder.db_location) == "meal_database"
+    # The collection rolled back from is kept in turn
+    assert rebuilder.status()["previous_collection"] == rebuilt
+
+
+def test_failed_smoke_test_keeps_the_live_collection(tmp_path, rebuilder):
+    # No lunch, dinner or snacks: those default queries come back empty
+    write_catalog(tmp_path / "meal_data.csv", CATALOG[:2])
+
+    result = rebuilder.rebuild()
+    assert not result["success"]
+    assert not result["smoke_test"]["checks"]["query_lunch"]
+    assert rebuilder.system.vector_store._collection.name == "meal_database"
+    assert collections(rebuilder) == {"meal_database"}
+    assert rebuilder.rollback()["success"] is False
+
+
+def test_expired_rollback_collection_is_dropped(tmp_path, rebuilder):
+    write_catalog(tmp_path / "meal_data.csv", CATALOG)
+    rebuilt = rebuilder.rebuild()["collection"]
+
+    rebuilder.rollback_ttl = 0
+    assert rebuilder.drop_expired() == "meal_database"
+    assert collections(rebuilder) == {rebuilt}
+    assert rebuilder.status()["previous_collection"] is None
+
+
+def test_snapshot_paths_must_stay_under_the_snapshot_dir(tmp_path):
+    snapshot_dir = tmp_path / "snapshots"
+    snapshot_dir.mkdir()
+    resolve = vector_snapshot.resolve_snapshot_path
+
+    assert resolve("meals.tar", str(snapshot_dir)) == str((snapshot_dir / "meals.tar").resolve())
+    assert resolve(str(snapshot_dir / "v2" / "meals.tar"), str(snapshot_dir)).endswith("v2/meals.tar")
+    for outside in ("../meals.tar", "/etc/passwd", str(tmp_path / "meals.tar")):
+        with pytest.raises(vector_snapshot.SnapshotError):
+            resolve(outside, str(snapshot_dir))
@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import write_catalog
+
+ingest = pytest.importorskip("ingest")
+
+CATALOG = [
+    ("Breakfast", "Oatmeal with berries", "1 bowl", 320),
+    ("Lunch", "Grilled chicken salad", "1 plate", 450),
+    ("Snack", "Greek yogurt", "1 cup", 150)
+]
+
+
+def ids(vector_store):
+    return set(vector_store._collection.get(include=[])["ids"])
+
+
+def test_reingesting_an_unchanged_catalog_writes_nothing(tmp_path, vector_store):
+    csv_path = write_catalog(tmp_path / "meals.csv", CATALOG)
+    first = ingest.ingest_catalog(vector_store, csv_path, batch_size=2)
+    assert (first["added"], first["updated"], first["unchanged"]) == (3, 0, 0)
+
+    second = ingest.ingest_catalog(vector_store, csv_path, batch_size=2)
+    assert (second["added"], second["updated"], second["unchanged"]) == (0, 0, 3)
+    assert vector_store._collection.count() == 3
+
+
+def test_edited_rows_are_updated_in_place(tmp_path, vector_store):
+    ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", CATALOG))
+    before = ids(vector_store)
+
+    edited = CATALOG[:2] + [("Snack", "Greek yogurt", "1 cup", 180)]
+    stats = ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", edited))
+    assert (stats["added"], stats["updated"], stats["unchanged"]) == (0, 1, 2)
+    assert ids(vector_store) == before
+
+    yogurt = vector_store._collection.get(ids=[ingest.document_id(
+        {"Category": "snacks", "Item": "Greek yogurt", "Serving Size": "1 cup"})], include=["metadatas"])
+    assert yogurt["metadatas"][0]["calories"] == 180.0
+    assert yogurt["metadatas"][0]["category"] == "snacks"
+
+
+def test_prune_removes_dropped_rows_and_id_less_documents(tmp_path, vector_store):
+    ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", CATALOG))
+    # Written by the old loader, which used random ids
+    vector_store._collection.add(ids=["legacy-uuid"], documents=["Toast - Category: breakfast"],
+                                 embeddings=[vector_store.embeddings.embed_query("Toast")])
+
+    stats = ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", CATALOG[:2]), prune=True)
+    assert stats["pruned"] == 2
+    assert vector_store._collection.count() == 2
+    assert "legacy-uuid" not in ids(vector_store)
+
+
+def test_without_prune_nothing_is_deleted(tmp_path, vector_store):
+    ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", CATALOG))
+    stats = ingest.ingest_catalog(vector_store, write_catalog(tmp_path / "meals.csv", CATALOG[:1]))
+    assert stats["pruned"] == 0
+    assert vector_store._collection.count() == 3
+
+
+def test_document_ids_ignore_case_and_whitespace():
+    assert ingest.document_id({"Category": "snacks", "Item": " Greek Yogurt", "Serving Size": "1 cup"}) == \
+        ingest.document_id({"Category": "SNACKS", "Item": "greek yogurt ", "Serving Size": "1 Cup"})
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("langchain.schema")
+
+from langchain.schema import Document
+
+from name_index import NameIndex, name_tokens
+
+
+def meal(item, category, calories):
+    return Document(page_content=f"{item} - Category: {category}",
+                    metadata={"item": item, "category": category, "calories": calories})
+
+
+@pytest.fixture
+def index():
+    return NameIndex([
+        meal("Grilled chicken salad", "lunch", 450.0),
+        meal("Chicken", "dinner", 300.0),
+        meal("Chicken curry with rice", "dinner", 780.0),
+        meal("Chickpea stew", "dinner", 520.0),
+        meal("Greek yogurt", "snacks", 150.0),
+        meal("Scrambled eggs", "breakfast", 320.0),
+        Document(page_content="Apple slices - Category: snacks", metadata={})
+    ])
+
+
+def names(documents):
+    return [doc.metadata.get("item", doc.page_content.split(" - ")[0]) for doc in documents]
+
+
+def test_exact_matches_rank_before_prefix_matches(index):
+    assert names(index.lookup("chick")) == [
+        "Chicken", "Chickpea stew", "Grilled chicken salad", "Chicken curry with rice"
+    ]
+    # Exact token first, then the shortest name
+    assert names(index.lookup("chicken"))[:2] == ["Chicken", "Grilled chicken salad"]
+
+
+def test_every_token_must_match(index):
+    assert names(index.lookup("greek yogurt")) == ["Greek yogurt"]
+    # Filler and meal words are not food tokens
+    assert names(index.lookup("I want some chicken for dinner please")) == names(index.lookup("chicken"))
+    assert index.lookup("chicken pizza") == []
+    assert index.lookup("the meal for lunch") == []
+
+
+def test_plurals_match_singular_names(index):
+    assert name_tokens("Scrambled Eggs") == ["scrambled", "egg"]
+    assert names(index.lookup("egg")) == ["Scrambled eggs"]
+
+
+def test_category_and_calorie_filters(index):
+    assert names(index.lookup("chicken", category="lunch")) == ["Grilled chicken salad"]
+    assert names(index.lookup("chicken", category="dinner", max_calories=500)) == ["Chicken"]
+    assert names(index.lookup("chicken", limit=1)) == ["Chicken"]
+
+
+def test_documents_without_metadata_are_indexed_by_content(index):
+    assert names(index.lookup("apple")) == ["Apple slices"]
+    # No category to compare against: kept under any category filter
+    assert names(index.lookup("apple", category="snacks")) == ["Apple slices"]
+
+
+def test_from_vector_store_pages_every_document(vector_store, monkeypatch):
+    import name_index
+
+    monkeypatch.setattr(name_index, "PAGE_SIZE", 2)
+    vector_store.add_texts(texts=["Oatmeal - Category: breakfast", "Lentil soup - Category: lunch",
+                                  "Salmon with rice - Category: dinner"],
+                           metadatas=[{"item": "Oatmeal"}, {"item": "Lentil soup"}, {"item": "Salmon with rice"}])
+    index = NameIndex.from_vector_store(vector_store)
+    assert len(index) == 3
+    assert names(index.lookup("salmon")) == ["Salmon with rice"]
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+
+from nutrients import NUTRIENT_FIELDS, NutrientRecord, stack_records
+
+
+def usda_food(*nutrients):
+    return {"foodNutrients": [{"nutrientId": nutrient_id, "value": value} for nutrient_id, value in nutrients]}
+
+
+def test_from_usda_maps_by_nutrient_id():
+    record = NutrientRecord.from_usda(usda_food((1008, 52), (1003, 0.26), (1004, 0.17),
+                                                (1005, 13.8), (1079, 2.4), (2000, 10.4), (1093, 1)))
+    assert record.to_dict() == {"calories": 52.0, "protein": 0.26, "fats": 0.17, "carbs": 13.8,
+                                "fiber": 2.4, "sugar": 10.4, "sodium": 1.0}
+
+
+def test_from_usda_prefers_energy_over_atwater_estimates():
+    # 2047 listed first in the payload; 1008 still wins
+    record = NutrientRecord.from_usda(usda_food((2047, 60), (1008, 52), (2048, 58)))
+    assert record.get("calories") == 52.0
+    assert NutrientRecord.from_usda(usda_food((2048, 58), (2047, 60))).get("calories") == 60.0
+
+
+def test_from_usda_reads_nested_foods_payload():
+    food = {"foodNutrients": [{"nutrient": {"id": 1003, "number": "203"}, "amount": 3.5}]}
+    assert NutrientRecord.from_usda(food).get("protein") == 3.5
+
+
+def test_from_usda_ignores_unknown_and_missing_values():
+    record = NutrientRecord.from_usda(usda_food((1051, 85.6), (1003, None)))
+    assert not record
+    assert record.to_dict() == {}
+
+
+def test_from_off_scales_sodium_to_mg():
+    record = NutrientRecord.from_off({"energy-kcal_100g": "250", "fat_100g": 9.5,
+                                      "sodium_100g": 0.4, "sugars_100g": ""})
+    assert record.get("calories") == 250.0
+    assert math.isclose(record.get("sodium"), 400.0, rel_tol=1e-6)
+    assert not record.has("sugar")
+    assert record.to_dict(fat_key="fat")["fat"] == 9.5
+
+
+def test_dict_round_trip_accepts_aliases_and_skips_text():
+    record = NutrientRecord.from_dict({"fat": 3, "carbohydrates": 20.5, "energy": 110,
+                                       "protein": "unknown", "vitamin_c": 4})
+    assert record.to_dict() == {"calories": 110.0, "fats": 3.0, "carbs": 20.5}
+    assert NutrientRecord.from_dict(record.to_dict()).to_dict() == record.to_dict()
+
+
+def test_stack_records_keeps_field_order():
+    matrix = stack_records([NutrientRecord.from_values(calories=100), NutrientRecord.from_values(protein=5)])
+    assert matrix.shape == (2, len(NUTRIENT_FIELDS))
+    assert matrix[0, NUTRIENT_FIELDS.index("calories")] == 100
+    assert np.isnan(matrix[1, NUTRIENT_FIELDS.index("calories")])
+    assert stack_records([]).shape == (0, len(NUTRIENT_FIELDS))
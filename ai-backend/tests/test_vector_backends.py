@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+vector_backends = pytest.importorskip("vector_backends")
+
+MEALS = [
+    ("Oatmeal with berries and honey", "breakfast", 320.0),
+    ("Scrambled eggs on toast", "breakfast", 410.0),
+    ("Berry smoothie bowl", "breakfast", 280.0),
+    ("Grilled chicken salad", "lunch", 450.0),
+    ("Chicken wrap with berries", "lunch", 620.0),
+    ("Lentil soup", "lunch", 300.0),
+    ("Salmon with rice", "dinner", 700.0),
+    ("Chicken curry with rice", "dinner", 780.0),
+    ("Greek yogurt with berries", "snacks", 150.0),
+    ("Apple slices", "snacks", 95.0)
+]
+
+
+@pytest.fixture
+def filled_store(vector_store):
+    vector_store.add_texts(
+        texts=[text for text, _, _ in MEALS],
+        metadatas=[{"category": category, "calories": calories} for _, category, calories in MEALS],
+        ids=[f"meal-{i}" for i in range(len(MEALS))]
+    )
+    return vector_store
+
+
+def brute_force(embeddings, query, k, keep=lambda category, calories: True):
+    q = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    scored = []
+    for text, category, calories in MEALS:
+        if keep(category, calories):
+            v = np.asarray(embeddings.embed_query(text), dtype=np.float32)
+            scored.append((float(v @ q) / max(float(np.linalg.norm(v)), 1e-12), text))
+    scored.sort(key=lambda item: -item[0])
+    return [text for _, text in scored[:k]]
+
+
+def test_numpy_backend_matches_brute_force(tmp_path, embeddings, filled_store):
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(filled_store, index_dir)
+    backend = vector_backends.NumpyBackend(index_dir, embeddings)
+
+    assert backend.count() == len(MEALS)
+    results = backend.similarity_search("chicken with rice", k=3)
+    expected = brute_force(embeddings, "chicken with rice", 3)
+    assert {doc.page_content for doc in results} == set(expected)
+    assert results[0].page_content == expected[0]
+
+
+def test_where_filters_before_top_k(tmp_path, embeddings, filled_store):
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(filled_store, index_dir)
+    backend = vector_backends.NumpyBackend(index_dir, embeddings)
+
+    where = {"$and": [{"category": "breakfast"}, {"calories": {"$lte": 350}}]}
+    results = backend.similarity_search("berries", k=5, filter=where)
+    assert {doc.page_content for doc in results} == {"Oatmeal with berries and honey", "Berry smoothie bowl"}
+    assert all(doc.metadata["category"] == "breakfast" and doc.metadata["calories"] <= 350 for doc in results)
+
+    # Same rows Chroma's own filter returns
+    chroma = vector_backends.ChromaBackend(filled_store).similarity_search("berries", k=5, filter=where)
+    assert {doc.page_content for doc in chroma} == {doc.page_content for doc in results}
+
+    assert backend.similarity_search("berries", k=5, filter={"category": "brunch"}) == []
+
+
+def test_batched_queries_keep_query_order(tmp_path, embeddings, filled_store):
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(filled_store, index_dir)
+    backend = vector_backends.NumpyBackend(index_dir, embeddings)
+
+    queries = ["salmon", "apple", "lentil soup"]
+    results = backend.query([embeddings.embed_query(q) for q in queries], k=1)
+    assert [docs[0].page_content for docs in results] == ["Salmon with rice", "Apple slices", "Lentil soup"]
+
+
+def test_sync_reexports_in_the_background(tmp_path, embeddings, filled_store):
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(filled_store, index_dir)
+    backend = vector_backends.NumpyBackend(index_dir, embeddings)
+
+    synced = []
+    filled_store.add_texts(texts=["Mushroom risotto"], metadatas=[{"category": "dinner", "calories": 640.0}],
+                           ids=["meal-new"])
+    backend.sync(filled_store, on_synced=lambda: synced.append(True))
+    backend.wait_for_sync(timeout=30)
+
+    assert synced == [True]
+    assert backend.count() == len(MEALS) + 1
+    assert backend.similarity_search("mushroom risotto", k=1)[0].page_content == "Mushroom risotto"
+
+
+def test_index_from_another_model_is_refused(tmp_path, embeddings, filled_store):
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(filled_store, index_dir)
+
+    class OtherModel(type(embeddings)):
+        model_name = "some-other-model"
+
+    with pytest.raises(ValueError):
+        vector_backends.NumpyBackend(index_dir, OtherModel())
+
+
+@pytest.fixture
+def random_store(vector_store):
+    """400 random unit vectors: enough for compact dtypes to misorder neighbours"""
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(400, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vector_store._collection.add(
+        ids=[f"row-{i}" for i in range(len(vectors))], embeddings=vectors.tolist(),
+        documents=[f"row {i}" for i in range(len(vectors))],
+        metadatas=[{"category": "lunch" if i % 2 else "dinner", "calories": float(i)} for i in range(len(vectors))]
+    )
+    return vector_store, vectors
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_dtypes_rerank_to_exact_results(tmp_path, embeddings, random_store, dtype):
+    store, vectors = random_store
+    index_dir = str(tmp_path / dtype)
+    vector_backends.NumpyBackend.export(store, index_dir, dtype=dtype)
+    backend = vector_backends.NumpyBackend(index_dir, embeddings, rerank_factor=4)
+    assert backend.dtype == dtype
+
+    rng = np.random.default_rng(11)
+    queries = vectors[:50] + rng.normal(scale=0.05, size=(50, 64)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(vectors @ queries.T), axis=0)[:10].T
+
+    reranked = backend.search_rows(queries, 10, rerank=True)
+    assert all(set(rows.tolist()) == set(truth.tolist()) for rows, truth in zip(reranked, exact))
+
+    report = backend.recall_report(k=10, samples=50)
+    assert report["recall_reranked"] >= report["recall_compact"]
+    assert report["recall_reranked"] == 1.0
+
+
+def test_int8_where_matches_float32(tmp_path, embeddings, random_store):
+    store, vectors = random_store
+    vector_backends.NumpyBackend.export(store, str(tmp_path / "f32"), dtype="float32")
+    vector_backends.NumpyBackend.export(store, str(tmp_path / "i8"), dtype="int8")
+    float32 = vector_backends.NumpyBackend(str(tmp_path / "f32"), embeddings)
+    int8 = vector_backends.NumpyBackend(str(tmp_path / "i8"), embeddings)
+    assert int8.memory_bytes() < float32.memory_bytes()
+
+    where = {"$and": [{"category": "lunch"}, {"calories": {"$lte": 200}}]}
+    query = [vectors[3].tolist()]
+    expected = [doc.page_content for doc in float32.query(query, 5, where)[0]]
+    assert [doc.page_content for doc in int8.query(query, 5, where)[0]] == expected
+    assert expected[0] == "row 3"
+
+
+def test_rows_resolve_in_the_generation_they_were_found_in(tmp_path, embeddings, random_store):
+    store, vectors = random_store
+    index_dir = str(tmp_path / "index")
+    vector_backends.NumpyBackend.export(store, index_dir, dtype="int8")
+    backend = vector_backends.NumpyBackend(index_dir, embeddings)
+
+    state = backend._state
+    rows = backend.search_rows(vectors[:1], 1, state=state)[0]
+
+    store._collection.delete(ids=[f"row-{i}" for i in range(200)])
+    backend.sync(store)
+    backend.wait_for_sync(timeout=30)
+    assert backend.count() == 200 and backend._state is not state
+
+    # A query that started before the swap still reads its own generation
+    assert backend._document(state, int(rows[0])).page_content == "row 0"
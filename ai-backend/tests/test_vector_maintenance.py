@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from conftest import write_catalog
+
+vector_maintenance = pytest.importorskip("vector_maintenance")
+ingest = pytest.importorskip("ingest")
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def dataset(rows):
+    """rows: (id, document, metadata, vector)"""
+    return {
+        "ids": [row[0] for row in rows],
+        "documents": [row[1] for row in rows],
+        "metadatas": [row[2] for row in rows],
+        "vectors": np.vstack([row[3] for row in rows]).astype(np.float32)
+    }
+
+
+def typed(item, category, calories, **extra):
+    return {"item": item, "category": category, "calories": float(calories), **extra}
+
+
+def kinds(duplicates, data):
+    return sorted((g["kind"], data["ids"][g["keep"]], tuple(data["ids"][i] for i in g["drop"]))
+                  for g in duplicates["groups"])
+
+
+def test_exact_copies_keep_the_ingested_row():
+    data = dataset([
+        ("legacy", "Apple - Category: snacks", typed("Apple", "snacks", 95), unit(1, 0)),
+        ("ingested", "Apple - Category: snacks", typed("Apple", "snacks", 95, content_hash="x"), unit(1, 0)),
+        ("banana", "Banana - Category: snacks", typed("Banana", "snacks", 105), unit(0, 1))
+    ])
+    # content_hash is ignored when comparing content
+    duplicates = vector_maintenance.find_duplicates(data, threshold=0.97)
+    assert kinds(duplicates, data) == [("exact", "ingested", ("legacy",))]
+    assert (duplicates["exact"], duplicates["near"]) == (1, 0)
+
+
+def test_near_duplicates_need_the_same_category_and_close_calories():
+    data = dataset([
+        ("yogurt", "Greek yogurt", typed("Greek yogurt", "snacks", 100), unit(1, 0.05)),
+        ("yogurt-2", "Greek Yogurt", typed("Greek Yogurt", "snacks", 105), unit(1, 0.06)),
+        ("yogurt-big", "Greek yogurt bowl", typed("Greek yogurt bowl", "snacks", 300), unit(1, 0.07)),
+        ("yogurt-bf", "Greek yogurt", typed("Greek yogurt", "breakfast", 100), unit(1, 0.04))
+    ])
+    duplicates = vector_maintenance.find_duplicates(data, threshold=0.97)
+    assert kinds(duplicates, data) == [("near", "yogurt", ("yogurt-2",))]
+    # Across categories only reported by default
+    assert duplicates["cross_category_pairs"] == 2
+    assert duplicates["cross_category_examples"][0]["categories"][1] == "breakfast"
+
+    merged = vector_maintenance.find_duplicates(data, threshold=0.97, cross_category=True)
+    [group] = merged["groups"]
+    assert group["kind"] == "cross_category"
+    assert sorted(data["ids"][i] for i in group["drop"]) == ["yogurt-2", "yogurt-bf"]
+    assert group["other_categories"] == ["breakfast"]
+
+
+def test_untyped_rows_are_typed_from_their_text_or_never_near_merged():
+    data = dataset([
+        ("a", "Lentil soup - Category: Lunch, Serving: 1 cup, Calories: 220 kcal", {}, unit(1, 0.01)),
+        ("b", "Lentil Soup - Category: Lunch, Serving: 1.5 cups, Calories: 230 kcal", {}, unit(1, 0.02)),
+        ("c", "Lentil soup", {}, unit(1, 0.03)),
+        ("d", "Lentil soup (large)", {}, unit(1, 0.03))
+    ])
+    duplicates = vector_maintenance.find_duplicates(data, threshold=0.97)
+    assert kinds(duplicates, data) == [("near", "a", ("b",))]
+
+
+def test_blocks_and_nearest_neighbours_find_the_same_pairs(vector_store, monkeypatch):
+    rng = np.random.default_rng(3)
+    base = rng.normal(size=(60, 16)).astype(np.float32)
+    copies = base[:10] + rng.normal(scale=0.01, size=(10, 16)).astype(np.float32)
+    vectors = np.vstack([base, copies])
+    # Stored embeddings are normalized, so the index's L2 neighbours are the cosine ones
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"row-{i}" for i in range(len(vectors))]
+    metadatas = [typed(f"item {i % 60}", "lunch", 300) for i in range(len(vectors))]
+    vector_store._collection.add(ids=ids, embeddings=vectors.tolist(),
+                                 documents=[f"item {i}" for i in range(len(vectors))], metadatas=metadatas)
+    data = vector_maintenance.load_collection(vector_store._collection)
+
+    monkeypatch.setattr(vector_maintenance, "SIMILARITY_BLOCK_BYTES", 4 * 70 * 7)   # 7-row blocks
+    exact = vector_maintenance.find_duplicates(data, threshold=0.97)
+
+    monkeypatch.setattr(vector_maintenance, "EXACT_SEARCH_MAX_ROWS", 0)
+    monkeypatch.setattr(vector_maintenance, "PAGE_SIZE", 16)
+    approximate = vector_maintenance.find_duplicates(data, threshold=0.97, collection=vector_store._collection)
+
+    assert exact["near"] == approximate["near"] == 10
+    assert kinds(exact, data) == kinds(approximate, data)
+
+
+def test_removed_rows_are_not_ingested_back(tmp_path, vector_store):
+    catalog = [
+        ("Snacks", "Greek yogurt", "1 cup", 100),
+        ("Snacks", "Greek yogurt plain", "1 cup", 100),
+        ("Lunch", "Lentil soup", "1 bowl", 220)
+    ]
+    csv_path = write_catalog(tmp_path / "meals.csv", catalog)
+    db_location = str(tmp_path / "chroma_db")
+    ingest.ingest_catalog(vector_store, csv_path)
+
+    data = vector_maintenance.load_collection(vector_store._collection)
+    duplicates = vector_maintenance.find_duplicates(data, threshold=0.9)
+    plan = vector_maintenance.dedupe_plan(data, duplicates)
+    assert len(plan["drop_ids"]) == 1
+
+    new_store = vector_maintenance.build_deduplicated(vector_store, db_location, plan)
+    assert new_store._collection.count() == 2
+    assert vector_maintenance.suppress_ids(db_location, plan["drop_ids"]) == 1
+    assert ingest.load_suppressed_ids(db_location) == plan["drop_ids"]
+
+    # The CSV still lists the removed row: re-ingesting skips it
+    stats = ingest.ingest_catalog(new_store, csv_path, prune=True,
+                                  suppressed_ids=ingest.load_suppressed_ids(db_location))
+    assert (stats["added"], stats["suppressed"]) == (0, 1)
+    assert new_store._collection.count() == 2
+    assert not set(new_store._collection.get(include=[])["ids"]) & plan["drop_ids"]
@@ -0,0 +1,99 @@
+import os
+import tarfile
+
+import pytest
+
+from conftest import HashingEmbeddings
+
+vector_snapshot = pytest.importorskip("vector_snapshot")
+chroma = pytest.importorskip("langchain_community.vectorstores")
+
+MEALS = ["Oatmeal with berries", "Grilled chicken salad", "Salmon with rice", "Greek yogurt"]
+
+
+@pytest.fixture
+def snapshot(tmp_path, vector_store):
+    vector_store.add_texts(texts=MEALS, metadatas=[{"category": "lunch", "calories": 100.0 * i}
+                                                  for i in range(len(MEALS))],
+                           ids=[f"meal-{i}" for i in range(len(MEALS))])
+    path = str(tmp_path / "meal_database.snapshot.tar")
+    vector_snapshot.export_snapshot(vector_store, path, version="v1")
+    return path
+
+
+def fresh_store(tmp_path, embeddings, name="fresh_db"):
+    return chroma.Chroma(collection_name="meal_database", persist_directory=str(tmp_path / name),
+                         embedding_function=embeddings)
+
+
+def test_import_round_trips_without_reembedding(tmp_path, embeddings, snapshot, vector_store):
+    store = fresh_store(tmp_path, embeddings)
+    db_location = str(tmp_path / "fresh_db")
+
+    result = vector_snapshot.import_snapshot(store, snapshot, db_location)
+    assert (result["imported"], result["skipped"], result["version"]) == (len(MEALS), False, "v1")
+
+    original = vector_store._collection.get(ids=["meal-2"], include=["embeddings", "documents", "metadatas"])
+    imported = store._collection.get(ids=["meal-2"], include=["embeddings", "documents", "metadatas"])
+    assert imported["documents"] == original["documents"] == ["Salmon with rice"]
+    assert imported["metadatas"] == original["metadatas"]
+    assert list(imported["embeddings"][0]) == pytest.approx(list(original["embeddings"][0]))
+
+    # The same snapshot is not loaded twice
+    assert vector_snapshot.import_snapshot(store, snapshot, db_location)["skipped"] is True
+
+
+def corrupt(snapshot_path, tmp_path):
+    """Copy of the snapshot with one record changed but the old manifest checksums"""
+    extracted = tmp_path / "extracted"
+    with tarfile.open(snapshot_path) as tar:
+        tar.extractall(extracted)
+    records = extracted / "records.jsonl"
+    records.write_text(records.read_text(encoding="utf-8").replace("Salmon", "Tofu"), encoding="utf-8")
+    bad_path = str(tmp_path / "corrupt.snapshot.tar")
+    with tarfile.open(bad_path, "w") as tar:
+        for name in ("manifest.json",) + vector_snapshot.PAYLOAD_FILES:
+            tar.add(str(extracted / name), arcname=name)
+    return bad_path
+
+
+def test_checksum_mismatch_is_refused_before_writing(tmp_path, embeddings, snapshot):
+    bad_path = corrupt(snapshot, tmp_path)
+    with pytest.raises(vector_snapshot.SnapshotError, match="checksum"):
+        vector_snapshot.verify_snapshot(bad_path)
+
+    store = fresh_store(tmp_path, embeddings)
+    with pytest.raises(vector_snapshot.SnapshotError):
+        vector_snapshot.import_snapshot(store, bad_path, str(tmp_path / "fresh_db"))
+    assert store._collection.count() == 0
+
+
+def test_snapshot_from_another_model_is_refused(tmp_path, snapshot):
+    class OtherModel(HashingEmbeddings):
+        model_name = "some-other-model"
+
+    store = fresh_store(tmp_path, OtherModel())
+    with pytest.raises(vector_snapshot.SnapshotError, match="some-other-model"):
+        vector_snapshot.import_snapshot(store, snapshot, str(tmp_path / "fresh_db"))
+    assert store._collection.count() == 0
+
+
+def test_unreadable_file_is_a_snapshot_error(tmp_path):
+    path = tmp_path / "not-a.snapshot.tar"
+    path.write_bytes(b"definitely not a tar archive")
+    with pytest.raises(vector_snapshot.SnapshotError):
+        vector_snapshot.read_manifest(str(path))
+
+
+def test_refused_snapshot_stops_setup(tmp_path, monkeypatch, embeddings):
+    setup_database = pytest.importorskip("setup_database", exc_type=ImportError)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(setup_database, "embedding_service", embeddings)
+    monkeypatch.setattr(setup_database.Config, "VECTOR_DB_LOCATION", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(setup_database.Config, "VECTOR_SNAPSHOT_PATH", str(tmp_path / "missing.snapshot.tar"))
+
+    with pytest.raises((vector_snapshot.SnapshotError, OSError)):
+        setup_database.setup_vector_store()
+    # Neither the sample catalog nor an ingest replaced the missing snapshot
+    assert not os.path.exists(tmp_path / "meal_data.csv")
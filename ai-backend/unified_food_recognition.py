@@ -3,6 +3,7 @@ from typing import Dict, Any, List
 from dish_service import vit_dish_classifier
 from cnn_service import cnn_service
 from barcode_service import barcode_scanner_service
+from nutrients import NutrientRecord, NUTRIENT_FIELDS, stack_records
 import numpy as np
 from PIL import Image
 import io
@@ -253,26 +254,28 @@ class UnifiedFoodRecognitionSystem:
         """Compare nutrition values across different sources"""
         comparison = {}
 
-        # Compare calories
-        calories = {}
-        for source, data in nutrition_data.items():
-            if "nutrients" in data and "calories" in data["nutrients"]:
-                cal_str = data["nutrients"]["calories"]
-                # Extract numeric value
-                try:
-                    cal_value = float(cal_str.split()[0])
-                    calories[source] = cal_value
-                except:
-                    continue
-
-        if len(calories) > 1:
-            min_cal = min(calories.values())
-            max_cal = max(calories.values())
-            comparison["calories"] = {
-                "range": f"{min_cal} - {max_cal}",
-                "difference": max_cal - min_cal,
-                "sources": calories
-            }
+        sources = list(nutrition_data.keys())
+        records = [NutrientRecord.from_dict(data.get("nutrients", {})) for data in nutrition_data.values()]
+        matrix = stack_records(records)  # one row per source, one column per nutrient
+
+        # Compare every nutrient at once; NaN marks a source without that value
+        known = ~np.isnan(matrix)
+        counts = known.sum(axis=0)
+        mins = np.where(known, matrix, np.inf).min(axis=0)
+        maxs = np.where(known, matrix, -np.inf).max(axis=0)
+
+        for col, field in enumerate(NUTRIENT_FIELDS):
+            if counts[col] > 1:
+                min_value = round(float(mins[col]), 2)
+                max_value = round(float(maxs[col]), 2)
+                comparison[field] = {
+                    "range": f"{min_value} - {max_value}",
+                    "difference": round(max_value - min_value, 2),
+                    "sources": {
+                        source: round(float(matrix[row, col]), 2)
+                        for row, source in enumerate(sources) if known[row, col]
+                    }
+                }
 
         return comparison
 
@@ -0,0 +1,644 @@
+# ================================
+# File: vector_backends.py
+# Retrieval backends: Chroma, or an in-process NumPy index
+# ================================
+#
+# Chroma stays the store that ingest writes to. The "numpy" backend is a
+# read-only export of a collection, searched in process:
+#   <VECTOR_INDEX_DIR>/<collection>/
+#     manifest.json              current generation, dtype, model, metadata columns
+#     gen-<ms>/
+#       vectors_float32.npy      (rows, dim) L2-normalized, re-rank only (memory-mapped)
+#       vectors_<dtype>.npy      compact scoring copy: float16, or int8 codes
+#       int8_params.npz          per-dimension scale/offset for int8
+#       columns.npz              metadata filter columns (numeric / categorical codes)
+#       records.jsonl            one {"id", "document", "metadata"} per row
+#       record_offsets.npy       byte offset of each record
+#
+# Select per environment with VECTOR_BACKEND=chroma|numpy and
+# VECTOR_INDEX_DTYPE=float32|float16|int8.
+# Export:   python vector_backends.py export [--collection meal_database] [--dtype int8]
+# Compare:  python vector_backends.py compare "grilled chicken" "oatmeal" ...
+# Recall:   python vector_backends.py recall [--k 10]
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+from config import Config
+
+INDEX_FORMAT_VERSION = 2
+# Storage dtype -> bytes per dimension
+STORAGE_DTYPES = {"float32": 4, "float16": 2, "int8": 1}
+EXPORT_PAGE_SIZE = 1000
+SCORE_CHUNK_ROWS = 65536
+
+
+class VectorBackend:
+    """What the retrievers need from an index: batched, filtered top-k search.
+
+    `where` filters use Chroma's syntax so callers do not care which
+    backend answers.
+    """
+
+    name = "base"
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self._latencies = deque(maxlen=1000)
+        self._queries = 0
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], k: int,
+              where: Optional[dict] = None) -> List[List[Document]]:
+        """Top-k documents per query embedding, in query order"""
+        started = time.perf_counter()
+        try:
+            return self._query(query_embeddings, k, where)
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            self._queries += len(query_embeddings)
+
+    def _query(self, query_embeddings, k: int, where: Optional[dict]) -> List[List[Document]]:
+        raise NotImplementedError
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> List[Document]:
+        return self.query([self.embeddings.embed_query(query)], k, filter)[0]
+
+    def sync(self, vector_store, on_synced: Optional[Callable[[], None]] = None):
+        """Called after writes to the underlying Chroma store. Chroma is
+        always current; exported indexes call on_synced once they are."""
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by this process for the index"""
+        return 0
+
+    def stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+        return {
+            "backend": self.name,
+            "documents": self.count(),
+            "memory_mb": round(self.memory_bytes() / 1e6, 2),
+            "queries": self._queries,
+            "latency_ms_p50": round(_percentile(latencies, 0.50) * 1000, 3),
+            "latency_ms_p95": round(_percentile(latencies, 0.95) * 1000, 3)
+        }
+
+
+class ChromaBackend(VectorBackend):
+    """Queries go through the Chroma collection (SQLite + HNSW)"""
+
+    name = "chroma"
+
+    def __init__(self, vector_store):
+        super().__init__(vector_store.embeddings)
+        self.vector_store = vector_store
+
+    def _query(self, query_embeddings, k: int, where: Optional[dict]) -> List[List[Document]]:
+        query_kwargs = {"where": where} if where else {}
+        result = self.vector_store._collection.query(
+            query_embeddings=[list(map(float, e)) for e in query_embeddings],
+            n_results=k,
+            include=["documents", "metadatas"],
+            **query_kwargs
+        )
+        return [
+            [Document(page_content=content, metadata=metadata or {})
+             for content, metadata in zip(documents, metadatas)]
+            for documents, metadatas in zip(result["documents"], result["metadatas"])
+        ]
+
+    def count(self) -> int:
+        return self.vector_store._collection.count()
+
+
+class _IndexState(NamedTuple):
+    """One loaded generation; replaced as a whole, never modified"""
+    manifest: Dict
+    dtype: str
+    full: np.ndarray
+    compact: np.ndarray
+    quantization: Optional[tuple]
+    columns: Dict
+    offsets: np.ndarray
+    records: object
+
+
+class NumpyBackend(VectorBackend):
+    """Brute-force cosine search over a memory-mapped compact matrix.
+
+    Vectors are scored in their storage dtype (float32, float16 or scalar
+    int8). For the compact dtypes, the top `k * VECTOR_RERANK_FACTOR`
+    candidates are re-ranked against the float32 vectors. Those are
+    memory-mapped too, and only the candidate rows are read.
+
+    Filters are evaluated as boolean masks over per-key metadata columns,
+    so they cost one vectorized pass and never shrink the result below k
+    matching rows. Document text and metadata are read from disk only
+    for returned rows.
+
+    Each query reads one generation (`_state`) from start to finish. sync()
+    re-exports in a background thread and swaps the new generation in when
+    it is loaded, so writers never wait for an export.
+    """
+
+    name = "numpy"
+
+    def __init__(self, index_dir: str, embeddings, rerank_factor: int = Config.VECTOR_RERANK_FACTOR):
+        super().__init__(embeddings)
+        self.index_dir = index_dir
+        self.rerank_factor = rerank_factor
+        self._sync_lock = threading.Lock()
+        self._sync_pending = None
+        self._sync_thread = None
+        self._load()
+
+    def _load(self):
+        manifest = read_index_manifest(self.index_dir)
+        if manifest is None or manifest.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"no index (format {INDEX_FORMAT_VERSION}) at {self.index_dir}")
+        model_name = getattr(self.embeddings, "model_name", None)
+        if model_name and manifest.get("model") not in (None, model_name):
+            raise ValueError(f"index built with {manifest.get('model')}, service uses {model_name}")
+
+        generation_dir = os.path.join(self.index_dir, manifest["generation"])
+        rows = manifest["rows"]
+        full = np.load(os.path.join(generation_dir, "vectors_float32.npy"), mmap_mode="r")[:rows]
+        dtype = manifest["dtype"]
+        if dtype == "float32":
+            compact = full
+        else:
+            compact = np.load(os.path.join(generation_dir, f"vectors_{dtype}.npy"), mmap_mode="r")[:rows]
+        quantization = None
+        if dtype == "int8":
+            with np.load(os.path.join(generation_dir, "int8_params.npz")) as params:
+                quantization = (params["scale"].astype(np.float32), params["offset"].astype(np.float32))
+
+        with np.load(os.path.join(generation_dir, "columns.npz")) as stored:
+            columns = {}
+            for key, spec in manifest["columns"].items():
+                values = stored[spec["array"]]
+                if spec["kind"] == "categorical":
+                    columns[key] = _Categorical(values, spec["vocabulary"])
+                else:
+                    columns[key] = values
+
+        offsets = np.load(os.path.join(generation_dir, "record_offsets.npy"))
+        with open(os.path.join(generation_dir, "records.jsonl"), "rb") as f:
+            records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if rows else b""
+
+        self._state = _IndexState(manifest, dtype, full, compact, quantization, columns, offsets, records)
+        print(f"   ✅ NumPy vector index mapped ({rows} documents, {dtype}, "
+              f"{self.memory_bytes() / 1e6:.1f} MB resident)")
+
+    # ---------- export ----------
+
+    @classmethod
+    def export(cls, vector_store, index_dir: str, dtype: Optional[str] = None) -> Dict:
+        """Write a collection's stored vectors (no re-embedding) as a NumPy index.
+
+        Each export is a new generation directory; manifest.json is swapped
+        last, so readers never see a half-written index.
+        """
+        dtype = dtype or Config.VECTOR_INDEX_DTYPE
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"VECTOR_INDEX_DTYPE must be one of {STORAGE_DTYPES}")
+
+        collection = vector_store._collection
+        expected = collection.count()
+        generation = f"gen-{int(time.time() * 1000)}"
+        generation_dir = os.path.join(index_dir, generation)
+        os.makedirs(generation_dir, exist_ok=True)
+
+        full, row, offsets = None, 0, []
+        raw_columns: Dict[str, list] = {}
+        with open(os.path.join(generation_dir, "records.jsonl"), "wb") as records:
+            while row < expected:
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=EXPORT_PAGE_SIZE, offset=row)
+                page_ids = (page.get("ids") or [])[:expected - row]
+                if not page_ids:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)[:len(page_ids)]
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                if full is None:
+                    full = np.lib.format.open_memmap(
+                        os.path.join(generation_dir, "vectors_float32.npy"), mode="w+",
+                        dtype=np.float32, shape=(expected, vectors.shape[1])
+                    )
+                full[row:row + len(page_ids)] = vectors
+
+                for i, (doc_id, document, metadata) in enumerate(zip(page_ids, page["documents"], page["metadatas"])):
+                    offsets.append(records.tell())
+                    metadata = metadata or {}
+                    records.write((json.dumps({"id": doc_id, "document": document, "metadata": metadata}) + "\n").encode("utf-8"))
+                    for key, value in metadata.items():
+                        raw_columns.setdefault(key, [None] * expected)[row + i] = value
+                row += len(page_ids)
+
+        if full is None:
+            full = np.lib.format.open_memmap(os.path.join(generation_dir, "vectors_float32.npy"),
+                                             mode="w+", dtype=np.float32, shape=(0, 0))
+        full.flush()
+        np.save(os.path.join(generation_dir, "record_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+        if dtype != "float32":
+            _write_compact(full[:row], dtype, generation_dir)
+
+        column_specs, arrays = {}, {}
+        for n, (key, values) in enumerate(sorted(raw_columns.items())):
+            spec, array = _column_array(values[:row])
+            spec["array"] = f"c{n}"
+            column_specs[key] = spec
+            arrays[spec["array"]] = array
+        np.savez(os.path.join(generation_dir, "columns.npz"), **arrays)
+
+        manifest = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "generation": generation,
+            "collection": collection.name,
+            "model": getattr(vector_store.embeddings, "model_name", None),
+            "rows": row,
+            "dimension": int(full.shape[1]) if full.ndim == 2 else 0,
+            "dtype": dtype,
+            "columns": column_specs,
+            "exported_at": time.time()
+        }
+        tmp_manifest = os.path.join(index_dir, "manifest.json.tmp")
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, os.path.join(index_dir, "manifest.json"))
+        _remove_old_generations(index_dir, keep=generation)
+
+        print(f"✅ Exported {row} vectors ({dtype}) from '{collection.name}' to {index_dir}")
+        return manifest
+
+    @property
+    def dtype(self) -> str:
+        return self._state.dtype
+
+    def sync(self, vector_store, on_synced: Optional[Callable[[], None]] = None):
+        """Re-export in the background; queries use the current generation
+        until the new one is loaded. Writes made during an export are picked
+        up by one more export, however many there were."""
+        with self._sync_lock:
+            self._sync_pending = (vector_store, on_synced)
+            if self._sync_thread is not None:
+                return
+            self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True, name="numpy-index-sync")
+            self._sync_thread.start()
+
+    def _sync_loop(self):
+        while True:
+            with self._sync_lock:
+                pending, self._sync_pending = self._sync_pending, None
+                if pending is None:
+                    self._sync_thread = None
+                    return
+            vector_store, on_synced = pending
+            try:
+                NumpyBackend.export(vector_store, self.index_dir, self.dtype)
+                self._load()
+                if on_synced is not None:
+                    on_synced()
+            except Exception as e:
+                print(f"   ⚠️  NumPy vector index sync failed: {e}")
+
+    def wait_for_sync(self, timeout: Optional[float] = None):
+        """Block until background exports are done (CLI and tests)"""
+        with self._sync_lock:
+            thread = self._sync_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # ---------- search ----------
+
+    def search_rows(self, queries: np.ndarray, k: int, where: Optional[dict] = None,
+                    rerank: Optional[bool] = None, state: Optional[_IndexState] = None) -> List[np.ndarray]:
+        """Row numbers of the top-k per (normalized) query, best first, in
+        `state` (default: the current generation)"""
+        state = state or self._state
+        dtype, full, compact = state.dtype, state.full, state.compact
+        quantization, columns = state.quantization, state.columns
+
+        rows = compact.shape[0]
+        if rows == 0 or k <= 0:
+            return [np.empty(0, dtype=np.intp) for _ in range(len(queries))]
+        if rerank is None:
+            rerank = dtype != "float32"
+
+        # Scores in the storage dtype, upcast chunk by chunk, never all at once
+        weights, bias = queries.T, 0.0
+        if quantization is not None:
+            # x = code * scale + offset  =>  q.x = code.(q * scale) + q.offset
+            scale, offset = quantization
+            weights, bias = (queries * scale).T, queries @ offset
+        scores = np.empty((rows, len(queries)), dtype=np.float32)
+        for start in range(0, rows, SCORE_CHUNK_ROWS):
+            chunk = np.asarray(compact[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ weights + bias
+
+        if where:
+            scores[~_evaluate_where(where, columns, rows)] = -np.inf
+
+        depth = min(rows, k * self.rerank_factor if rerank else k)
+        top = np.argpartition(-scores, depth - 1, axis=0)[:depth]
+        ranked = []
+        for j in range(len(queries)):
+            candidates = top[:, j]
+            candidates = candidates[np.isfinite(scores[candidates, j])]
+            if rerank and len(candidates):
+                # Sorted rows keep the memory-mapped reads sequential
+                candidates = np.sort(candidates)
+                exact = np.asarray(full[candidates], dtype=np.float32) @ queries[j]
+                ranked.append(candidates[np.argsort(-exact, kind="stable")][:k])
+            else:
+                ranked.append(candidates[np.argsort(-scores[candidates, j], kind="stable")][:k])
+        return ranked
+
+    def _query(self, query_embeddings, k: int, where: Optional[dict]) -> List[List[Document]]:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        # Rows are only meaningful in the generation they were found in
+        state = self._state
+        return [[self._document(state, row) for row in rows]
+                for rows in self.search_rows(queries, k, where, state=state)]
+
+    @staticmethod
+    def _document(state: _IndexState, row: int) -> Document:
+        offsets, records = state.offsets, state.records
+        end = offsets[row + 1] if row + 1 < len(offsets) else len(records)
+        record = json.loads(records[offsets[row]:end])
+        return Document(page_content=record["document"], metadata=record["metadata"] or {})
+
+    def count(self) -> int:
+        return int(self._state.compact.shape[0])
+
+    def memory_bytes(self) -> int:
+        """Resident index: compact vectors, filter columns, record offsets.
+
+        The float32 vectors and records stay on disk; re-ranking pages in
+        only the candidate rows.
+        """
+        state = self._state
+        column_bytes = sum(c.nbytes for c in state.columns.values())
+        return int(state.compact.nbytes + column_bytes + state.offsets.nbytes)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        compact = self._state.compact
+        stats["dtype"] = self._state.dtype
+        stats["bytes_per_vector"] = int(compact.itemsize * compact.shape[1]) if compact.ndim == 2 else 0
+        return stats
+
+    def recall_report(self, k: int = 10, samples: int = 200, seed: int = 0) -> Dict:
+        """recall@k of the stored dtype, with and without re-rank, vs exact float32.
+
+        Queries are stored vectors with a little noise, so the nearest
+        neighbour is not trivially the query itself.
+        """
+        state = self._state
+        rows = int(state.compact.shape[0])
+        if rows == 0:
+            return {"k": k, "samples": 0}
+        full = state.full
+        rng = np.random.default_rng(seed)
+        picked = np.sort(rng.choice(rows, size=min(samples, rows), replace=False))
+        queries = np.asarray(full[picked], dtype=np.float32)
+        queries += rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = np.empty((rows, len(queries)), dtype=np.float32)
+        for start in range(0, rows, SCORE_CHUNK_ROWS):
+            exact[start:start + SCORE_CHUNK_ROWS] = np.asarray(full[start:start + SCORE_CHUNK_ROWS]) @ queries.T
+        depth = min(k, rows)
+        truth = [set(column) for column in np.argpartition(-exact, depth - 1, axis=0)[:depth].T]
+
+        def recall(results):
+            return round(float(np.mean([len(truth[j] & set(r.tolist())) / depth for j, r in enumerate(results)])), 4)
+
+        dimension = full.shape[1]
+        return {
+            "k": k,
+            "samples": len(queries),
+            "dtype": state.dtype,
+            "recall_compact": recall(self.search_rows(queries, k, rerank=False, state=state)),
+            "recall_reranked": recall(self.search_rows(queries, k, rerank=True, state=state)),
+            "rerank_factor": self.rerank_factor,
+            "resident_mb": round(self.memory_bytes() / 1e6, 2),
+            "vectors_mb_per_1m_items": {
+                name: round(STORAGE_DTYPES[name] * dimension, 1) for name in STORAGE_DTYPES
+            }
+        }
+
+
+# ---------- storage helpers ----------
+
+def read_index_manifest(index_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_compact(full: np.ndarray, dtype: str, generation_dir: str):
+    """float16 copy, or per-dimension scalar int8 codes plus (scale, offset)"""
+    rows, dimension = full.shape if full.ndim == 2 else (0, 0)
+    compact = np.lib.format.open_memmap(os.path.join(generation_dir, f"vectors_{dtype}.npy"), mode="w+",
+                                        dtype=np.float16 if dtype == "float16" else np.int8,
+                                        shape=(rows, dimension))
+    if dtype == "float16":
+        for start in range(0, rows, SCORE_CHUNK_ROWS):
+            compact[start:start + SCORE_CHUNK_ROWS] = full[start:start + SCORE_CHUNK_ROWS]
+        compact.flush()
+        return
+
+    low = np.full(dimension, np.inf, dtype=np.float32)
+    high = np.full(dimension, -np.inf, dtype=np.float32)
+    for start in range(0, rows, SCORE_CHUNK_ROWS):
+        chunk = full[start:start + SCORE_CHUNK_ROWS]
+        low = np.minimum(low, chunk.min(axis=0))
+        high = np.maximum(high, chunk.max(axis=0))
+    if rows == 0:
+        low = high = np.zeros(dimension, dtype=np.float32)
+    scale = np.where(high > low, (high - low) / 255.0, 1.0).astype(np.float32)
+    for start in range(0, rows, SCORE_CHUNK_ROWS):
+        chunk = full[start:start + SCORE_CHUNK_ROWS]
+        compact[start:start + SCORE_CHUNK_ROWS] = np.clip(np.rint((chunk - low) / scale) - 128, -128, 127)
+    compact.flush()
+    # code = round((x - low) / scale) - 128  =>  x ~ code * scale + (low + 128 * scale)
+    np.savez(os.path.join(generation_dir, "int8_params.npz"), scale=scale, offset=low + 128 * scale)
+
+
+def _remove_old_generations(index_dir: str, keep: str):
+    for name in os.listdir(index_dir):
+        if name.startswith("gen-") and name != keep:
+            # Open memory maps keep their files alive on POSIX; on Windows
+            # the directory is left for the next export to clean up
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+# ---------- metadata filtering (subset of Chroma's `where`) ----------
+
+class _Categorical:
+    """String-valued column as int32 codes into a vocabulary (-1 = missing)"""
+
+    def __init__(self, codes: np.ndarray, vocabulary: List[str]):
+        self.codes = codes
+        self.vocabulary = vocabulary
+        self._code_of = {value: code for code, value in enumerate(vocabulary)}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def code(self, value) -> int:
+        # Never matches a stored row (missing values are -1)
+        return self._code_of.get(str(value), -2)
+
+
+def _column_array(values: list):
+    """(spec, array) for one metadata key: float64 with NaN for missing, else categorical"""
+    if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+        return {"kind": "numeric"}, np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    vocabulary = sorted({str(v) for v in values if v is not None})
+    code_of = {value: code for code, value in enumerate(vocabulary)}
+    codes = np.array([-1 if v is None else code_of[str(v)] for v in values], dtype=np.int32)
+    return {"kind": "categorical", "vocabulary": vocabulary}, codes
+
+
+_COMPARISONS = {
+    "$eq": lambda column, value: column == value,
+    "$ne": lambda column, value: column != value,
+    "$gt": lambda column, value: column > value,
+    "$gte": lambda column, value: column >= value,
+    "$lt": lambda column, value: column < value,
+    "$lte": lambda column, value: column <= value,
+    "$in": lambda column, value: np.isin(column, list(value)),
+    "$nin": lambda column, value: ~np.isin(column, list(value)),
+}
+
+
+def _evaluate_where(where: dict, columns: Dict, rows: int) -> np.ndarray:
+    mask = np.ones(rows, dtype=bool)
+    for key, condition in where.items():
+        if key == "$and":
+            for clause in condition:
+                mask &= _evaluate_where(clause, columns, rows)
+        elif key == "$or":
+            either = np.zeros(rows, dtype=bool)
+            for clause in condition:
+                either |= _evaluate_where(clause, columns, rows)
+            mask &= either
+        else:
+            column = columns.get(key)
+            if column is None:
+                return np.zeros(rows, dtype=bool)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"unsupported filter operator {operator}")
+                if isinstance(column, _Categorical):
+                    if operator not in ("$eq", "$ne", "$in", "$nin"):
+                        raise ValueError(f"{operator} is not supported on text field '{key}'")
+                    value = [column.code(v) for v in value] if operator in ("$in", "$nin") else column.code(value)
+                    values = column.codes
+                else:
+                    values = column
+                with np.errstate(invalid="ignore"):
+                    mask &= np.asarray(_COMPARISONS[operator](values, value), dtype=bool)
+    return mask
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# ---------- selection ----------
+
+def index_dir_for(vector_store) -> str:
+    return os.path.join(Config.VECTOR_INDEX_DIR, vector_store._collection.name)
+
+
+def create_backend(vector_store, backend: Optional[str] = None) -> VectorBackend:
+    """Backend for a Chroma store, per VECTOR_BACKEND; falls back to Chroma"""
+    backend = (backend or Config.VECTOR_BACKEND).lower()
+    if backend == "numpy":
+        index_dir = index_dir_for(vector_store)
+        try:
+            manifest = read_index_manifest(index_dir) or {}
+            if (manifest.get("format_version") != INDEX_FORMAT_VERSION
+                    or manifest.get("dtype") != Config.VECTOR_INDEX_DTYPE):
+                print(f"   🔄 NumPy vector index at {index_dir} missing or outdated - exporting from Chroma...")
+                NumpyBackend.export(vector_store, index_dir)
+            return NumpyBackend(index_dir, vector_store.embeddings)
+        except Exception as e:
+            print(f"   ⚠️  NumPy vector index unavailable ({e}), using Chroma")
+    elif backend != "chroma":
+        print(f"   ⚠️  Unknown VECTOR_BACKEND '{backend}', using Chroma")
+    return ChromaBackend(vector_store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or compare vector retrieval backends")
+    parser.add_argument("command", choices=["export", "compare", "recall"])
+    parser.add_argument("queries", nargs="*")
+    parser.add_argument("--db", default=Config.VECTOR_DB_LOCATION)
+    parser.add_argument("--collection", default=Config.COLLECTION_NAME)
+    parser.add_argument("--k", type=int, default=Config.RETRIEVAL_K)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--dtype", choices=sorted(STORAGE_DTYPES), default=Config.VECTOR_INDEX_DTYPE)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    from ingest import open_vector_store
+    vector_store = open_vector_store(args.db, args.collection)
+
+    if args.command == "export":
+        NumpyBackend.export(vector_store, index_dir_for(vector_store), args.dtype)
+        return
+
+    if args.command == "recall":
+        index_dir = index_dir_for(vector_store)
+        if (read_index_manifest(index_dir) or {}).get("dtype") != args.dtype:
+            NumpyBackend.export(vector_store, index_dir, args.dtype)
+        report = NumpyBackend(index_dir, vector_store.embeddings).recall_report(args.k, args.samples)
+        print(f"📊 {json.dumps(report, indent=2)}")
+        return
+
+    queries = args.queries or [" ".join(terms[:3]) for terms in Config.MEAL_TYPE_TERMS.values()]
+    query_embeddings = vector_store.embeddings.embed_documents(queries)
+    backends = [ChromaBackend(vector_store), create_backend(vector_store, "numpy")]
+    results = {}
+    for backend in backends:
+        for _ in range(args.repeat):
+            results[backend.name] = backend.query(query_embeddings, args.k)
+        print(f"📊 {backend.stats()}")
+
+    if "numpy" in results:
+        overlap = [
+            len({d.page_content for d in a} & {d.page_content for d in b}) / max(len(a), 1)
+            for a, b in zip(results["chroma"], results["numpy"])
+        ]
+        print(f"🔁 Top-{args.k} overlap (numpy vs chroma): {np.mean(overlap):.2%}")
+
+
+if __name__ == "__main__":
+    main()
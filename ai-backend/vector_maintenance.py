@@ -0,0 +1,481 @@
+# ================================
+# File: vector_maintenance.py
+# Dedupe, compact and reindex the meal vector collection
+# ================================
+#
+# Report only (nothing is written):
+#     python vector_maintenance.py
+# Copy the deduplicated collection into a fresh one, switch to it, VACUUM:
+#     python vector_maintenance.py --apply [--cross-category]
+#     python vector_maintenance.py --apply --api http://localhost:5001 [--drop-previous]
+#
+# Duplicates are found two ways:
+#   exact   same content hash (what ingest.py stores), e.g. rows written
+#           twice by the old id-less ingest
+#   near    cosine similarity >= DEDUPE_SIMILARITY and calories within
+#           DEDUPE_CALORIE_TOLERANCE, in the same category. Category and
+#           calories come from metadata, or from the document text for rows
+#           without metadata; rows where neither has them are never near-merged
+# Near-duplicates across categories (Greek Yogurt in breakfast and snacks)
+# are only reported unless --cross-category is given: each copy is what a
+# category-filtered search finds for its meal.
+#
+# In each group one document is kept (the one ingest.py would write, then
+# the one with the most metadata) and gets the others' missing metadata.
+# Removed ids are added to <db>/suppressed_ids.json, so ingest.py does not
+# write their catalog CSV rows back.
+#
+# Up to EXACT_SEARCH_MAX_ROWS documents are compared all against all, in
+# blocks of at most SIMILARITY_BLOCK_BYTES; larger collections only compare
+# each document with its NEAREST_NEIGHBOURS from the collection's HNSW index.
+#
+# --apply never writes the live collection: the surviving documents are
+# copied into a new one (a fresh HNSW graph without deleted entries).
+# With --api the running RAG API switches to it through its rebuilder
+# (POST /api/admin/vector-store/switch, same smoke test as a rebuild).
+# Without --api only the collection pointer moves and the API switches on
+# restart; the old collection is then always kept, and --drop-previous is
+# refused because it may still be served.
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import requests
+from langchain.schema import Document
+
+from config import Config
+from collection_rebuild import drop_collection, record_switch, resolve_collection_name
+from ingest import content_hash, suppress_ids
+from vector_backends import NumpyBackend, create_backend, index_dir_for
+
+PAGE_SIZE = 1000
+SIMILARITY_BLOCK_BYTES = 64 * 1024 * 1024   # float32 block x rows similarity matrix per step
+EXACT_SEARCH_MAX_ROWS = 50000
+NEAREST_NEIGHBOURS = 10
+REPORTED_PAIRS = 50
+SWITCH_TIMEOUT_SECONDS = 300    # the API warms and smoke-tests before answering
+
+_CATEGORY_RE = re.compile(r"Category:\s*([^,]+)")
+_CALORIES_RE = re.compile(r"Calories:\s*(\d+(?:\.\d+)?)")
+
+
+def load_collection(collection) -> Dict:
+    """Every id, document, metadata and (normalized) embedding in the collection"""
+    ids, documents, metadatas, chunks = [], [], [], []
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"],
+                              limit=PAGE_SIZE, offset=len(ids))
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        ids.extend(page_ids)
+        documents.extend(page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        chunks.append(np.asarray(page["embeddings"], dtype=np.float32))
+
+    vectors = np.vstack(chunks) if chunks else np.empty((0, 0), dtype=np.float32)
+    if len(vectors):
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return {"ids": ids, "documents": documents, "metadatas": metadatas, "vectors": vectors}
+
+
+def _record_hash(document: str, metadata: Dict) -> str:
+    stripped = {key: value for key, value in metadata.items() if key != "content_hash"}
+    return content_hash(Document(page_content=document, metadata=stripped))
+
+
+def _typed_fields(document: str, metadata: Dict) -> Dict:
+    """Category and calories from metadata, or parsed from the document text
+    for rows written by the old id-less ingest (no metadata):
+    "<item> - Category: <category>, Serving: ..., Calories: <n> kcal"
+    """
+    category = metadata.get("category")
+    if category is None:
+        match = _CATEGORY_RE.search(document or "")
+        category = match.group(1) if match else None
+    calories = metadata.get("calories")
+    if calories is None:
+        match = _CALORIES_RE.search(document or "")
+        calories = float(match.group(1)) if match else None
+    return {
+        "item": metadata.get("item") or (document or "").split(" - ", 1)[0],
+        "category": str(category).strip().lower() if category is not None else None,
+        "calories": calories
+    }
+
+
+def _calories_close(a: Dict, b: Dict, tolerance: float) -> bool:
+    first, second = a["calories"], b["calories"]
+    if first is None or second is None:
+        return False
+    return abs(first - second) <= tolerance * max(abs(first), abs(second), 1)
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent: List[int], i: int, j: int):
+    root_i, root_j = _find(parent, i), _find(parent, j)
+    if root_i != root_j:
+        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def _similar_pairs(ids: List[str], vectors: np.ndarray, threshold: float,
+                   collection=None) -> Iterator[Tuple[int, int, float]]:
+    """(i, j, similarity) with i < j for pairs at or above threshold.
+
+    Every pair for small collections; past EXACT_SEARCH_MAX_ROWS (given the
+    collection) only each row's approximate nearest neighbours, scored
+    exactly on the loaded vectors.
+    """
+    rows = len(ids)
+    if collection is None or rows <= EXACT_SEARCH_MAX_ROWS:
+        block_rows = max(1, SIMILARITY_BLOCK_BYTES // (4 * max(rows, 1)))
+        for start in range(0, rows, block_rows):
+            similarities = vectors[start:start + block_rows] @ vectors.T
+            for i, j in zip(*np.nonzero(similarities >= threshold)):
+                if j > start + i:
+                    yield int(start + i), int(j), float(similarities[i, j])
+        return
+
+    row_of = {doc_id: n for n, doc_id in enumerate(ids)}
+    seen = set()
+    for start in range(0, rows, PAGE_SIZE):
+        result = collection.query(query_embeddings=vectors[start:start + PAGE_SIZE].tolist(),
+                                  n_results=NEAREST_NEIGHBOURS + 1, include=["distances"])
+        for offset, neighbour_ids in enumerate(result["ids"]):
+            i = start + offset
+            for doc_id in neighbour_ids:
+                j = row_of.get(doc_id)
+                if j is None or j == i:
+                    continue
+                pair = (min(i, j), max(i, j))
+                if pair in seen:
+                    continue
+                similarity = float(vectors[i] @ vectors[j])
+                if similarity >= threshold:
+                    seen.add(pair)
+                    yield pair[0], pair[1], similarity
+
+
+def find_duplicates(data: Dict, threshold: float = Config.DEDUPE_SIMILARITY,
+                    cross_category: bool = False, collection=None) -> Dict:
+    """Group duplicate documents; each group keeps one and drops the rest.
+    Pass the collection to take candidates from its index when it is large."""
+    ids, documents, metadatas, vectors = data["ids"], data["documents"], data["metadatas"], data["vectors"]
+    rows = len(ids)
+    parent = list(range(rows))
+    hashes = [_record_hash(document, metadata) for document, metadata in zip(documents, metadatas)]
+    fields = [_typed_fields(document, metadata) for document, metadata in zip(documents, metadatas)]
+
+    first_by_hash: Dict[str, int] = {}
+    for i, record_hash in enumerate(hashes):
+        _union(parent, first_by_hash.setdefault(record_hash, i), i)
+
+    cross_pairs = []
+    for i, j, similarity in _similar_pairs(ids, vectors, threshold, collection):
+        if hashes[i] == hashes[j]:
+            continue
+        # Rows whose category or calories cannot be told are never near-merged
+        if fields[i]["category"] is None or fields[j]["category"] is None:
+            continue
+        if not _calories_close(fields[i], fields[j], Config.DEDUPE_CALORIE_TOLERANCE):
+            continue
+        if fields[i]["category"] == fields[j]["category"]:
+            _union(parent, i, j)
+            continue
+        cross_pairs.append({
+            "items": [fields[i]["item"], fields[j]["item"]],
+            "categories": [fields[i]["category"], fields[j]["category"]],
+            "similarity": round(similarity, 4)
+        })
+        if cross_category:
+            _union(parent, i, j)
+
+    members: Dict[int, List[int]] = {}
+    for i in range(rows):
+        members.setdefault(_find(parent, i), []).append(i)
+
+    def keeper_rank(i):
+        # Prefer what ingest.py writes (it stores content_hash), then richer metadata
+        return ("content_hash" not in metadatas[i], -len(metadatas[i]), ids[i])
+
+    groups = []
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        group.sort(key=keeper_rank)
+        categories = {fields[i]["category"] for i in group}
+        exact = len(group) - len({hashes[i] for i in group})
+        groups.append({
+            "kind": "cross_category" if len(categories) > 1 else "near" if len(group) - 1 > exact else "exact",
+            "keep": group[0],
+            "drop": group[1:],
+            "exact": exact,
+            "other_categories": sorted(categories - {fields[group[0]]["category"]})
+        })
+
+    return {
+        "documents": rows,
+        "groups": groups,
+        "exact": sum(g["exact"] for g in groups),
+        "near": sum(len(g["drop"]) - g["exact"] for g in groups if g["kind"] != "cross_category"),
+        "cross_category": sum(len(g["drop"]) - g["exact"] for g in groups if g["kind"] == "cross_category"),
+        "cross_category_pairs": len(cross_pairs),
+        "cross_category_examples": cross_pairs[:REPORTED_PAIRS]
+    }
+
+
+def dedupe_plan(data: Dict, duplicates: Dict) -> Dict:
+    """Ids to leave out and merged metadata for each group's keeper"""
+    ids, metadatas = data["ids"], data["metadatas"]
+    drop_ids, metadata_updates = set(), {}
+    for group in duplicates["groups"]:
+        keeper = metadatas[group["keep"]]
+        merged = dict(keeper)
+        for i in group["drop"]:
+            for key, value in metadatas[i].items():
+                merged.setdefault(key, value)
+            drop_ids.add(ids[i])
+        if group["kind"] == "cross_category":
+            merged["also_categories"] = ",".join(str(c) for c in group["other_categories"])
+        if merged != keeper:
+            metadata_updates[ids[group["keep"]]] = merged
+    return {"drop_ids": drop_ids, "metadata_updates": metadata_updates}
+
+
+def build_deduplicated(vector_store, db_location: str, plan: Dict,
+                       logical_name: str = Config.COLLECTION_NAME):
+    """Copy the surviving documents' stored vectors into a new collection.
+
+    The live collection is never written, so a running API keeps serving a
+    consistent store (and its caches stay valid) until it switches. Chroma
+    only marks deleted entries in its HNSW graph; the new collection gets a
+    graph built from the surviving vectors alone.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    new_name = f"{logical_name}__{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}"
+    new_store = Chroma(collection_name=new_name, persist_directory=db_location,
+                       embedding_function=vector_store.embeddings)
+
+    source, target = vector_store._collection, new_store._collection
+    drop_ids, updates = plan["drop_ids"], plan["metadata_updates"]
+    read = written = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=PAGE_SIZE, offset=read)
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        read += len(page_ids)
+        keep = [n for n, doc_id in enumerate(page_ids) if doc_id not in drop_ids]
+        if not keep:
+            continue
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)[keep]
+        target.upsert(ids=[page_ids[n] for n in keep],
+                      embeddings=embeddings.tolist(),
+                      documents=[page["documents"][n] for n in keep],
+                      metadatas=[updates.get(page_ids[n], page["metadatas"][n]) for n in keep])
+        written += len(keep)
+
+    if target.count() != written or read != source.count():
+        drop_collection(new_store._client, new_name)
+        raise RuntimeError(f"copied {target.count()} of {written} documents "
+                           f"(read {read} of {source.count()}); live collection kept")
+    if Config.VECTOR_BACKEND == "numpy":
+        NumpyBackend.export(new_store, index_dir_for(new_store))
+
+    print(f"🧹 Copied {written} of {read} documents into '{new_name}' "
+          f"({len(drop_ids)} duplicates left out, {len(updates)} merged)")
+    return new_store
+
+
+def switch_collection(new_store, old_name: str, db_location: str, logical_name: str = Config.COLLECTION_NAME,
+                      api_url: Optional[str] = None, drop_previous: bool = False) -> Dict:
+    """Make `new_store` the served collection.
+
+    With api_url the running RAG API switches through its rebuilder (same
+    smoke test as a rebuild; it also owns dropping the old collection).
+    Without it only the pointer is updated and the API picks the new
+    collection up on restart, so the old one is always kept.
+    """
+    new_name = new_store._collection.name
+    if api_url:
+        try:
+            response = requests.post(f"{api_url.rstrip('/')}/api/admin/vector-store/switch",
+                                     json={"collection": new_name, "drop_previous": drop_previous},
+                                     headers={"X-Admin-Token": Config.ADMIN_API_TOKEN},
+                                     timeout=SWITCH_TIMEOUT_SECONDS)
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            result = {"success": False, "message": str(e)}
+        if not result.get("success"):
+            drop_collection(new_store._client, new_name)
+            raise RuntimeError(f"API refused the switch to '{new_name}': {result.get('message')}")
+        print(f"✅ API at {api_url} now serves '{new_name}'")
+        return result
+
+    if drop_previous:
+        raise ValueError("--drop-previous needs --api: the old collection may still be served")
+    superseded = record_switch(db_location, logical_name, new_name, old_name)
+    if superseded:
+        drop_collection(new_store._client, superseded)
+    print(f"✅ '{logical_name}' now points at '{new_name}' (running APIs switch on restart)")
+    return {"success": True, "collection": new_name, "previous": old_name, "previous_kept": True}
+
+
+def compact(db_location: str) -> Optional[int]:
+    """VACUUM Chroma's SQLite file; returns bytes reclaimed"""
+    path = os.path.join(db_location, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return None
+    before = os.path.getsize(path)
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not VACUUM {path}: {e}")
+        return None
+    reclaimed = before - os.path.getsize(path)
+    print(f"🗜️  Compacted {path} ({reclaimed / 1e6:.1f} MB reclaimed)")
+    return reclaimed
+
+
+def _disk_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def collection_disk_bytes(db_location: str, collection_name: str) -> Optional[int]:
+    """Bytes of the collection's own files: its Chroma segment directories
+    (HNSW graph) plus its NumPy index. Rows in chroma.sqlite3 are shared
+    with every other collection and reported separately."""
+    path = os.path.join(db_location, "chroma.sqlite3")
+    try:
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            segment_ids = [row[0] for row in connection.execute(
+                "SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id WHERE c.name = ?",
+                (collection_name,)
+            )]
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not read segments for '{collection_name}': {e}")
+        return None
+    if not segment_ids:
+        return None
+    total = sum(_disk_bytes(os.path.join(db_location, str(segment_id))) for segment_id in segment_ids)
+    return total + _disk_bytes(os.path.join(Config.VECTOR_INDEX_DIR, collection_name))
+
+
+def _mb(size: Optional[int]) -> Optional[float]:
+    return round(size / 1e6, 2) if size is not None else None
+
+
+def measure(vector_store, db_location: str, repeat: int = 50, backend: Optional[str] = None) -> Dict:
+    """Collection size on disk and query latency through `backend` (default:
+    the configured one; "chroma" never exports a NumPy index)"""
+    backend = create_backend(vector_store, backend)
+    queries = [" ".join(terms[:3]) for terms in Config.MEAL_TYPE_TERMS.values()]
+    query_embeddings = vector_store.embeddings.embed_documents(queries)
+    for _ in range(repeat):
+        backend.query(query_embeddings, Config.RETRIEVAL_K)
+
+    stats = backend.stats()
+    sqlite_path = os.path.join(db_location, "chroma.sqlite3")
+    return {
+        "collection": vector_store._collection.name,
+        "documents": stats["documents"],
+        "collection_mb": _mb(collection_disk_bytes(db_location, vector_store._collection.name)),
+        # Shared by all collections in the database, including a kept rollback one
+        "sqlite_mb": _mb(os.path.getsize(sqlite_path) if os.path.exists(sqlite_path) else None),
+        "latency_ms_p50": stats["latency_ms_p50"],
+        "latency_ms_p95": stats["latency_ms_p95"]
+    }
+
+
+def run_maintenance(db_location: str = Config.VECTOR_DB_LOCATION, logical_name: str = Config.COLLECTION_NAME,
+                    apply: bool = False, cross_category: bool = False, api_url: Optional[str] = None,
+                    drop_previous: bool = False, threshold: float = Config.DEDUPE_SIMILARITY,
+                    repeat: int = 50) -> Dict:
+    from ingest import open_vector_store
+
+    if drop_previous and not api_url:
+        raise ValueError("--drop-previous needs --api: the old collection may still be served")
+
+    vector_store = open_vector_store(db_location, resolve_collection_name(db_location, logical_name))
+    # Report-only runs write nothing, so measure Chroma directly
+    report = {"before": measure(vector_store, db_location, repeat, backend=None if apply else "chroma")}
+
+    data = load_collection(vector_store._collection)
+    duplicates = find_duplicates(data, threshold, cross_category, vector_store._collection)
+    report["duplicates"] = {key: value for key, value in duplicates.items() if key != "groups"}
+    print(f"🔍 {duplicates['exact']} exact and {duplicates['near']} near duplicates "
+          f"in {duplicates['documents']} documents "
+          f"({duplicates['cross_category_pairs']} cross-category pairs)")
+
+    if not apply:
+        return report
+
+    plan = dedupe_plan(data, duplicates)
+    del data
+    old_name = vector_store._collection.name
+    new_store = build_deduplicated(vector_store, db_location, plan, logical_name)
+    report["switch"] = switch_collection(new_store, old_name, db_location, logical_name, api_url, drop_previous)
+    report["suppressed_ids"] = suppress_ids(db_location, plan["drop_ids"], logical_name)
+    report["compacted_bytes"] = compact(db_location)
+    report["after"] = measure(new_store, db_location, repeat)
+    if report["switch"].get("previous_kept"):
+        # Kept for rollback until COLLECTION_ROLLBACK_TTL; not part of "after"
+        report["rollback_collection"] = {
+            "collection": old_name,
+            "collection_mb": _mb(collection_disk_bytes(db_location, old_name))
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedupe, compact and reindex the meal vector collection")
+    parser.add_argument("--db", default=Config.VECTOR_DB_LOCATION)
+    parser.add_argument("--collection", default=Config.COLLECTION_NAME, help="logical collection name")
+    parser.add_argument("--apply", action="store_true", help="write changes (default: report only)")
+    parser.add_argument("--cross-category", action="store_true",
+                        help="also merge near-duplicates that sit in different categories")
+    parser.add_argument("--threshold", type=float, default=Config.DEDUPE_SIMILARITY)
+    parser.add_argument("--api", default=None,
+                        help="RAG API base URL (e.g. http://localhost:5001) to switch the live service")
+    parser.add_argument("--drop-previous", action="store_true",
+                        help="with --api: drop the old collection instead of keeping it for rollback")
+    parser.add_argument("--repeat", type=int, default=50, help="latency samples per query")
+    args = parser.parse_args()
+    if args.drop_previous and not args.api:
+        parser.error("--drop-previous needs --api: without it a running API may still serve the old collection")
+
+    report = run_maintenance(args.db, args.collection, apply=args.apply, cross_category=args.cross_category,
+                             api_url=args.api, drop_previous=args.drop_previous,
+                             threshold=args.threshold, repeat=args.repeat)
+    print(f"📊 {json.dumps(report, indent=2)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# ================================
+# File: vector_snapshot.py
+# Portable, checksummed vector store snapshots for fast cold start
+# ================================
+#
+# Export (on a node that has the collection):
+#     python vector_snapshot.py export meal_database.snapshot.tar [--version 2026-10-18]
+# Import (new node; no embedding work, refuses a different model):
+#     python vector_snapshot.py import meal_database.snapshot.tar
+# Verify checksums only:
+#     python vector_snapshot.py verify meal_database.snapshot.tar
+#
+# A snapshot is an uncompressed tar with, in order:
+#   manifest.json    format, version, collection, model identity, rows, sha256 per file
+#   vectors.npy      (rows, dim) float32 embeddings as stored in the collection
+#   records.jsonl    one {"id", "document", "metadata"} per row, aligned with vectors
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import Config
+
+SNAPSHOT_FORMAT_VERSION = 1
+PAGE_SIZE = 1000
+PAYLOAD_FILES = ("vectors.npy", "records.jsonl")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is corrupt or was built with a different model"""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _marker_path(db_location: str, collection_name: str) -> str:
+    return os.path.join(db_location, f".snapshot-{collection_name}.json")
+
+
+def resolve_snapshot_path(snapshot_path: str, snapshot_dir: str = Config.VECTOR_SNAPSHOT_DIR) -> str:
+    """Absolute path of a snapshot that must live under snapshot_dir
+    (relative paths are taken from it); SnapshotError otherwise"""
+    root = os.path.realpath(snapshot_dir)
+    resolved = os.path.realpath(os.path.join(root, snapshot_path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise SnapshotError(f"Snapshot {snapshot_path} is outside {snapshot_dir}")
+    return resolved
+
+
+def export_snapshot(vector_store, out_path: str, version: Optional[str] = None) -> Dict:
+    """Write the collection's ids, vectors, documents and metadata to one tar"""
+    collection = vector_store._collection
+    expected = collection.count()
+    work_dir = tempfile.mkdtemp(prefix="snapshot-", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        vectors_path = os.path.join(work_dir, "vectors.npy")
+        records_path = os.path.join(work_dir, "records.jsonl")
+        vectors, rows = None, 0
+        with open(records_path, "w", encoding="utf-8") as records:
+            while rows < expected:
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=PAGE_SIZE, offset=rows)
+                page_ids = (page.get("ids") or [])[:expected - rows]
+                if not page_ids:
+                    break
+                page_vectors = np.asarray(page["embeddings"], dtype=np.float32)[:len(page_ids)]
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32,
+                                                        shape=(expected, page_vectors.shape[1]))
+                vectors[rows:rows + len(page_ids)] = page_vectors
+                for doc_id, document, metadata in zip(page_ids, page["documents"], page["metadatas"]):
+                    records.write(json.dumps({"id": doc_id, "document": document, "metadata": metadata or {}}) + "\n")
+                rows += len(page_ids)
+
+        if vectors is None:
+            np.save(vectors_path, np.empty((0, 0), dtype=np.float32))
+            dimension = 0
+        else:
+            dimension = int(vectors.shape[1])
+            vectors.flush()
+            del vectors
+            if rows < expected:
+                # The collection shrank while exporting: trim to what was written
+                np.save(vectors_path, np.load(vectors_path, mmap_mode="r")[:rows])
+
+        embeddings = vector_store.embeddings
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()),
+            "collection": collection.name,
+            "model": {
+                "name": getattr(embeddings, "model_name", None),
+                "dimension": dimension,
+                "normalized": True
+            },
+            "rows": rows,
+            "created_at": time.time(),
+            "files": {name: _sha256(os.path.join(work_dir, name)) for name in PAYLOAD_FILES}
+        }
+        manifest_path = os.path.join(work_dir, "manifest.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        tmp_out = f"{out_path}.tmp"
+        with tarfile.open(tmp_out, "w") as tar:
+            # Manifest first, so readers can check the model before the payload
+            tar.add(manifest_path, arcname="manifest.json")
+            for name in PAYLOAD_FILES:
+                tar.add(os.path.join(work_dir, name), arcname=name)
+        os.replace(tmp_out, out_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"✅ Snapshot {manifest['version']} of '{collection.name}' ({rows} vectors) written to {out_path}")
+    return manifest
+
+
+def read_manifest(snapshot_path: str) -> Dict:
+    try:
+        with tarfile.open(snapshot_path, "r") as tar:
+            member = tar.extractfile("manifest.json")
+            if member is None:
+                raise SnapshotError(f"{snapshot_path} has no manifest")
+            manifest = json.load(member)
+    except (tarfile.TarError, KeyError, ValueError) as e:
+        raise SnapshotError(f"{snapshot_path} is not a readable snapshot: {e}")
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot format {manifest.get('format_version')}")
+    return manifest
+
+
+def check_model(manifest: Dict, embeddings):
+    """Refuse vectors produced by a different embedding model"""
+    expected = getattr(embeddings, "model_name", None)
+    snapshot_model = manifest["model"].get("name")
+    if expected and snapshot_model != expected:
+        raise SnapshotError(f"snapshot was built with '{snapshot_model}', this node embeds with '{expected}'")
+    # Dimension is only checked when the encoder is already loaded (no load at boot)
+    encoder = getattr(embeddings, "_encoder", None)
+    if encoder is not None and manifest["rows"] and encoder.dimension != manifest["model"]["dimension"]:
+        raise SnapshotError(f"snapshot dimension {manifest['model']['dimension']} != model dimension {encoder.dimension}")
+
+
+def _extract_verified(snapshot_path: str, manifest: Dict, work_dir: str):
+    with tarfile.open(snapshot_path, "r") as tar:
+        for name in PAYLOAD_FILES:
+            member = tar.extractfile(name)
+            if member is None:
+                raise SnapshotError(f"{snapshot_path} is missing {name}")
+            target = os.path.join(work_dir, name)
+            with open(target, "wb") as out:
+                shutil.copyfileobj(member, out, 1 << 20)
+            if _sha256(target) != manifest["files"].get(name):
+                raise SnapshotError(f"checksum mismatch for {name} in {snapshot_path}")
+
+
+def verify_snapshot(snapshot_path: str) -> Dict:
+    manifest = read_manifest(snapshot_path)
+    work_dir = tempfile.mkdtemp(prefix="snapshot-verify-")
+    try:
+        _extract_verified(snapshot_path, manifest, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return manifest
+
+
+def import_snapshot(vector_store, snapshot_path: str, db_location: str, force: bool = False) -> Dict:
+    """Load a snapshot into the collection without re-embedding.
+
+    Skipped when this exact snapshot was already imported into this
+    database. Raises SnapshotError on checksum or model mismatch, before
+    anything is written.
+    """
+    started = time.time()
+    collection = vector_store._collection
+    manifest = read_manifest(snapshot_path)
+    check_model(manifest, vector_store.embeddings)
+
+    marker_path = _marker_path(db_location, collection.name)
+    if not force and os.path.exists(marker_path):
+        with open(marker_path, "r", encoding="utf-8") as f:
+            marker = json.load(f)
+        if marker.get("files") == manifest["files"] and collection.count() >= manifest["rows"]:
+            print(f"   ✅ Snapshot {manifest['version']} already loaded into '{collection.name}'")
+            return {"imported": 0, "skipped": True, "version": manifest["version"]}
+
+    work_dir = tempfile.mkdtemp(prefix="snapshot-import-")
+    try:
+        _extract_verified(snapshot_path, manifest, work_dir)
+        vectors = np.load(os.path.join(work_dir, "vectors.npy"), mmap_mode="r")
+        if vectors.shape[0] != manifest["rows"]:
+            raise SnapshotError("vector count does not match the manifest")
+
+        imported = 0
+        with open(os.path.join(work_dir, "records.jsonl"), "r", encoding="utf-8") as records:
+            batch = []
+            for row, line in enumerate(records):
+                batch.append(json.loads(line))
+                if len(batch) == PAGE_SIZE:
+                    imported += _upsert(collection, batch, vectors[row + 1 - len(batch):row + 1])
+                    batch = []
+            if batch:
+                imported += _upsert(collection, batch, vectors[manifest["rows"] - len(batch):])
+        del vectors
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(marker_path, "w", encoding="utf-8") as f:
+        json.dump({"version": manifest["version"], "files": manifest["files"],
+                   "imported_at": time.time()}, f, indent=2)
+
+    seconds = round(time.time() - started, 2)
+    print(f"✅ Imported snapshot {manifest['version']} into '{collection.name}' ({imported} vectors, {seconds}s)")
+    return {"imported": imported, "skipped": False, "version": manifest["version"], "seconds": seconds}
+
+
+def _upsert(collection, records, vectors) -> int:
+    collection.upsert(
+        ids=[record["id"] for record in records],
+        embeddings=np.asarray(vectors, dtype=np.float32).tolist(),
+        documents=[record["document"] for record in records],
+        metadatas=[record["metadata"] or None for record in records]
+    )
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / import vector store snapshots")
+    parser.add_argument("command", choices=["export", "import", "verify"])
+    parser.add_argument("snapshot_path")
+    parser.add_argument("--db", default=Config.VECTOR_DB_LOCATION)
+    parser.add_argument("--collection", default=Config.COLLECTION_NAME)
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--force", action="store_true", help="import even if already loaded")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        manifest = verify_snapshot(args.snapshot_path)
+        print(f"✅ Snapshot OK: {manifest['version']} ({manifest['rows']} vectors, model {manifest['model']['name']})")
+        return
+
+    from ingest import open_vector_store
+    vector_store = open_vector_store(args.db, args.collection)
+    if args.command == "export":
+        export_snapshot(vector_store, args.snapshot_path, args.version)
+    else:
+        import_snapshot(vector_store, args.snapshot_path, args.db, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
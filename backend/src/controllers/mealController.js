@@ -1,5 +1,29 @@
+const axios = require('axios');
 const Meal = require('../models/Meal');
 
+// Python services that cache barcode lookups (main_food_api / main_light,
+// port 8000). The cache is shared on disk, so one reachable service clears
+// it for all; list several, comma separated, when they run on other hosts.
+const BARCODE_SERVICE_URLS = (process.env.BARCODE_SERVICE_URLS || 'http://localhost:8000')
+  .split(',')
+  .map((url) => url.trim())
+  .filter(Boolean);
+
+// Tell the barcode services that cached barcode lookups may be stale.
+// The barcodes of the changed meal (before and after an update) are dropped
+// whatever answered them, e.g. an Open Food Facts hit for a code a meal now
+// carries. Fire-and-forget: a failed notification must not fail the request.
+const notifyCatalogChanged = (reason, barcodes = []) => {
+  const codes = [...new Set(barcodes.filter(Boolean))];
+  BARCODE_SERVICE_URLS.forEach((url) => {
+    axios
+      .post(`${url}/api/cache/barcodes/invalidate`, { reason, barcodes: codes }, { timeout: 3000 })
+      .catch((error) => {
+        console.error(`Barcode cache invalidation error (${url}):`, error.message);
+      });
+  });
+};
+
 // @desc    Create a new meal
 // @route   POST /api/meals
 // @access  Private
@@ -40,6 +64,8 @@ const createMeal = async (req, res) => {
       createdBy: req.userId
     });
 
+    notifyCatalogChanged('meal_created', [meal.barcode]);
+
     res.status(201).json({
       success: true,
       message: 'Meal created successfully',
@@ -189,6 +215,8 @@ const updateMeal = async (req, res) => {
       { new: true, runValidators: true }
     );
 
+    notifyCatalogChanged('meal_updated', [meal.barcode, updatedMeal && updatedMeal.barcode]);
+
     res.json({
       success: true,
       message: 'Meal updated successfully',
@@ -228,6 +256,8 @@ const deleteMeal = async (req, res) => {
 
     await Meal.findByIdAndDelete(req.params.id);
 
+    notifyCatalogChanged('meal_deleted', [meal.barcode]);
+
     res.json({
       success: true,
       message: 'Meal deleted successfully'